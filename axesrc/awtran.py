@@ -110,17 +110,14 @@ syntax rules.
 
 #from string import *
 from math import *
-from pyraf import iraf
-from iraf import stsdas, analysis, dither
+import numpy as np
 
 import sys
-import pydrizzle
 from stsci.tools import fileutil
 PY3K = sys.version_info[0] >= 3
 
-# Some convenient definitions
-yes=iraf.yes
-no=iraf.no
+# Some convenient definitions; IRAF and PyDrizzle
+# are imported only where they are used
 MaxImages=999
 TRUE=1
 FALSE=0
@@ -154,47 +151,32 @@ class DrizGeoPars:
         else:
 
             # Read geometric parameters from a header using an image name as
-            # the key
-
-            found=FALSE
+            # the key; all keywords are read in one pass over the header
+            header=fileutil.getHeader(image)
 
             # First search for the entry for this image
-            i=1
-            while i < MaxImages:
-                datkey = 'D%3iDATA' % i
-                datkey=datkey.replace(' ','0')
-
-                iraf.keypar(image,datkey,silent='yes')
-
-                # If we can't read this no point considering
-                if iraf.keypar.value == '':
-                    break
-
-                # If we have a match set flag and leave
-                if iraf.keypar.value == inimage:
-                    found=TRUE
-                    break
-
-                i += 1
-
-            if not found:
+            stem=None
+            for key in list(header.keys()):
+                if len(key) == 8 and key[0] == 'D' and key[1:4].isdigit() and key[4:] == 'DATA':
+                    if header[key] == inimage:
+                        stem=key[:4]
+                        break
+
+            if stem == None:
                 raise Exception("Failed to get keyword information from header.")
 
             # Now we know that the selected image is present we can
             # get all the other parameters - we don't check whether this
             # succeeds, if it doesn't let it crash
-            stem=datkey[:4]
+            self.scale=float(header[stem+"SCAL"])
 
-            iraf.keypar(image,stem+"SCAL",silent='yes')
-            self.scale=float(iraf.keypar.value)
-
-            iraf.keypar(image,stem+"COEF",silent='yes')
-            self.coeffs=iraf.keypar.value
+            self.coeffs=header[stem+"COEF"]
             # Check for existence
             if fileutil.findFile(self.coeffs) == FALSE:
                try:
                   print('\n-Coeffs file not found.  Trying to reproduce them using PyDrizzle...')
                   # Try to generate the coeffs file automatically
+                  import pydrizzle
                   indx = inimage.find('[')
                   p = pydrizzle.PyDrizzle(inimage[:indx], bits_single=None, bits_final=None, updatewcs=FALSE)
                   del p
@@ -202,29 +184,19 @@ class DrizGeoPars:
                   print("! Cannot access coefficients file. (",self.coeffs,")")
                   raise Exception("File missing or inaccessible.")
 
-            iraf.keypar(image,stem+"LAM",silent='yes')
-            if iraf.keypar.value != '':
-               self.lam=float(iraf.keypar.value)
+            if stem+"LAM" in header and str(header[stem+"LAM"]) != '':
+               self.lam=float(header[stem+"LAM"])
             else:
                self.lam=555.0
 
-            iraf.keypar(image,stem+"XSH",silent='yes')
-            self.xsh=float(iraf.keypar.value)
-
-            iraf.keypar(image,stem+"YSH",silent='yes')
-            self.ysh=float(iraf.keypar.value)
-
-            iraf.keypar(image,stem+"ROT",silent='yes')
-            self.rot=float(iraf.keypar.value)
+            self.xsh=float(header[stem+"XSH"])
+            self.ysh=float(header[stem+"YSH"])
+            self.rot=float(header[stem+"ROT"])
 
-            iraf.keypar(image,stem+"SFTU",silent='yes')
-            self.shft_un=iraf.keypar.value
+            self.shft_un=header[stem+"SFTU"]
+            self.shft_fr=header[stem+"SFTF"]
 
-            iraf.keypar(image,stem+"SFTF",silent='yes')
-            self.shft_fr=iraf.keypar.value
-
-            iraf.keypar(image,stem+"XGIM",silent='yes')
-            self.xgeoim=iraf.keypar.value
+            self.xgeoim=header.get(stem+"XGIM", '')
             indx = self.xgeoim.find('[')
             # Check for existence
             if fileutil.findFile(self.xgeoim[:indx]) == FALSE and self.xgeoim != '':
@@ -232,8 +204,7 @@ class DrizGeoPars:
                print(" continuing without it. (",self.xgeoim,")")
                self.xgeoim=''
 
-            iraf.keypar(image,stem+"YGIM",silent='yes')
-            self.ygeoim=iraf.keypar.value
+            self.ygeoim=header.get(stem+"YGIM", '')
             indx = self.ygeoim.find('[')
             # Check for existence
             if fileutil.findFile(self.ygeoim[:indx]) == FALSE and self.ygeoim != '':
@@ -243,23 +214,16 @@ class DrizGeoPars:
 
             # The case of the "align" parameter is more tricky, we
             # have to deduce it from INXC keyword
-            iraf.keypar(image,stem+"INXC",silent='yes')
-            inxc=float(iraf.keypar.value)
+            inxc=float(header[stem+"INXC"])
 
             # Need the X and Y dimensions as well - both input and
             # output
-            iraf.keypar(inimage,'i_naxis1',silent='yes')
-            xdim=int(iraf.keypar.value)
-            iraf.keypar(inimage,'i_naxis2',silent='yes')
-            ydim=int(iraf.keypar.value)
-
-            self.nxin=xdim
-            self.nyin=ydim
+            inheader=fileutil.getHeader(inimage)
+            self.nxin=int(inheader['NAXIS1'])
+            self.nyin=int(inheader['NAXIS2'])
 
-            iraf.keypar(image,'i_naxis1',silent='yes')
-            xdim=int(iraf.keypar.value)
-            iraf.keypar(image,'i_naxis2',silent='yes')
-            ydim=int(iraf.keypar.value)
+            xdim=int(header['NAXIS1'])
+            ydim=int(header['NAXIS2'])
 
             self.nxout=xdim
             self.nyout=ydim
@@ -270,29 +234,212 @@ class DrizGeoPars:
                 self.align='center'
 
             # Check for the presence of secondary parameters
-            iraf.keypar(image,stem+"SECP",silent='yes')
-            if iraf.keypar.value == "yes":
+            if str(header.get(stem+"SECP", '')) in ["yes", "True", "T"]:
                 raise Exception("Sorry, this version does NOT support secondary parameters.")
             else:
                 self.secp=FALSE
 
-# Main TRAN methods - f for forward and b for back
-#
-# inimage - the input image which is to have its WCS updated
-# drizimage - the reference image, assumed to contain the drizzle parameters
-#         in its header
-#
-# x,y - a single position for transformation
-#
-# List - a text file name containing x y pairs
-#
-def f(origimage,drizimage,x=None,y=None,List=None):
-    # define the output
-    all_out = []
+# The exception for transformations which are not done
+# by DrizTrans, but by the IRAF tasks wtraxy/wtranback
+class TransNotSupported(Exception):
+    pass
 
+# A class for the drizzle transformation on arrays
+class DrizTrans:
 
-    # Get the parameters from the header
-    GeoPar=DrizGeoPars(drizimage,origimage)
+    # Constructor, set up the transformation from the geometric parameters
+    def __init__(self,GeoPar):
+
+        # The distortion images and wavelength
+        # dependent coefficients are not supported
+        if GeoPar.xgeoim != '' or GeoPar.ygeoim != '':
+            raise TransNotSupported("Distortion images are not supported.")
+
+        # Read the coefficients
+        self.order, self.xco, self.yco, xref, yref = self._read_coeffs(GeoPar.coeffs)
+
+        # The centre of the input and the output image
+        if GeoPar.align == 'corner':
+            self.xcin=float(GeoPar.nxin//2)+0.5
+            self.ycin=float(GeoPar.nyin//2)+0.5
+            self.xcout=float(GeoPar.nxout//2)+0.5
+            self.ycout=float(GeoPar.nyout//2)+0.5
+        else:
+            self.xcin=float(GeoPar.nxin//2)+1.0
+            self.ycin=float(GeoPar.nyin//2)+1.0
+            self.xcout=float(GeoPar.nxout//2)+1.0
+            self.ycout=float(GeoPar.nyout//2)+1.0
+
+        # The distortion is evaluated relative to the reference
+        # pixel, by default the image centre
+        if xref == None:
+            self.xref=self.xcin
+            self.yref=self.ycin
+        else:
+            self.xref=xref
+            self.yref=yref
+
+        # The distortion at the image centre is subtracted,
+        # such that the image centre stays fixed
+        self.xdoff, self.ydoff = self._eval_coeffs(np.array([self.xcin-self.xref]), np.array([self.ycin-self.yref]))[:2]
+        self.xdoff=float(self.xdoff[0])
+        self.ydoff=float(self.ydoff[0])
+
+        # The shifts are in units of input pixels
+        xsh=GeoPar.xsh
+        ysh=GeoPar.ysh
+        if GeoPar.shft_un == 'output':
+            xsh=xsh*GeoPar.scale
+            ysh=ysh*GeoPar.scale
+
+        # Rotation and scale
+        rot=GeoPar.rot*pi/180.0
+        self.xfc=cos(rot)/GeoPar.scale
+        self.xfs=sin(rot)/GeoPar.scale
+
+        # The offsets, the shifts applied either
+        # after or before the rotation
+        xoff=xsh/GeoPar.scale
+        yoff=ysh/GeoPar.scale
+        if GeoPar.shft_fr == 'output':
+            self.xt=xoff+self.xcout
+            self.yt=yoff+self.ycout
+        else:
+            self.xt=self.xcout+xoff*cos(rot)-yoff*sin(rot)
+            self.yt=self.ycout+xoff*sin(rot)+yoff*cos(rot)
+
+    # Read a coefficients file in drizzle format
+    def _read_coeffs(self,coeffs):
+
+        xref=None
+        yref=None
+        order=None
+        values=[]
+
+        for line in open(coeffs).readlines():
+            items=line.split()
+
+            # Skip empty and comment lines
+            if len(items) < 1 or items[0][0] == '#':
+                continue
+
+            if items[0] == 'refpix':
+                xref=float(items[1])
+                yref=float(items[2])
+            elif items[0] == 'cubic':
+                order=3
+            elif items[0] == 'poly':
+                order=int(items[1])
+            elif order == None:
+                raise TransNotSupported("Coefficients type '%s' is not supported." % items[0])
+            else:
+                values.extend([float(item) for item in items])
+
+        if order == None:
+            raise TransNotSupported("No coefficients found in %s." % coeffs)
+
+        # Check the number of coefficients
+        ncoeffs=(order+1)*(order+2)//2
+        if len(values) != 2*ncoeffs:
+            raise TransNotSupported("Wrong number of coefficients in %s." % coeffs)
+
+        return order, np.array(values[:ncoeffs]), np.array(values[ncoeffs:]), xref, yref
+
+    # Evaluate the distortion polynomials and their derivatives
+    def _eval_coeffs(self,x,y):
+
+        xd=np.zeros(x.shape)
+        yd=np.zeros(x.shape)
+        dxdx=np.zeros(x.shape)
+        dxdy=np.zeros(x.shape)
+        dydx=np.zeros(x.shape)
+        dydy=np.zeros(x.shape)
+
+        # The terms are ordered 1, x, y, x^2, xy, y^2, ...
+        k=0
+        for i in range(self.order+1):
+            for j in range(i+1):
+                term=x**(i-j)*y**j
+                xd+=self.xco[k]*term
+                yd+=self.yco[k]*term
+                if i-j > 0:
+                    dterm=(i-j)*x**(i-j-1)*y**j
+                    dxdx+=self.xco[k]*dterm
+                    dydx+=self.yco[k]*dterm
+                if j > 0:
+                    dterm=j*x**(i-j)*y**(j-1)
+                    dxdy+=self.xco[k]*dterm
+                    dydy+=self.yco[k]*dterm
+                k+=1
+
+        return xd, yd, dxdx, dxdy, dydx, dydy
+
+    # Transform from the input image to the drizzled image
+    def forward(self,x,y):
+
+        x=np.asarray(x,dtype=np.float64)
+        y=np.asarray(y,dtype=np.float64)
+
+        # Correct for distortion
+        xd, yd = self._eval_coeffs(x-self.xref, y-self.yref)[:2]
+        xd=xd-self.xdoff
+        yd=yd-self.ydoff
+
+        # Apply rotation, scale and shift
+        xout=self.xfc*xd-self.xfs*yd+self.xt
+        yout=self.xfs*xd+self.xfc*yd+self.yt
+
+        return xout, yout
+
+    # Transform from the drizzled image to the input image
+    def backward(self,x,y,niter=50,tol=1.0e-6):
+
+        x=np.asarray(x,dtype=np.float64)
+        y=np.asarray(y,dtype=np.float64)
+
+        # Invert rotation, scale and shift
+        det=self.xfc*self.xfc+self.xfs*self.xfs
+        xd=( self.xfc*(x-self.xt)+self.xfs*(y-self.yt))/det+self.xdoff
+        yd=(-self.xfs*(x-self.xt)+self.xfc*(y-self.yt))/det+self.ydoff
+
+        # Invert the distortion with Newton iterations,
+        # starting from the undistorted position
+        xin=xd.copy()
+        yin=yd.copy()
+        converged=False
+        for i in range(niter):
+            xe, ye, dxdx, dxdy, dydx, dydy = self._eval_coeffs(xin, yin)
+            xe=xe-xd
+            ye=ye-yd
+            jdet=dxdx*dydy-dxdy*dydx
+            if not np.all(np.isfinite(jdet)) or np.any(jdet == 0.0):
+                raise TransNotSupported("Singular distortion in the inversion.")
+            xstep=( dydy*xe-dxdy*ye)/jdet
+            ystep=(-dydx*xe+dxdx*ye)/jdet
+            xin-=xstep
+            yin-=ystep
+            if np.all(np.abs(xstep) < tol) and np.all(np.abs(ystep) < tol):
+                converged=True
+                break
+
+        if not converged or not (np.all(np.isfinite(xin)) and np.all(np.isfinite(yin))):
+            raise TransNotSupported("Inversion of the distortion did not converge in %i iterations." % niter)
+
+        return xin+self.xref, yin+self.yref
+
+# Get the vectorised transformation, None if not possible
+def _get_trans(GeoPar):
+    try:
+        trans=DrizTrans(GeoPar)
+    except TransNotSupported as e:
+        print("-Using IRAF for the transformation:", e)
+        trans=None
+    return trans
+
+# Set the parameters of wtraxy from the geometrical parameters
+def _setup_wtraxy(GeoPar):
+
+    from pyraf import iraf
 
     iraf.unlearn('wtraxy')
 
@@ -315,56 +462,10 @@ def f(origimage,drizimage,x=None,y=None,List=None):
     iraf.wtraxy.ygeoim=GeoPar.ygeoim
     iraf.wtraxy.geomod='user'
 
-    if List != None:
-
-            x=1.0
-            y=1.0
-
-            iraf.wtraxy.xylist=List
-
-            str=iraf.wtraxy(x,y,mode='h',Stdout=1)
-
-            all_out.append("   Xin         Yin         Xout        Yout")
-
-            # Just show the lines of interest
-            for line in str:
-                if line[0:1] == '!':
-                    print(line)
-                    sys.exit()
-
-                if line[0:3] == ' Xi':
-                    xin = float(line.split()[1])
-                    yin = float(line.split()[2])
-                    xout = float(line.split()[4])
-                    yout = float(line.split()[5])
-                    all_out.append("%10.3f %10.3f %10.3f %10.3f" % (xin,yin,xout,yout))
-
-    else:
-
-        iraf.wtraxy.xylist=''
+# Set the parameters of wtranback from the geometrical parameters
+def _setup_wtranback(GeoPar):
 
-        # Transform and display the result
-        print("-Transforming position...")
-        str=iraf.wtraxy(x,y,mode='h',Stdout=1)
-
-        # Just show the lines of interest
-        for line in str:
-
-            if line[0:1] == '!':
-                all_out.appen(line)
-
-            if line[0:3] == ' Xi':
-                all_out.appen(line)
-
-    # return the output
-    return all_out
-
-def b(drizimage,origimage,x=None,y=None,List=None):
-    # define the output
-    all_out = []
-
-    # Get the parameters from the header
-    GeoPar=DrizGeoPars(drizimage,origimage)
+    from pyraf import iraf
 
     iraf.unlearn('wtranback')
 
@@ -387,44 +488,150 @@ def b(drizimage,origimage,x=None,y=None,List=None):
     iraf.wtranback.ygeoim=GeoPar.ygeoim
     iraf.wtranback.geomode='user'
 
-    if List != None:
-            iraf.wtranback.xylist=List
+# The lock shared by the processes which may use IRAF
+_iraf_lock=None
+
+# Set the lock for the IRAF fallback, e.g. in a worker process
+def set_iraf_lock(lock):
+    global _iraf_lock
+    _iraf_lock=lock
+
+# Transform arrays of positions with wtraxy or wtranback,
+# for the cases DrizTrans does not support
+def _iraf_array(GeoPar,x,y,forward):
+    import os
+    import tempfile
+    from pyraf import iraf
+    from iraf import stsdas, analysis, dither
+
+    # IRAF writes its parameter files,
+    # hence only one process may use it at a time
+    if _iraf_lock != None:
+        _iraf_lock.acquire()
+    try:
+        # Set up the task
+        if forward:
+            _setup_wtraxy(GeoPar)
+            task=iraf.wtraxy
+        else:
+            _setup_wtranback(GeoPar)
+            task=iraf.wtranback
+
+        # Transform the positions via a list file
+        fd,List=tempfile.mkstemp(suffix='.dat',dir='.')
+        os.close(fd)
+        try:
+            np.savetxt(List,np.column_stack([x,y]),fmt='%.6f')
+            task.xylist=List
+            lines=task(1.0,1.0,mode='h',Stdout=1)
+        finally:
+            os.unlink(List)
+    finally:
+        if _iraf_lock != None:
+            _iraf_lock.release()
+
+    # Extract the positions, report errors
+    pos=[]
+    for line in lines:
+        if line[0:1] == '!':
+            raise Exception(line.strip())
+        if line[0:3] == ' Xi':
+            items=line.split()
+            pos.append([float(items[1]),float(items[2]),float(items[4]),float(items[5])])
+    pos=np.array(pos,dtype=np.float64).reshape(-1,4)
+
+    if forward:
+        return pos[:,2], pos[:,3]
+    return pos[:,0], pos[:,1]
+
+# Transform arrays of positions from the input image
+# to the drizzled image
+def f_array(origimage,drizimage,x,y):
+
+    x=np.asarray(x,dtype=np.float64)
+    y=np.asarray(y,dtype=np.float64)
 
-            x=1.0
-            y=1.0
+    # Get the parameters from the header
+    GeoPar=DrizGeoPars(drizimage,origimage)
 
-            str=iraf.wtranback(x,y,mode='h',Stdout=1)
+    # Use the vectorised transformation if possible
+    trans=_get_trans(GeoPar)
+    if trans != None:
+        return trans.forward(x,y)
 
-            all_out.append("   Xin         Yin         Xout        Yout")
+    # Otherwise use wtraxy
+    return _iraf_array(GeoPar,x,y,True)
 
-            # Just show the lines of interest
-            for line in str:
-                if line[0:1] == "!":
-                    print(line)
-                    sys.exit()
+# Transform arrays of positions from the drizzled image
+# to the input image
+def b_array(drizimage,origimage,x,y):
 
-                if line[0:3] == ' Xi':
-                    xin = float(line.split()[1])
-                    yin = float(line.split()[2])
-                    xout = float(line.split()[4])
-                    yout = float(line.split()[5])
-                    all_out.append("%10.3f %10.3f %10.3f %10.3f" % (xin,yin,xout,yout))
+    x=np.asarray(x,dtype=np.float64)
+    y=np.asarray(y,dtype=np.float64)
 
-    else:
+    # Get the parameters from the header
+    GeoPar=DrizGeoPars(drizimage,origimage)
 
-        iraf.wtranback.xylist=''
+    # Use the vectorised transformation if possible
+    trans=_get_trans(GeoPar)
+    if trans != None:
+        try:
+            return trans.backward(x,y)
+        except TransNotSupported as e:
+            print("-Using IRAF for the transformation:", e)
 
-        # Transform and display the result
-        str=iraf.wtranback(x,y,mode='h',Stdout=1)
+    # Otherwise use wtranback
+    return _iraf_array(GeoPar,x,y,False)
 
-        # Just show the lines of interest
-        for line in str:
-            if line[0:1] == '!':
-                all_out.appen(line)
-                sys.exit()
+# Transform a position or a list file and compose
+# the text output as from wtraxy/wtranback
+def _trans_text(image1,image2,x,y,List,forward):
 
-            if line[0:3] == ' Xi':
-                all_out.append(line)
+    all_out = []
+
+    # Get the positions
+    if List != None:
+        xy=np.loadtxt(List,usecols=(0,1),ndmin=2)
+        x=xy[:,0]
+        y=xy[:,1]
+    else:
+        x=np.array([float(x)])
+        y=np.array([float(y)])
+
+    # Transform the positions
+    if forward:
+        xin=x
+        yin=y
+        xout,yout=f_array(image1,image2,x,y)
+    else:
+        xout=x
+        yout=y
+        xin,yin=b_array(image1,image2,x,y)
+
+    if List != None:
+        all_out.append("   Xin         Yin         Xout        Yout")
+        for i in range(len(xin)):
+            all_out.append("%10.3f %10.3f %10.3f %10.3f" % (xin[i],yin[i],xout[i],yout[i]))
+    else:
+        all_out.append(" Xin,Yin: %10.3f %10.3f Xout,Yout: %10.3f %10.3f" % (xin[0],yin[0],xout[0],yout[0]))
 
-    # return the output
     return all_out
+
+# Main TRAN methods - f for forward and b for back
+#
+# inimage - the input image which is to have its WCS updated
+# drizimage - the reference image, assumed to contain the drizzle parameters
+#         in its header
+#
+# x,y - a single position for transformation
+#
+# List - a text file name containing x y pairs
+#
+# Both return the text lines as wtraxy/wtranback for interactive
+# use; programs use f_array and b_array on arrays instead.
+#
+def f(origimage,drizimage,x=None,y=None,List=None):
+    return _trans_text(origimage,drizimage,x,y,List,True)
+
+def b(drizimage,origimage,x=None,y=None,List=None):
+    return _trans_text(drizimage,origimage,x,y,List,False)
@@ -123,6 +123,38 @@ class aXeInputList(object):
         """
         return LenGetIter(self)
 
+    def get_image_groups(self):
+        """
+        Group the input by grism image
+
+        The input of the chips of one grism image
+        is collected into one group. The groups and
+        the input therein keep the order of the list.
+
+        @return: the list of groups
+        @rtype: list
+        """
+        from . import axeutils
+
+        # initialize the list
+        groups  = []
+        indices = {}
+
+        # go over all input
+        for axeitem in self.axeinputs:
+
+            # start a new group for a new image
+            grisim = axeutils.getIMAGE(axeitem['GRISIM'])
+            if grisim not in indices:
+                indices[grisim] = len(groups)
+                groups.append([])
+
+            # add the input to its group
+            groups[indices[grisim]].append(axeitem)
+
+        # return the groups
+        return groups
+
     def _identify_columns(self, inlist):
         """
         Identify columns according to the Input Image List format
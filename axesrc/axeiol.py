@@ -26,26 +26,19 @@ but WITHOUT ANY WARRANTY; without even the implied warranty of
 MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
 GNU General Public License for more details.
 """
+import os
+import hashlib
+import numpy as np
+
 from axe import axe_asciidata
 from .axeerror import aXeError
 
-class InputObjectList(axe_asciidata.AsciiData):
+class ObjectListInfo(object):
     """
-    Subclass of the AsciiData class for aXe
+    The column identification for object lists. It works
+    on the column names only and is shared by all types
+    of object lists.
     """
-    def __init__(self, filename):
-        """
-        Initializes the class
-        """
-        # intialize via the superclass
-        super(InputObjectList, self).__init__(filename=filename)
-
-        if self.nrows > 0:
-            # check for the mandatory columns
-            # in the table and save the indices
-            self.mand_cols, self.wav_cols = self._find_columns()
-
-
     def _find_columns(self):
         """
         Identify all important columns
@@ -171,7 +164,7 @@ class InputObjectList(axe_asciidata.AsciiData):
         for index in range(self.ncols):
 
             # get the column name
-            colname = self[index].colname
+            colname = self.get_colname(index)
 
             # try to decode the wavelength
             wave = self.get_wavelength(colname)
@@ -185,7 +178,6 @@ class InputObjectList(axe_asciidata.AsciiData):
         # return the result
         return mag_cols
 
-
     def get_wavelength(self, colname):
         """
         Input:
@@ -235,3 +227,674 @@ class InputObjectList(axe_asciidata.AsciiData):
         return wave
 
 
+class InputObjectList(axe_asciidata.AsciiData, ObjectListInfo):
+    """
+    Subclass of the AsciiData class for aXe
+    """
+    def __init__(self, filename):
+        """
+        Initializes the class
+        """
+        # intialize via the superclass
+        super(InputObjectList, self).__init__(filename=filename)
+
+        if self.nrows > 0:
+            # check for the mandatory columns
+            # in the table and save the indices
+            self.mand_cols, self.wav_cols = self._find_columns()
+
+    def get_colname(self, index):
+        """
+        Get a column name
+
+        @param index: the column index
+        @type index: int
+
+        @return: the column name
+        @rtype: string
+        """
+        return self[index].colname
+
+
+    def select_rows(self, selection):
+        """
+        Keep the selected rows only
+
+        The selected rows are moved to the top of every
+        column, keeping their order. Then the remaining
+        rows are deleted in one go, which avoids deleting
+        the rows one by one.
+
+        @param selection: the flags of the rows to keep
+        @type selection: numpy.ndarray
+        """
+        import numpy as np
+
+        # get the indices of the selected rows
+        kept = np.flatnonzero(selection)
+
+        # nothing to do if all rows are selected
+        if len(kept) == self.nrows:
+            return
+
+        # move the selected rows to the top
+        for index in range(self.ncols):
+            col_data = self[index]._data
+            col_data[:len(kept)] = [col_data[row] for row in kept]
+
+        # delete the remaining rows
+        self.delete(len(kept), self.nrows)
+
+
+class ColumnObjectList(ObjectListInfo):
+    """
+    Input Object List with numpy arrays as columns. The class
+    reads and writes the same SExtractor-type format as the
+    InputObjectList, but keeps every column as a typed array.
+
+    The parsed catalogue is stored in a binary sidecar file
+    next to the text file, which is read in place of the
+    text as long as it belongs to the unchanged catalogue.
+
+    Catalogues in FITS binary tables are read as well. Their
+    columns are memory mapped rather than parsed and cached.
+    """
+    def __init__(self, filename=None, use_cache=True):
+        """
+        Initializes the class
+
+        @param filename: the name of the catalogue
+        @type filename: string
+        @param use_cache: read and write the binary sidecar
+        @type use_cache: boolean
+        """
+        # initialize the data
+        self.filename = filename
+        self.colnames = []
+        self.units    = []
+        self.colcomms = []
+        self.columns  = []
+        self.header   = []
+        self.ncols    = 0
+        self.nrows    = 0
+
+        # load the catalogue, preferably
+        # from the binary sidecar
+        if filename != None:
+            if self.is_fits(filename):
+                self._load_fits(filename)
+            elif not use_cache or not self._read_cache(filename):
+                self._load(filename)
+                if use_cache:
+                    self._write_cache(filename)
+
+        if self.nrows > 0:
+            # all position columns are float;
+            # they are projected later on
+            for colname in ["X_IMAGE", "Y_IMAGE", "A_IMAGE", "B_IMAGE", "THETA_IMAGE",
+                            "X_WORLD", "Y_WORLD", "A_WORLD", "B_WORLD", "THETA_WORLD"]:
+                col_num = self.find(colname)
+                if col_num > -1:
+                    self.columns[col_num] = self.columns[col_num].astype(np.float64)
+
+            # check for the mandatory columns
+            # in the table and save the indices
+            self.mand_cols, self.wav_cols = self._find_columns()
+
+    def __getitem__(self, key):
+        """
+        Get a column
+
+        @param key: the column name or index
+        @type key: string/int
+
+        @return: the column
+        @rtype: numpy.ndarray
+        """
+        return self.columns[self._get_index(key)]
+
+    def __setitem__(self, key, values):
+        """
+        Set a column
+
+        @param key: the column name or index
+        @type key: string/int
+        @param values: the new column values
+        @type values: numpy.ndarray
+        """
+        # check the length
+        values = np.asarray(values)
+        if len(values) != self.nrows:
+            err_msg = 'Catalogue: %s has %i rows, the column has %i!' % (self.filename, self.nrows, len(values))
+            raise aXeError(err_msg)
+
+        # replace the column
+        self.columns[self._get_index(key)] = values
+
+    def _get_index(self, key):
+        """
+        Get the index of a column
+
+        @param key: the column name or index
+        @type key: string/int
+
+        @return: the column index
+        @rtype: int
+        """
+        # an index is just returned
+        if not isinstance(key, str):
+            return key
+
+        # find the column
+        col_num = self.find(key)
+        if col_num < 0:
+            err_msg = 'Catalogue: %s does not contain column "%s" !' % (self.filename, key)
+            raise aXeError(err_msg)
+
+        # return the index
+        return col_num
+
+    def _parse_colheader(self, line):
+        """
+        Parse a SExtractor column description
+
+        @param line: the header line
+        @type line: string
+
+        @return: column number, name, comment and unit or None
+        @rtype: (int, string, string, string)
+        """
+        # split the line
+        items = line[1:].split()
+
+        # check for a column description
+        if len(items) < 2 or not items[0].isdigit():
+            return None
+
+        # separate the unit from the comment
+        rest = ' '.join(items[2:])
+        unit = ''
+        if rest.endswith(']') and rest.rfind('[') > -1:
+            unit = rest[rest.rfind('[')+1:-1]
+            rest = rest[:rest.rfind('[')].strip()
+
+        # return the description
+        return int(items[0]), items[1], rest, unit
+
+    def _to_column(self, tokens):
+        """
+        Convert a column of tokens
+
+        The tokens are converted to integer, if possible,
+        or float. Otherwise they are kept as strings.
+
+        @param tokens: the column tokens
+        @type tokens: numpy.ndarray
+
+        @return: the typed column
+        @rtype: numpy.ndarray
+        """
+        # try integer and float
+        for dtype in [np.int64, np.float64]:
+            try:
+                return tokens.astype(dtype)
+            except ValueError:
+                pass
+
+        # keep the strings
+        return tokens
+
+    def _load(self, filename):
+        """
+        Load a catalogue
+
+        The SExtractor header gives the column names.
+        Then all data rows are split, and each column
+        is converted to a typed array in one go.
+
+        @param filename: the name of the catalogue
+        @type filename: string
+        """
+        # the column descriptions and data rows
+        coldescs = []
+        rows = []
+
+        # go over all lines
+        for line in open(filename):
+            line = line.strip()
+
+            # skip empty lines
+            if len(line) < 1:
+                continue
+
+            # store column descriptions
+            # and other header lines
+            if line[0] == '#':
+                coldesc = self._parse_colheader(line)
+                if coldesc != None:
+                    coldescs.append(coldesc)
+                else:
+                    self.header.append(line)
+                continue
+
+            # store the row
+            rows.append(line.split())
+
+        # determine the number of columns
+        if len(rows) > 0:
+            self.ncols = len(rows[0])
+        elif len(coldescs) > 0:
+            self.ncols = max([coldesc[0] for coldesc in coldescs])
+
+        # name all columns; columns not described
+        # continue a vector column or get a default name
+        self.colnames = ['column%i' % (index+1) for index in range(self.ncols)]
+        self.units    = ['' for index in range(self.ncols)]
+        self.colcomms = ['' for index in range(self.ncols)]
+        coldescs.sort()
+        for index in range(len(coldescs)):
+            colnum, colname, colcomm, unit = coldescs[index]
+            if index+1 < len(coldescs):
+                nextnum = coldescs[index+1][0]
+            else:
+                nextnum = self.ncols+1
+            for vecnum in range(colnum, min(nextnum, self.ncols+1)):
+                if vecnum == colnum:
+                    self.colnames[vecnum-1] = colname
+                else:
+                    self.colnames[vecnum-1] = '%s_%i' % (colname, vecnum-colnum+1)
+                self.units[vecnum-1]    = unit
+                self.colcomms[vecnum-1] = colcomm
+
+        # check the rows
+        for row in rows:
+            if len(row) != self.ncols:
+                err_msg = 'Catalogue: %s has rows with %i and %i columns!' % (filename, self.ncols, len(row))
+                raise aXeError(err_msg)
+
+        # convert the data to typed columns
+        self.nrows = len(rows)
+        if self.nrows > 0:
+            tokens = np.array(rows, dtype=str)
+            self.columns = [self._to_column(tokens[:,index]) for index in range(self.ncols)]
+        else:
+            self.columns = [np.zeros(0, dtype=np.float64) for index in range(self.ncols)]
+
+    def is_fits(self, filename):
+        """
+        Check whether a catalogue is a FITS file
+
+        @param filename: the name of the catalogue
+        @type filename: string
+
+        @return: True for a FITS file
+        @rtype: boolean
+        """
+        infile = open(filename, 'rb')
+        try:
+            return infile.read(6) == b'SIMPLE'
+        finally:
+            infile.close()
+
+    def _load_fits(self, filename):
+        """
+        Load a catalogue from a FITS binary table
+
+        The first binary table extension is used. Its columns
+        stay memory mapped; vector columns are split and named
+        in the same way as vector columns in a SExtractor
+        catalogue.
+
+        @param filename: the name of the catalogue
+        @type filename: string
+        """
+        import astropy.io.fits as pyfits
+
+        # open the file and find the first binary table
+        fits_cat = pyfits.open(filename, memmap=True)
+        try:
+            table = None
+            for hdu in fits_cat[1:]:
+                if isinstance(hdu, pyfits.BinTableHDU):
+                    table = hdu
+                    break
+            if table == None:
+                err_msg = 'Catalogue: %s does not contain a binary table!' % filename
+                raise aXeError(err_msg)
+
+            # go over all table columns
+            for index in range(len(table.columns)):
+                fits_col = table.columns[index]
+                unit = fits_col.unit or ''
+                colcomm = table.header.get('TCOMM%i' % (index+1), '')
+                data = table.data.field(fits_col.name)
+
+                # convert byte strings to text
+                if data.dtype.kind == 'S':
+                    data = np.char.rstrip(np.char.decode(data, 'ascii'))
+
+                # split a vector column
+                if data.ndim > 1:
+                    data = data.reshape(data.shape[0], -1)
+                    vectors = [data[:,vecnum] for vecnum in range(data.shape[1])]
+                else:
+                    vectors = [data]
+
+                # store the column(s)
+                for vecnum in range(len(vectors)):
+                    if vecnum == 0:
+                        self.colnames.append(fits_col.name)
+                    else:
+                        self.colnames.append('%s_%i' % (fits_col.name, vecnum+1))
+                    self.units.append(unit)
+                    self.colcomms.append(colcomm)
+                    self.columns.append(vectors[vecnum])
+
+            # store the dimensions
+            self.ncols = len(self.columns)
+            self.nrows = table.header['NAXIS2']
+        finally:
+            # the memory map stays alive
+            # with the column arrays
+            fits_cat.close()
+
+    def _get_cachename(self, filename):
+        """
+        Get the name of the binary sidecar
+
+        @param filename: the name of the catalogue
+        @type filename: string
+
+        @return: the name of the sidecar
+        @rtype: string
+        """
+        return filename + '.npz'
+
+    def _get_checksum(self, filename):
+        """
+        Compute the md5 checksum of a file
+
+        @param filename: the name of the file
+        @type filename: string
+
+        @return: the hex digest
+        @rtype: string
+        """
+        md5 = hashlib.md5()
+        infile = open(filename, 'rb')
+        try:
+            block = infile.read(1048576)
+            while len(block) > 0:
+                md5.update(block)
+                block = infile.read(1048576)
+        finally:
+            infile.close()
+        return md5.hexdigest()
+
+    def _read_cache(self, filename):
+        """
+        Read the catalogue from the binary sidecar
+
+        The sidecar is valid if size and modification time
+        of the catalogue are unchanged. A sidecar with the
+        same size but a different time is still used if
+        the checksum of the catalogue agrees.
+
+        @param filename: the name of the catalogue
+        @type filename: string
+
+        @return: True if the sidecar was read
+        @rtype: boolean
+        """
+        # check for the sidecar
+        cachename = self._get_cachename(filename)
+        if not os.path.isfile(cachename):
+            return False
+
+        # the properties of the catalogue
+        fstat = os.stat(filename)
+
+        try:
+            cache = np.load(cachename)
+            try:
+                # check size and time, fall back to the checksum
+                size, mtime = cache['fstat']
+                if int(size) != fstat.st_size:
+                    return False
+                if mtime != fstat.st_mtime and str(cache['md5']) != self._get_checksum(filename):
+                    return False
+
+                # transfer the catalogue
+                self.colnames = [str(item) for item in cache['colnames']]
+                self.units    = [str(item) for item in cache['units']]
+                self.colcomms = [str(item) for item in cache['colcomms']]
+                self.header   = [str(item) for item in cache['header']]
+                self.ncols    = len(self.colnames)
+                self.columns  = [cache['col%i' % index] for index in range(self.ncols)]
+                self.nrows    = int(cache['nrows'])
+            finally:
+                cache.close()
+        except (IOError, OSError, KeyError, ValueError):
+            # a damaged sidecar is just ignored
+            self.colnames = []
+            self.units    = []
+            self.colcomms = []
+            self.columns  = []
+            self.header   = []
+            self.ncols    = 0
+            self.nrows    = 0
+            return False
+
+        # return success
+        return True
+
+    def _write_cache(self, filename):
+        """
+        Write the catalogue to the binary sidecar
+
+        The sidecar is written to a temporary file and
+        renamed, such that concurrent readers never see
+        a partial file. Failing to write, e.g. in a
+        read-only directory, is not an error.
+
+        @param filename: the name of the catalogue
+        @type filename: string
+        """
+        # the properties of the catalogue
+        fstat = os.stat(filename)
+
+        # assemble the content
+        content = {}
+        content['fstat']    = np.array([fstat.st_size, fstat.st_mtime], dtype=np.float64)
+        content['md5']      = np.array(self._get_checksum(filename))
+        content['nrows']    = np.array(self.nrows)
+        content['colnames'] = np.array(self.colnames, dtype=str)
+        content['units']    = np.array(self.units, dtype=str)
+        content['colcomms'] = np.array(self.colcomms, dtype=str)
+        content['header']   = np.array(self.header, dtype=str)
+        for index in range(self.ncols):
+            content['col%i' % index] = self.columns[index]
+
+        # write and rename the sidecar
+        cachename = self._get_cachename(filename)
+        tmpname = '%s.%i.tmp' % (cachename, os.getpid())
+        try:
+            outfile = open(tmpname, 'wb')
+            try:
+                np.savez(outfile, **content)
+            finally:
+                outfile.close()
+            os.rename(tmpname, cachename)
+        except (IOError, OSError):
+            if os.path.isfile(tmpname):
+                os.unlink(tmpname)
+
+    def find(self, colname):
+        """
+        Find a column
+
+        @param colname: the column name
+        @type colname: string
+
+        @return: the column index or -1
+        @rtype: int
+        """
+        if colname in self.colnames:
+            return self.colnames.index(colname)
+        return -1
+
+    def get_colname(self, index):
+        """
+        Get a column name
+
+        @param index: the column index
+        @type index: int
+
+        @return: the column name
+        @rtype: string
+        """
+        return self.colnames[index]
+
+    def select_rows(self, selection):
+        """
+        Keep the selected rows only
+
+        @param selection: the flags of the rows to keep
+        @type selection: numpy.ndarray
+        """
+        # slice all columns
+        self.columns = [column[selection] for column in self.columns]
+        if self.ncols > 0:
+            self.nrows = len(self.columns[0])
+
+    def copy_columns(self, colnames):
+        """
+        Copy columns to a new list
+
+        The columns are copied as array slices. The
+        column identification is not done again.
+
+        @param colnames: the names of the columns to copy
+        @type colnames: [string]
+
+        @return: the new object list
+        @rtype: ColumnObjectList
+        """
+        # make an empty list
+        new_list = ColumnObjectList()
+
+        # transfer the column data
+        for colname in colnames:
+            index = self._get_index(colname)
+            new_list.colnames.append(self.colnames[index])
+            new_list.units.append(self.units[index])
+            new_list.colcomms.append(self.colcomms[index])
+            new_list.columns.append(self.columns[index].copy())
+
+        # set the dimensions
+        new_list.ncols = len(new_list.columns)
+        new_list.nrows = self.nrows
+
+        # return the new list
+        return new_list
+
+    def copy_rows(self, rows):
+        """
+        Copy rows to a new list
+
+        Only the given rows of all columns are copied,
+        such that the full list is never duplicated. The
+        column identification is not done again.
+
+        @param rows: the indices of the rows to copy
+        @type rows: numpy.ndarray
+
+        @return: the new object list
+        @rtype: ColumnObjectList
+        """
+        # make an empty list
+        new_list = ColumnObjectList()
+
+        # transfer the description and the selected rows
+        new_list.filename = self.filename
+        new_list.colnames = list(self.colnames)
+        new_list.units    = list(self.units)
+        new_list.colcomms = list(self.colcomms)
+        new_list.header   = list(self.header)
+        new_list.columns  = [column[rows] for column in self.columns]
+
+        # set the dimensions
+        new_list.ncols = len(new_list.columns)
+        new_list.nrows = len(rows)
+
+        # return the new list
+        return new_list
+
+    def _format_column(self, column, colname):
+        """
+        Format a column for output
+
+        String values must be non-empty and free of
+        whitespace, since the columns in the output
+        are separated by whitespace.
+
+        @param column: the column
+        @type column: numpy.ndarray
+        @param colname: the column name
+        @type colname: string
+
+        @return: the formatted values
+        @rtype: [string]
+        """
+        # select the format from the type
+        if column.dtype.kind in 'iu':
+            col_format = '%i'
+        elif column.dtype.kind == 'f':
+            col_format = '%.12g'
+        else:
+            col_format = '%s'
+
+            # convert byte strings to text
+            if column.dtype.kind == 'S':
+                column = np.char.decode(column, 'ascii')
+
+            # check for values that would break the columns
+            for value in column.tolist():
+                if len(value.split()) != 1:
+                    err_msg = 'Column: %s has the value "%s", which is empty or contains whitespace!' % (colname, value)
+                    raise aXeError(err_msg)
+
+        # format all values
+        return [col_format % value for value in column.tolist()]
+
+    def writeto(self, filename):
+        """
+        Write the list to a file
+
+        The list is written in SExtractor format, with the
+        column descriptions in the header.
+
+        @param filename: the name of the output file
+        @type filename: string
+        """
+        # open the file
+        out_file = open(filename, 'w')
+
+        # write the column descriptions
+        for index in range(self.ncols):
+            colline = '# %3i %-22s %s' % (index+1, self.colnames[index], self.colcomms[index])
+            if len(self.units[index]) > 0:
+                colline += ' [%s]' % self.units[index]
+            out_file.write(colline.rstrip() + '\n')
+
+        # write the other header lines
+        for line in self.header:
+            out_file.write(line + '\n')
+
+        # format and write the rows
+        formatted = [self._format_column(self.columns[index], self.colnames[index]) for index in range(self.ncols)]
+        for row in zip(*formatted):
+            out_file.write(' '.join(row) + '\n')
+
+        # close the file
+        out_file.close()
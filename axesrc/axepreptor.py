@@ -31,9 +31,102 @@ but WITHOUT ANY WARRANTY; without even the implied warranty of
 MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
 GNU General Public License for more details.
 """
+import os
+
 from . import axeutils
 from .axeerror import aXeError
 
+def get_master_bck(filename):
+    """
+    Get the data of a master background
+
+    Master backgrounds are opened once per process and kept
+    memory mapped and read-only. Processes which share the
+    same master background thus share the pages of the file.
+    The image is opened again if its modification time or
+    size has changed.
+
+    @param filename: the master background image
+    @type filename: string
+
+    @return: the master background data
+    @rtype: numpy.ndarray
+    """
+    from astropy.io import fits as pyfits
+
+    # the identification of the image
+    filepath = os.path.abspath(filename)
+    fstat = os.stat(filepath)
+    fident = (fstat.st_mtime, fstat.st_size)
+
+    # open the image if it is new or changed
+    if filepath not in _master_bck_list or _master_bck_list[filepath][0] != fident:
+        if filepath in _master_bck_list:
+            _master_bck_list[filepath][1].close()
+        bck_file = pyfits.open(filepath, 'readonly', memmap=True)
+        bck_data = bck_file[0].data
+        bck_data.flags.writeable = False
+        _master_bck_list[filepath] = (fident, bck_file, bck_data)
+
+    # return the data
+    return _master_bck_list[filepath][2]
+
+# the master backgrounds opened
+# in this process, indexed by path
+_master_bck_list = {}
+
+class ImageSession(object):
+    """
+    Update session on an image
+
+    The image is opened once in update mode and memory mapped.
+    All changes to data and headers are made on the open image
+    and written back in a single flush when the session closes.
+    """
+    def __init__(self, image):
+        """
+        Initializes the object
+
+        @param image: the image name
+        @type image: string
+        """
+        self.image    = image
+        self.fits_img = None
+
+    def __getitem__(self, key):
+        """
+        Get an extension of the image
+
+        The image is opened with the first access.
+
+        @param key: the extension index or (name, version)
+        @type key: int or (string, int)
+
+        @return: the extension
+        @rtype: HDU
+        """
+        from astropy.io import fits as pyfits
+
+        # open the image
+        if self.fits_img == None:
+            self.fits_img = pyfits.open(self.image, 'update', memmap=True)
+
+        # return the extension
+        return self.fits_img[key]
+
+    def close(self):
+        """
+        Write all changes and close the image
+        """
+        if self.fits_img != None:
+            try:
+                self.fits_img.close()
+            finally:
+                self.fits_img = None
+
+                # the cached headers are outdated
+                axeutils.clear_fits_keys(self.image)
+
 class aXePrepArator(object):
     def __init__(self, grisim, objcat, dirim, config, dmag, **params):
         """
@@ -52,54 +145,52 @@ class aXePrepArator(object):
         if 'master_bck' in params:
             self.master_bck = params['master_bck']
 
+        # the update session on the grism image
+        self.grism_session = None
+
+        # the pending pixel operations
+        self._reset_pixel_ops()
+
     def _is_nicmos_data(self):
         """
         Check whether the data comes from NICMOS
         """
-        from astropy.io import fits as pyfits
-
-        # open the image
-        fits_img = pyfits.open(axeutils.getIMAGE(self.grisim), 'readonly')
+        # get the keywords of the primary header
+        prim_header = axeutils.get_fits_keys(axeutils.getIMAGE(self.grisim))[0]
 
-        # open the image
-        if 'INSTRUME' in fits_img[0].header:
+        # check the instrument
+        if 'INSTRUME' in prim_header:
 
             # check whether the instrument IS NICMOS
-            instrument = fits_img[0].header['INSTRUME']
+            instrument = prim_header['INSTRUME']
             if instrument.find('NICMOS') > -1:
 
-                # close image and return True
-                fits_img.close()
+                # return True
                 return 1
 
-        # close image and return False
-        fits_img.close()
+        # return False
         return 0
 
     def _is_wfc3ir_data(self):
         """
         Check whether the data comes from WFC3 IR channel
         """
-        from astropy.io import fits as pyfits
-
-        # open the image
-        fits_img = pyfits.open(axeutils.getIMAGE(self.grisim), 'readonly')
+        # get the keywords of the primary header
+        prim_header = axeutils.get_fits_keys(axeutils.getIMAGE(self.grisim))[0]
 
-        # open the image
-        if 'INSTRUME' in fits_img[0].header:
+        # check the instrument
+        if 'INSTRUME' in prim_header:
 
             # check whether the instrument IS NICMOS
-            instrument = fits_img[0].header['INSTRUME']
+            instrument = prim_header['INSTRUME']
             if instrument.find('WFC3') > -1:
 
                 # check whether the detector IS IR
-                if 'DETECTOR' in fits_img[0].header and fits_img[0].header['DETECTOR'].find('IR') > -1:
-                    # close image and return True
-                    fits_img.close()
+                if 'DETECTOR' in prim_header and prim_header['DETECTOR'].find('IR') > -1:
+                    # return True
                     return 1
 
-        # close image and return False
-        fits_img.close()
+        # return False
         return 0
 
     def _make_mask(self):
@@ -141,7 +232,6 @@ class aXePrepArator(object):
         from iraf import stsdas
 
         from astropy.io import fits as pyfits
-        import stsci.imagestats as imagestats
 
         # get the axe names
         axe_names = axeutils.get_axe_names(self.grisim, ext_info)
@@ -149,71 +239,47 @@ class aXePrepArator(object):
         msk_image_sc = axe_names['MSK']   + '[SCI]'
 
         # check for a previous background subtraction
-        fits_img  = pyfits.open(axeutils.getIMAGE(self.grisim), 'readonly')
-        fits_head = fits_img[ext_info['fits_ext']].header
-        npix = int(fits_head['NAXIS1']) * int(fits_head['NAXIS1'])
+        grism_header = self.grism_session[ext_info['fits_ext']].header
+        npix = int(grism_header['NAXIS1']) * int(grism_header['NAXIS1'])
 
-        if 'AXEPRBCK' in fits_head:
+        if 'AXEPRBCK' in grism_header:
             # warn that this is the second time
             print('WARNING: Image %25s seems to be already background subtracted!' % axeutils.getIMAGE(self.grisim))
 
-        # close the fits
-        fits_img.close()
-
-        # Compute the ratio of the grism SCI image to the background image
-        sci_file = pyfits.open(axeutils.getIMAGE(self.grisim),'readonly')
-        sci_data = sci_file['SCI',ext_info['ext_version']].data
-        bck_file = pyfits.open(axeutils.getCONF(self.master_bck),'readonly')
-        bck_data = bck_file[0].data
-        sci_data /= bck_data
+        # the subsampling for the statistics
+        if 'skysample' in self.params and self.params['skysample'] != None:
+            subsample = max(int(self.params['skysample']), 1)
+        else:
+            subsample = 1
 
-        # Flag pixels in the ratio image based on the grism image DQ array
-        dq_data = sci_file['DQ',ext_info['ext_version']].data
-        sci_data[dq_data > 0.5] = -1.0e10
+        # get the grism and the background image
+        grism_sci = self.grism_session['SCI',ext_info['ext_version']].data
+        bck_data = get_master_bck(axeutils.getCONF(self.master_bck))
 
-        # Flag pixels in the ratio image based on the grism image MSK file
+        # Mark the valid pixels based on the grism image DQ array
+        # and on the grism image MSK file
+        dq_data = self.grism_session['DQ',ext_info['ext_version']].data
         msk_file = pyfits.open(axeutils.getOUTPUT(msk_image_sc.split("[")[0]), 'readonly')
         msk_data = msk_file['SCI'].data
-        sci_data[msk_data < -900000] = -1.0e10
+        valid = (dq_data <= 0.5) & (msk_data >= -900000)
+        msk_file.close()
 
-        # Flag pixels in the background image based on the grism image DQ
-        # and MSK file
-        bck_data[dq_data > 0.5] = -1.0e10
-        bck_data[msk_data < -900000] = -1.0e10
+        # Compute the ratio of the grism SCI image to the background image
+        # for the valid (subsampled) pixels only
+        valid_sub = valid.ravel()[::subsample]
+        ratio = grism_sci.ravel()[::subsample][valid_sub] / bck_data.ravel()[::subsample][valid_sub]
 
         # Compute stats for the ratio image
-        stats = imagestats.ImageStats(sci_data[sci_data > -1.0e9],
-                                      fields='midpt,stddev,npix', lower=None,
-                                      upper=None, nclip=3, lsig=3.0, usig=3.0,
-                                      binwidth=0.01)
-        flt_ave = stats.midpt
-        flt_std = stats.stddev
-        flt_npx = stats.npix
-        frac_pix = float(flt_npx)/float(npix)
+        flt_ave, flt_std, flt_npx = axeutils.get_clipped_stats(ratio, nclip=3, lsig=3.0, usig=3.0,
+                                                               binwidth=0.01)
+        frac_pix = float(flt_npx * subsample)/float(npix)
 
         # Compute stats for the background image
-        stats = imagestats.ImageStats(bck_data[bck_data > -1.0e9],
-                                      fields='midpt,stddev,npix', lower=None,
-                                      upper=None, nclip=3, lsig=3.0, usig=3.0,
-                                      binwidth=0.01)
-        mst_ave = stats.midpt
-        mst_std = stats.stddev
-        mst_npx = stats.npix
-
-        sci_file.close()
-        bck_file.close()
-        msk_file.close()
+        mst_ave, mst_std, mst_npx = axeutils.get_clipped_stats(bck_data, valid, nclip=3, lsig=3.0, usig=3.0,
+                                                               binwidth=0.01, subsample=subsample)
 
         # Subtract the scaled background from the grism image
-        sci_file = pyfits.open(axeutils.getIMAGE(self.grisim),'update')
-        bck_file = pyfits.open(axeutils.getCONF(self.master_bck),'readonly')
-        sci_file['SCI',ext_info['ext_version']].data -= flt_ave*bck_file[0].data
-        sci_file.close()
-        bck_file.close()
-
-        # open the fits image ands isolate the correct extension
-        grism_img    = pyfits.open(axeutils.getIMAGE(self.grisim), 'update')
-        grism_header = grism_img[ext_info['fits_ext']].header
+        self._set_background(None, bck_data, flt_ave)
 
         # write some header iformation
         grism_header['SKY_SCAL'] = (float(flt_ave),  'scaling value for the master background')
@@ -222,9 +288,6 @@ class aXePrepArator(object):
         grism_header['F_SKYPIX'] = (frac_pix,        'fraction of pixels used for scaling')
         grism_header['AXEPRBCK'] = ('Done',          'flag that background subtraction was done')
 
-        # save the image
-        grism_img.close()
-
         return 0
 
     def _subtract_nicsky(self, ext_info):
@@ -245,17 +308,13 @@ class aXePrepArator(object):
         axe_names = axeutils.get_axe_names(self.grisim, ext_info)
 
         # check for a previous background subtraction
-        fits_img  = pyfits.open(axeutils.getIMAGE(self.grisim), 'readonly')
-        fits_head = fits_img[ext_info['fits_ext']].header
-        npix = int(fits_head['NAXIS1']) * int(fits_head['NAXIS1'])
+        grism_header = self.grism_session[ext_info['fits_ext']].header
+        npix = int(grism_header['NAXIS1']) * int(grism_header['NAXIS1'])
 
-        if 'AXEPRBCK' in fits_head:
+        if 'AXEPRBCK' in grism_header:
             # warn that this is the second time
             print('WARNING: Image %25s seems to be already background subtracted!' % axeutils.getIMAGE(self.grisim))
 
-        # close the fits
-        fits_img.close()
-
         # do the special background fitting for NICMOS
         if self.params['backped'] != None:
             nicback = axelowlev.aXe_NICBACK(self.grisim, self.config, self.master_bck, self.params['backped'])
@@ -269,20 +328,12 @@ class aXePrepArator(object):
             err_msg = 'The background image: %s does NOT exist!' % axeutils.getOUTPUT(axe_names['NBCK'])
             raise aXeError(err_msg)
 
-        # Subtract the scaled background image from the grism image
-        sci_file = pyfits.open(axeutils.getIMAGE(self.grisim), 'update')
-        bck_file = pyfits.open(axeutils.getOUTPUT(axe_names['NBCK']),'readonly')
-        sci_file['SCI',ext_info['ext_version']].data -= bck_file[1].data
-        sci_file.close()
-        bck_file.close()
-
         # open the background image
-        fits_img  = pyfits.open(axeutils.getOUTPUT(axe_names['NBCK']), 'readonly')
+        fits_img  = pyfits.open(axeutils.getOUTPUT(axe_names['NBCK']),'readonly')
         fits_head = fits_img['BCK'].header
 
-        # open the grism image and isolate the correct extension header
-        grism_img    = pyfits.open(axeutils.getIMAGE(self.grisim), 'update')
-        grism_header = grism_img[ext_info['fits_ext']].header
+        # Subtract the scaled background image from the grism image
+        self._set_background(fits_img, fits_img[1].data, 1.0)
 
         if 'SKY_SCAL' in fits_head and 'F_SKYPIX' in fits_head:
 
@@ -291,18 +342,12 @@ class aXePrepArator(object):
             grism_header['SKY_SCAL'] = (float(fits_head['SKY_SCAL']), 'scaling value of background')
             grism_header['F_SKYPIX'] = (float(fits_head['F_SKYPIX']), 'fraction of pixels used for scaling')
 
-        # close the fits again
-        fits_img.close()
-
         # write some keywords
         grism_header['AXEPRBCK'] = ('Done', 'flag that background subtraction was done')
         grism_header['SKY_IMG'] =  (self.master_bck, 'name of the 1st master background image')
         if self.params['backped'] != None:
             grism_header['SKY_IMG2'] = (self.params['backped'], 'name of the 2nd master background image')
 
-        # close the image again
-        grism_img.close()
-
         return True
 
     def _subtract_wfc3irsky(self, ext_info):
@@ -323,17 +368,13 @@ class aXePrepArator(object):
         axe_names = axeutils.get_axe_names(self.grisim, ext_info)
 
         # check for a previous background subtraction
-        fits_img  = pyfits.open(axeutils.getIMAGE(self.grisim), 'readonly')
-        fits_head = fits_img[ext_info['fits_ext']].header
-        npix = int(fits_head['NAXIS1']) * int(fits_head['NAXIS1'])
+        grism_header = self.grism_session[ext_info['fits_ext']].header
+        npix = int(grism_header['NAXIS1']) * int(grism_header['NAXIS1'])
 
-        if 'AXEPRBCK' in fits_head:
+        if 'AXEPRBCK' in grism_header:
             # warn that this is the second time
             print('WARNING: Image %25s seems to be already background subtracted!' % axeutils.getIMAGE(self.grisim))
 
-        # close the fits
-        fits_img.close()
-
 
         scalebck = axelowlev.aXe_SCALEBCK(self.grisim, axe_names['MSK'], self.config, self.master_bck)
         try:
@@ -356,20 +397,12 @@ class aXePrepArator(object):
             print("Low fraction of sky pixels found (<10%) continuing WITHOUT sky subtraction")
             return False
 
-        # Subtract the scaled background image from the grism image
-        sci_file = pyfits.open(axeutils.getIMAGE(self.grisim), 'update')
-        bck_file = pyfits.open(bckfilename)
-        sci_file['SCI',ext_info['ext_version']].data -= bck_file[1].data
-        sci_file.close()
-        bck_file.close()
-
         # open the background image
         fits_img  = pyfits.open(bckfilename, 'readonly')
         fits_head = fits_img[0].header
 
-        # open the grism image and isolate the correct extension header
-        grism_img    = pyfits.open(axeutils.getIMAGE(self.grisim), 'update')
-        grism_header = grism_img[ext_info['fits_ext']].header
+        # Subtract the scaled background image from the grism image
+        self._set_background(fits_img, fits_img[1].data, 1.0)
 
         # write some information into the
         # grism image header
@@ -380,12 +413,6 @@ class aXePrepArator(object):
         grism_header['F_SKYPIX'] =  (float(fits_head['FRACFIN']), 'fraction of pixels used for scaling')
         grism_header['SKY_CPS'] = (float(fits_head['SCALVAL']),  'scale used for master sky == sky value [cps]')
 
-        # close the grism image
-        # and the scaled image
-        fits_img.close()
-        grism_img.close()
-
-
         return True
 
     def _subtract_background(self, ext_info):
@@ -394,9 +421,6 @@ class aXePrepArator(object):
         """
         goodreturn=True
 
-        # generate the mask image
-        self._make_mask()
-
         # check whether we have NICMOS
         if self._is_nicmos_data():
             # make normal background subtraction
@@ -528,8 +552,7 @@ class aXePrepArator(object):
 
 
         # check for a previous normalization
-        fits_img  = pyfits.open(axeutils.getIMAGE(self.grisim), 'readonly')
-        fits_head = fits_img[ext_info['fits_ext']].header
+        fits_head = self.grism_session[ext_info['fits_ext']].header
 
         if 'AXEPRNOR' in fits_head:
             # check whether a second normalization
@@ -543,21 +566,17 @@ class aXePrepArator(object):
             exptime_kword = conf.get_gvalue('EXPTIME')
 
         # get the exposure time
-        exptime = fits_img[0].header[exptime_kword]
+        exptime = self.grism_session[0].header[exptime_kword]
 
         if dec:
             pstring = 'AXEPREP: Image %25s[SCI,%s] exposure time %7.1f.' % (self.grisim, str(ext_info['ext_version']), exptime)
             print(pstring)
 
             # Divide the grism image SCI and ERR arrays by exptime
-            file_a = pyfits.open(axeutils.getIMAGE(self.grisim), 'update')
-            file_a['SCI',ext_info['ext_version']].data /= exptime
-            file_a['ERR',ext_info['ext_version']].data /= exptime
-            file_a.close()
+            self.flux_scale /= exptime
 
-            # open the grism image and isolate the correct header
-            grism_img    = pyfits.open(axeutils.getIMAGE(self.grisim), 'update')
-            grism_header = grism_img[ext_info['fits_ext']].header
+            # isolate the correct header
+            grism_header = fits_head
 
             # write a header entry
             grism_header['AXEPRNOR'] = ('Done',  'flag that exposure time normal. was done')
@@ -603,14 +622,9 @@ class aXePrepArator(object):
             # into a defined descriptor for later use
             grism_header['SKY_CPS'] = ( sky_cps,  'sky level in cps')
 
-            # close the fits image
-            grism_img.close()
-
         else:
             return -1
 
-        fits_img.close()
-
         return 0
 
     def _apply_gain_correction(self, ext_info):
@@ -635,79 +649,235 @@ class aXePrepArator(object):
             dec = report_warning(100,image=putIMAGE(grism_image))
         """
 
-        # open the fits image
-        fits_img  = pyfits.open(axeutils.getIMAGE(self.grisim), 'readonly')
-
         # get the gain
         # for NICMOS:
-        gain = float(fits_img[0].header['ADCGAIN'])
+        gain = float(self.grism_session[0].header['ADCGAIN'])
         # for ACS/HRC:
-        #gain = float(fits_img[0].header['CCDGAIN'])
+        #gain = float(self.grism_session[0].header['CCDGAIN'])
 
         # get the header of the target extension
-        fits_head = fits_img[ext_info['fits_ext']].header
+        fits_head = self.grism_session[ext_info['fits_ext']].header
         if 'AXEGAINC' in fits_head:
             dec = self._check_second_gaincorr()
 
-        # close the fits image again
-        fits_img.close()
-
         # multiply both the sci and the error array by the gain
-        file_a = pyfits.open(axeutils.getIMAGE(self.grisim), 'update')
-        file_a["SCI"].data *= gain
-        file_a["ERR"].data *= gain
-        file_a.close()
-
-        # open the fits image
-        fits_img  = pyfits.open(axeutils.getIMAGE(self.grisim), 'update')
+        self.flux_scale *= gain
 
         # write the flag into the science extension
-        fits_img[ext_info['fits_ext']].header['AXEGAINC'] = ( 'Done',        'flag that gain correction was done')
+        fits_head['AXEGAINC'] = ( 'Done',        'flag that gain correction was done')
 
         # write the flag into the error extension, assuming it to be next to the science extension
-        fits_img[ext_info['fits_ext']+1].header['AXEGAINC'] = ( 'Done',        'flag that gain correction was done')
+        self.grism_session[ext_info['fits_ext']+1].header['AXEGAINC'] = ( 'Done',        'flag that gain correction was done')
+
 
-        # close the image
-        fits_img.close()
+    def _reset_pixel_ops(self):
+        """
+        Reset the pending pixel operations
+        """
+        # the flux scale for SCI and ERR
+        self.flux_scale = 1.0
 
+        # the background to subtract
+        # from SCI, and its scale
+        self.bck_data  = None
+        self.bck_scale = 0.0
 
-    def run(self):
+        # the open background image
+        self.bck_file = None
+
+    def _set_background(self, bck_file, bck_data, bck_scale):
         """
-        Run AXEPREP on one slitless image
+        Set the background to subtract
+
+        The subtraction is done later on together
+        with the flux scaling.
+
+        @param bck_file: the open background image
+        @type bck_file: HDUList
+        @param bck_data: the background data
+        @type bck_data: numpy.ndarray
+        @param bck_scale: the scale for the background
+        @type bck_scale: float
+        """
+        self.bck_file  = bck_file
+        self.bck_data  = bck_data
+        self.bck_scale = bck_scale
+
+    def _apply_pixel_ops(self, ext_info, nrows=256):
+        """
+        Apply the background subtraction and flux scaling
+
+        The background subtraction, the normalisation to
+        exposure time and the gain correction are combined
+        into one scale and one background term, which are
+        applied in a single pass over SCI and ERR:
+
+        SCI = flux_scale * SCI - flux_scale * bck_scale * BCK
+        ERR = flux_scale * ERR
+
+        The image is processed in blocks of rows.
+
+        @param ext_info: the extension information
+        @type ext_info: dict
+        @param nrows: the number of rows per block
+        @type nrows: int
+        """
+        # check whether there is anything to do
+        if self.bck_data is None and self.flux_scale == 1.0:
+            return
+
+        # get the data
+        sci_data = self.grism_session['SCI',ext_info['ext_version']].data
+        if self.flux_scale != 1.0:
+            err_data = self.grism_session['ERR',ext_info['ext_version']].data
+
+        # the combined background scale
+        bck_scale = self.flux_scale * self.bck_scale
+
+        # go over all blocks of rows
+        for row in range(0, sci_data.shape[0], nrows):
+            sci_rows = sci_data[row:row+nrows]
+
+            # scale SCI and ERR
+            if self.flux_scale != 1.0:
+                sci_rows *= self.flux_scale
+                err_data[row:row+nrows] *= self.flux_scale
+
+            # subtract the background
+            if self.bck_data is not None:
+                sci_rows -= bck_scale * self.bck_data[row:row+nrows]
+
+    def run_tasks(self):
+        """
+        Run the aXe tasks for one slitless image
+
+        The tasks only read the grism image and write
+        files of their own. For the chips of one grism
+        image they can therefore run at the same time.
+        """
+        # generate the mask image
+        if 'backgr' in self.params and self.params['backgr']:
+            self._make_mask()
+
+    def run_update(self, grism_session=None):
+        """
+        Update one slitless image
+
+        All changes to the grism image are made in one session.
+        A session given as input is shared with the other chips
+        of the image and is left open, otherwise an own session
+        is opened and closed.
+
+        @param grism_session: the session on the grism image
+        @type grism_session: ImageSession
         """
         from . import configfile
 
         # load the configuration files;
         # get the extension info
-        conf = configfile.ConfigFile(axeutils.getCONF(self.config))
+        conf = configfile.load_config(axeutils.getCONF(self.config))
         ext_info = axeutils.get_ext_info(axeutils.getIMAGE(self.grisim), conf)
 
-        # make a background PET if necessary
-        if 'backgr' in self.params and self.params['backgr']:
-            self._subtract_background(ext_info)
+        # all changes to the grism image are
+        # made in one session and written once
+        if grism_session != None:
+            self.grism_session = grism_session
+        else:
+            self.grism_session = ImageSession(axeutils.getIMAGE(self.grisim))
+        try:
+            # make a background PET if necessary
+            if 'backgr' in self.params and self.params['backgr']:
+                self._subtract_background(ext_info)
 
-        # make a background PET if necessary
-        if 'norm' in self.params and self.params['norm']:
-            self._transform_to_cps(ext_info, conf)
+            # make a background PET if necessary
+            if 'norm' in self.params and self.params['norm']:
+                self._transform_to_cps(ext_info, conf)
 
-        # check wheter the gain correction is desired
-        if 'gcorr' in self.params and self.params['gcorr']:
+            # check wheter the gain correction is desired
+            if 'gcorr' in self.params and self.params['gcorr']:
 
-            # check whether we have NICMOS data
-            if not self._is_nicmos_data():
+                # check whether we have NICMOS data
+                if not self._is_nicmos_data():
 
-                # check whether gain correction IS desired
-                if self._check_gain_correction():
+                    # check whether gain correction IS desired
+                    if self._check_gain_correction():
 
-                    # make the gain correction
-                    self._apply_gain_correction(ext_info)
+                        # make the gain correction
+                        self._apply_gain_correction(ext_info)
 
-            else:
+                else:
 
-                # make the gain correction
-                self._apply_gain_correction(ext_info)
+                    # make the gain correction
+                    self._apply_gain_correction(ext_info)
+        finally:
+            try:
+                # apply the pixel operations
+                # of all steps done
+                self._apply_pixel_ops(ext_info)
+            finally:
+                # write the changes
+                # of an own session
+                if grism_session == None:
+                    self.grism_session.close()
+                self.grism_session = None
+
+                # close the background image
+                if self.bck_file != None:
+                    self.bck_file.close()
+                self._reset_pixel_ops()
 
         del conf
 
         # return something
         return 1
+
+    def run(self):
+        """
+        Run AXEPREP on one slitless image
+        """
+        # run the tasks
+        self.run_tasks()
+
+        # update the image
+        return self.run_update()
+
+
+def prep_image(prep_list, ncpus=1):
+    """
+    Run AXEPREP on the chips of one slitless image
+
+    The aXe tasks of the chips only read the grism image
+    and run in parallel processes. The updates of the grism
+    image are then made chip by chip in this process on one
+    shared session. That way the image is opened and written
+    once, and no two chips write to the image at the same time.
+
+    @param prep_list: the prepare-objects of the chips
+    @type prep_list: list
+    @param ncpus: the number of processes
+    @type ncpus: int
+    """
+    # run the tasks of all chips,
+    # in parallel if requested
+    axeutils.map_processes(_run_prep_tasks, prep_list, ncpus)
+
+    # update the grism image chip by chip
+    grism_session = ImageSession(axeutils.getIMAGE(prep_list[0].grisim))
+    try:
+        for aXePrep in prep_list:
+            aXePrep.run_update(grism_session)
+    finally:
+        grism_session.close()
+
+
+def _run_prep_tasks(aXePrep):
+    """
+    Run the aXe tasks of one chip
+
+    The function is on the module level such that
+    it can be handed over to the worker processes.
+
+    @param aXePrep: the prepare-object
+    @type aXePrep: aXePrepArator
+    """
+    aXePrep.run_tasks()
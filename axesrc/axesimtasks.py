@@ -290,7 +290,7 @@ def simdirim(incat=None, config=None, tpass_direct=None, dirim_name=None,
 
 
     # load the aXe configuration file
-    conf = configfile.ConfigFile(getCONF(config))
+    conf = configfile.load_config(getCONF(config), writable=True)
 
     # make the simulation configuration
     # file pointing the correct extensions
@@ -301,7 +301,7 @@ def simdirim(incat=None, config=None, tpass_direct=None, dirim_name=None,
     del conf
 
     # load the simulation configuration file
-    conf_simul = configfile.ConfigFile(getCONF(config_simul))
+    conf_simul = configfile.load_config(getCONF(config_simul))
 
     print('SIMDIRIM: Input Model Object List:       %s' % getIMAGE(incat))
     print('SIMDIRIM: Input aXe configuration file:  %s' % getCONF(config))
@@ -482,7 +482,7 @@ def simdispim(incat=None, config=None, lambda_psf=None, dispim_name=None,
         bck_flux = getCONF(bck_flux)
 
     # load the aXe configuration file
-    conf = configfile.ConfigFile(getCONF(config))
+    conf = configfile.load_config(getCONF(config), writable=True)
 
     # make the simulation configuration
     # file pointing the correct extensions
@@ -493,7 +493,7 @@ def simdispim(incat=None, config=None, lambda_psf=None, dispim_name=None,
     del conf
 
     # load the simulation configuration file
-    conf_simul = configfile.ConfigFile(getCONF(config_simul))
+    conf_simul = configfile.load_config(getCONF(config_simul))
 
     # make sure a reasonable default
     # for lambda_psf is given if needed
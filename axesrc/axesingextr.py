@@ -156,28 +156,48 @@ class aXeSpcExtr(object):
                        cont_map=True, in_af=cont_oaf)
 
 
-    def run(self):
+    def _get_ext_info(self):
         """
+        Get the extension info of the grism image
         """
         from . import configfile
-        from . import nlincoeffs
 
         # load the configuration files;
         # get the extension info
-        conf = configfile.ConfigFile(axeutils.getCONF(self.config))
+        conf = configfile.load_config(axeutils.getCONF(self.config))
         ext_info = axeutils.get_ext_info(axeutils.getIMAGE(self.grisim), conf)
         del conf
 
+        # return the info
+        return ext_info
+
+    def run_update(self):
+        """
+        Update one slitless image
+
+        The updates of the grism image header are made
+        here, such that they can be made chip by chip.
+        """
+        from . import nlincoeffs
+
         if ('drzfwhm' in self.params and self.params['drzfwhm']) or \
             ('cont_model' in self.params and axeutils.is_quant_contam(self.params['cont_model'])):
 
             # generate the non-linear distortions from the IDCTAB;
             # store them in the fits-file header
-            nlins = nlincoeffs.NonLinCoeffs(axeutils.getIMAGE(self.grisim), ext_info)
+            nlins = nlincoeffs.NonLinCoeffs(axeutils.getIMAGE(self.grisim), self._get_ext_info())
             nlins.make()
             nlins.store_coeffs()
             del nlins
 
+    def run_tasks(self):
+        """
+        Run the aXe tasks for one slitless image
+
+        The tasks only read the grism image and write
+        files of their own. For the chips of one grism
+        image they can therefore run at the same time.
+        """
         # make the object PET's
         self._make_objPET()
 
@@ -192,4 +212,51 @@ class aXeSpcExtr(object):
         # make the proper non-quantitative contamination
         if ('drzfwhm' in self.params and self.params['drzfwhm']) and \
             ('cont_model' in self.params and not axeutils.is_quant_contam(self.params['cont_model'])):
-            self._make_drzgeocont(ext_info)
\ No newline at end of file
+            self._make_drzgeocont(self._get_ext_info())
+
+    def run(self):
+        """
+        Run AXECORE on one slitless image
+        """
+        # update the image
+        self.run_update()
+
+        # run the tasks
+        self.run_tasks()
+
+
+def extr_image(extr_list, ncpus=1):
+    """
+    Run AXECORE on the chips of one slitless image
+
+    The header updates of the grism image are made chip
+    by chip in this process, such that no two chips write
+    to the image at the same time. Then the aXe tasks of the
+    chips, which only read the grism image, run in parallel
+    processes.
+
+    @param extr_list: the extraction objects of the chips
+    @type extr_list: list
+    @param ncpus: the number of processes
+    @type ncpus: int
+    """
+    # update the grism image chip by chip
+    for aXeNator in extr_list:
+        aXeNator.run_update()
+
+    # run the tasks of all chips,
+    # in parallel if requested
+    axeutils.map_processes(_run_extr_tasks, extr_list, ncpus)
+
+
+def _run_extr_tasks(aXeNator):
+    """
+    Run the aXe tasks of one chip
+
+    The function is on the module level such that
+    it can be handed over to the worker processes.
+
+    @param aXeNator: the extraction object
+    @type aXeNator: aXeSpcExtr
+    """
+    aXeNator.run_tasks()
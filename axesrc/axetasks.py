@@ -18,7 +18,8 @@ opportunities provided by the earth-orbiting Hubble Space Telescope.
 def iolprep(mdrizzle_image='',
             input_cat='',
             dim_info='0,0,0,0',
-            useMdriz=True):
+            useMdriz=True,
+            ncpus=1):
     """
     Function for the aXe task IOLPREP
     """
@@ -31,7 +32,8 @@ def iolprep(mdrizzle_image='',
     iol_maker = iolmaking.IOL_Maker(mdrizzle_image,
                                     input_cat,
                                     dim_info,
-                                    useMdriz)
+                                    useMdriz,
+                                    ncpus)
     iol_maker.run()
     del iol_maker
 
@@ -44,14 +46,16 @@ def fcubeprep(grism_image='',
               AB_zero=True,
               dim_info='0,0,0,0',
               interpol='nearest',
-              useMdriz=True):
+              useMdriz=True,
+              sparse=False,
+              ncpus=1):
     """
     Function for the aXe task FCUBEPREP
     """
     from . import fcubeobjs
 
     # run the main command
-    fcmaker = fcubeobjs.FluxCube_Maker(grism_image, segm_image, filter_info, AB_zero, dim_info, interpol, useMdriz)
+    fcmaker = fcubeobjs.FluxCube_Maker(grism_image, segm_image, filter_info, AB_zero, dim_info, interpol, useMdriz, sparse, ncpus)
     fcmaker.run()
     del fcmaker
 
@@ -65,7 +69,9 @@ def axeprep(inlist='',
             mfwhm=None,
             norm=True,
             gcorr=False,
-            histogram=False):
+            histogram=False,
+            skysample=1,
+            ncpus=1):
     """
     Function for the aXe task AXEPREP
     """
@@ -79,22 +85,26 @@ def axeprep(inlist='',
 
     # do all the input checks
     inchecks = inputchecks.InputChecker('AXEPREP', inlist, configs, backims)
-    inchecks.check_axeprep(backgr, backims)
+    inchecks.check_axeprep(backgr, backims, ncpus)
 
     # create a list with the basic aXe inputs
     axe_inputs = axeinputs.aXeInputList(inlist, configs, backims)
 
-    # go over all the input
-    for item in axe_inputs:
+    # go over all grism images
+    for items in axe_inputs.get_image_groups():
 
-        # make a prepare-object; run the prepare
-        aXePrep = axepreptor.aXePrepArator(item['GRISIM'], axeutils.getIMAGE(item['OBJCAT']), item['DIRIM'], item['CONFIG'],
-                                           item['DMAG'], backgr=backgr, master_bck=item['FRINGE'], backped=backped,
-                                           mfwhm=mfwhm, norm=norm, gcorr=gcorr)
+        # make a prepare-object for each chip
+        prep_list = []
+        for item in items:
+            aXePrep = axepreptor.aXePrepArator(item['GRISIM'], axeutils.getIMAGE(item['OBJCAT']), item['DIRIM'], item['CONFIG'],
+                                               item['DMAG'], backgr=backgr, master_bck=item['FRINGE'], backped=backped,
+                                               mfwhm=mfwhm, norm=norm, gcorr=gcorr, skysample=skysample)
+            prep_list.append(aXePrep)
 
-        # delete the object
-        aXePrep.run()
-        del aXePrep
+        # run the prepare on all chips;
+        # delete the objects
+        axepreptor.prep_image(prep_list, int(ncpus))
+        del prep_list
 
     # return 'success'
     return 0
@@ -124,7 +134,8 @@ def axecore(inlist='',
             spectr=True,
             adj_sens=True,
             weights=False,
-            sampling='drzizzle'):
+            sampling='drzizzle',
+            ncpus=1):
     """
     Function for the aXe task AXECORE
     """
@@ -139,24 +150,30 @@ def axecore(inlist='',
     # do all the file checks
     inchecks = inputchecks.InputChecker('AXECORE', inlist, configs)
     inchecks.check_axecore( back, extrfwhm, drzfwhm, backfwhm, orient, slitless_geom, np, interp,
-                            cont_model, weights, sampling)
+                            cont_model, weights, sampling, ncpus)
 
     # create a list with the basic aXe inputs
     axe_inputs = axeinputs.aXeInputList(inlist, configs, fconfterm)
 
-    # go over all the input
-    for item in axe_inputs:
-
-        # make an extraction object
-        aXeNator = axesingextr.aXeSpcExtr(item['GRISIM'], axeutils.getIMAGE(item['OBJCAT']), item['DIRIM'], item['CONFIG'],
-                                          item['DMAG'], back=back, extrfwhm=extrfwhm, drzfwhm=drzfwhm, backfwhm=backfwhm,
-                                      lambda_mark=lambda_mark, slitless_geom=slitless_geom, orient=orient, exclude=exclude,
-                                      cont_model=cont_model, model_scale=model_scale, inter_type=inter_type, lambda_psf=lambda_psf,
-                                      np=np, interp=interp, niter_med=niter_med, niter_fit=niter_fit, kappa=kappa,
-                                      smooth_length=smooth_length, smooth_fwhm=smooth_fwhm, spectr=spectr, adj_sens=adj_sens,
-                                      weights=weights, sampling=sampling)
-        aXeNator.run()
-        del aXeNator
+    # go over all grism images
+    for items in axe_inputs.get_image_groups():
+
+        # make an extraction object for each chip
+        extr_list = []
+        for item in items:
+            aXeNator = axesingextr.aXeSpcExtr(item['GRISIM'], axeutils.getIMAGE(item['OBJCAT']), item['DIRIM'], item['CONFIG'],
+                                              item['DMAG'], back=back, extrfwhm=extrfwhm, drzfwhm=drzfwhm, backfwhm=backfwhm,
+                                          lambda_mark=lambda_mark, slitless_geom=slitless_geom, orient=orient, exclude=exclude,
+                                          cont_model=cont_model, model_scale=model_scale, inter_type=inter_type, lambda_psf=lambda_psf,
+                                          np=np, interp=interp, niter_med=niter_med, niter_fit=niter_fit, kappa=kappa,
+                                          smooth_length=smooth_length, smooth_fwhm=smooth_fwhm, spectr=spectr, adj_sens=adj_sens,
+                                          weights=weights, sampling=sampling)
+            extr_list.append(aXeNator)
+
+        # run the extraction on all chips;
+        # delete the objects
+        axesingextr.extr_image(extr_list, int(ncpus))
+        del extr_list
 
     # return 'success'
     return 0
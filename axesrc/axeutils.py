@@ -325,12 +325,80 @@ def getDRZTMP(name=None):
     else:
         return os.path.join(AXE_DRZTMP_LOC, name)
 
-def get_ext_info(image, conf):
+def get_fits_keys(image, keys=None):
     """
-    Determines the extension information on an image
+    Get header keywords of all extensions of an image
+
+    For each extension, the keywords listed in '_fits_keys'
+    and in 'keys' are kept in a small dictionary. Keywords
+    which are not in a header are not in its dictionary.
+    The dictionaries are made once and kept for the whole
+    process. They are made again if the modification time or
+    the size of the image has changed, if further keywords
+    are requested, or after 'clear_fits_keys()'.
+    Copies of the dictionaries are returned.
+
+    @param image: the image name
+    @type image: string
+    @param keys: further keywords
+    @type keys: [string]
+
+    @return: the keywords of all extensions
+    @rtype: [dict]
     """
     from astropy.io import fits as pyfits
 
+    # the identification of the image
+    filepath = os.path.abspath(image)
+    fstat = os.stat(filepath)
+    fident = (fstat.st_mtime, fstat.st_size)
+
+    # the keywords to keep
+    keynames = set(_fits_keys)
+    if keys != None:
+        keynames.update(keys)
+
+    # read the headers if the image is new or changed
+    # or if not all keywords were kept
+    if filepath not in _fits_records or _fits_records[filepath][0] != fident \
+            or not keynames <= _fits_records[filepath][1]:
+        fits_image = pyfits.open(image, 'readonly')
+        try:
+            records = []
+            for hdu in fits_image:
+                records.append(dict((key, hdu.header[key]) for key in keynames if key in hdu.header))
+        finally:
+            fits_image.close()
+        _fits_records[filepath] = (fident, keynames, records)
+
+    # return copies of the dictionaries
+    return [dict(record) for record in _fits_records[filepath][2]]
+
+# the header keywords kept for all images
+_fits_keys = ['EXTNAME', 'EXTVER', 'INSTRUME', 'DETECTOR', 'CAMERA',
+              'FILTER', 'FILTER1', 'FILTER2', 'SKY_CPS']
+
+# the header keywords read in
+# this process, indexed by path
+_fits_records = {}
+
+def clear_fits_keys(image):
+    """
+    Forget the header keywords of an image
+
+    Called after writing to an image, since a change
+    within the resolution of the modification time that
+    keeps the size is not noticed otherwise.
+
+    @param image: the image name
+    @type image: string
+    """
+    _fits_records.pop(os.path.abspath(image), None)
+
+def get_ext_info(image, conf):
+    """
+    Determines the extension information on an image
+    """
     # initialize a dictionary
     ext_info = {}
 
@@ -340,8 +408,12 @@ def get_ext_info(image, conf):
     ext_info['fits_ext']    = None
     ext_info['ext_version'] = None
 
-    # open the image
-    fits_image = pyfits.open(image, 'readonly')
+    # get the keywords of all extensions, including
+    # the keyword which may identify the extension
+    if conf.get_gvalue('OPTKEY1') != None:
+        headers = get_fits_keys(image, [conf.get_gvalue('OPTKEY1')])
+    else:
+        headers = get_fits_keys(image)
 
     # check the keyword for string-like
     if isstringlike(conf.get_gvalue('SCIENCE_EXT')):
@@ -362,21 +434,21 @@ def get_ext_info(image, conf):
                 optval = conf.get_gvalue('OPTVAL1')
 
             # go over all fits extensions
-            for index in range(len(fits_image)):
+            for index in range(len(headers)):
                 # check whether the extension name fits
-                if 'EXTNAME' in fits_image[index].header \
-                    and fits_image[index].header['EXTNAME'] == ext_info['ext_name']:
+                if 'EXTNAME' in headers[index] \
+                    and headers[index]['EXTNAME'] == ext_info['ext_name']:
 
                     # check whether OPTKEY1 and OPTKEYVAL1 fits
-                    if optkey in fits_image[index].header and fits_image[index].header[optkey] == optval:
+                    if optkey in headers[index] and headers[index][optkey] == optval:
 
                         # set the extension numbers
                         ext_info['fits_ext'] = index
                         ext_info['axe_ext']  = index + 1
         else:
-            for index in range(len(fits_image)):
-                if 'EXTNAME' in fits_image[index].header \
-                    and fits_image[index].header['EXTNAME'] == ext_info['ext_name']:
+            for index in range(len(headers)):
+                if 'EXTNAME' in headers[index] \
+                    and headers[index]['EXTNAME'] == ext_info['ext_name']:
                     ext_info['fits_ext'] = index
                     ext_info['axe_ext']  = index + 1
     else:
@@ -385,8 +457,8 @@ def get_ext_info(image, conf):
         ext_info['fits_ext'] = int(conf.get_gvalue('SCIENCE_EXT')) - 1
 
         # get extension name, if possible
-        if 'EXTNAME' in fits_image[ext_info['fits_ext']].header:
-            ext_info['ext_name'] = fits_image[ext_info['fits_ext']].header['EXTNAME']
+        if 'EXTNAME' in headers[ext_info['fits_ext']]:
+            ext_info['ext_name'] = headers[ext_info['fits_ext']]['EXTNAME']
 
     # check for success, complain and out if not
     if ext_info['axe_ext'] == None:
@@ -394,11 +466,8 @@ def get_ext_info(image, conf):
         raise aXeError(err_msg)
 
     # get extension version, if possible
-    if 'EXTVER' in fits_image[ext_info['fits_ext']].header:
-        ext_info['ext_version'] = fits_image[ext_info['fits_ext']].header['EXTVER']
-
-    # close the fits image
-    fits_image.close
+    if 'EXTVER' in headers[ext_info['fits_ext']]:
+        ext_info['ext_version'] = headers[ext_info['fits_ext']]['EXTVER']
 
     # return the dictionary
     return ext_info
@@ -485,6 +554,9 @@ def is_quant_contam(contam_model):
 def get_random_filename(dirname, ext):
     """
     Deliver a random file name
+
+    The process id is part of the name, such that
+    parallel processes never deliver the same name.
     """
     import random
 
@@ -495,7 +567,7 @@ def get_random_filename(dirname, ext):
     while found:
 
         # get a random int number
-        str_num = str(random.randint(10000, 99999))
+        str_num = '%i_%i' % (os.getpid(), random.randint(10000, 99999))
 
         # compose a random name
         fname = dirname + 'tmp' + str_num + ext
@@ -506,3 +578,137 @@ def get_random_filename(dirname, ext):
 
     return fname
 
+def map_processes(func, items, ncpus=1, initializer=None, initargs=()):
+    """
+    Apply a function to a list of items
+
+    With more than one process and item, the items are handed
+    to a pool of worker processes. Otherwise they are worked
+    on one after the other in this process, stopping at the
+    first error. The function must be on the module level.
+    An error in the function, such as an aXeError, is raised
+    again in this process, and no worker process is left.
+
+    @param func: the function
+    @type func: function
+    @param items: the items
+    @type items: list
+    @param ncpus: the number of processes
+    @type ncpus: int
+    @param initializer: function run once in each process
+    @type initializer: function
+    @param initargs: the arguments of the initializer
+    @type initargs: tuple
+
+    @return: the results in the order of the items
+    @rtype: list
+    """
+    import multiprocessing
+
+    # work in parallel if requested
+    if ncpus > 1 and len(items) > 1:
+        pool = multiprocessing.Pool(min(ncpus, len(items)),
+                                    initializer=initializer, initargs=initargs)
+        try:
+            return pool.map(func, items)
+        finally:
+            # make sure no process is left
+            pool.terminate()
+            pool.join()
+
+    # work in this process
+    if initializer != None:
+        initializer(*initargs)
+    return [func(item) for item in items]
+
+
+def get_clipped_stats(data, mask=None, nclip=3, lsig=3.0, usig=3.0, binwidth=0.01, subsample=1):
+    """
+    Compute clipped statistics of an array
+
+    The method gives the midpoint, standard deviation and
+    number of pixels as 'stsci.imagestats.ImageStats' with the
+    same parameters does. The values are clipped iteratively
+    around the mean; the midpoint is the median estimated from
+    a histogram with bins of 'binwidth' standard deviations.
+    The histogram covers at most the clipping range around
+    the mean, values beyond are counted in the outermost bins,
+    such that heavy tails do not inflate the number of bins.
+    Only the pixels selected in the mask are used, and with
+    'subsample' > 1 only every n-th pixel is used, such that
+    the result is always the same for the same data.
+
+    @param data: the data array
+    @type data: numpy.ndarray
+    @param mask: the valid pixels
+    @type mask: numpy.ndarray
+    @param nclip: the number of clipping iterations
+    @type nclip: int
+    @param lsig: the lower clipping limit in sigma
+    @type lsig: float
+    @param usig: the upper clipping limit in sigma
+    @type usig: float
+    @param binwidth: the histogram bin width in sigma
+    @type binwidth: float
+    @param subsample: use every n-th pixel
+    @type subsample: int
+
+    @return: midpoint, standard deviation and number of pixels
+    @rtype: (float, float, int)
+    """
+    import numpy as np
+
+    # select the valid pixels, possibly subsampled
+    values = np.ravel(data)[::subsample]
+    if mask is not None:
+        values = values[np.ravel(mask)[::subsample]]
+    values = values[np.isfinite(values)].astype(np.float64)
+
+    # check for data
+    if len(values) < 1:
+        err_msg = 'No valid pixels for the statistics!'
+        raise aXeError(err_msg)
+
+    # clip iteratively
+    for index in range(nclip):
+        mean  = values.mean()
+        sigma = values.std()
+        clipped = values[(values >= mean - lsig*sigma) & (values <= mean + usig*sigma)]
+        if len(clipped) == len(values) or len(clipped) < 1:
+            break
+        values = clipped
+
+    # the final standard deviation
+    npix   = len(values)
+    stddev = values.std()
+
+    # no histogram for constant values
+    vmin = values.min()
+    vmax = values.max()
+    if stddev <= 0.0 or vmax <= vmin:
+        return float(values.mean()), float(stddev), npix
+
+    # the histogram range, at most the clipping
+    # range; it always contains the median
+    mean = values.mean()
+    hmin = max(vmin, mean - max(lsig, 1.0) * stddev)
+    hmax = min(vmax, mean + max(usig, 1.0) * stddev)
+
+    # compute the histogram
+    hwidth = binwidth * stddev
+    nbins  = int((hmax - hmin) / hwidth) + 1
+    bins   = np.clip(np.floor((values - hmin) / hwidth), 0, nbins-1).astype(np.int64)
+    hist   = np.bincount(bins, minlength=nbins)
+
+    # interpolate the median in the
+    # cumulative histogram
+    cumulative = np.cumsum(hist)
+    half   = 0.5 * npix
+    ibin   = int(np.searchsorted(cumulative, half))
+    before = 0.0
+    if ibin > 0:
+        before = float(cumulative[ibin-1])
+    midpt = hmin + hwidth * (ibin + (half - before) / float(hist[ibin]))
+
+    # return the statistics
+    return float(midpt), float(stddev), npix
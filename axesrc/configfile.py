@@ -29,6 +29,10 @@ GNU General Public License for more details.
 import os
 import os.path
 import math
+import copy
+import hashlib
+
+import numpy as np
 
 from . import axeutils
 from .axeerror import aXeError
@@ -62,19 +66,24 @@ class ConfigList(object):
         # store the header
         self.header = header
 
+        # index the input keywords
+        keyindex = _index_keylist(keylist)
+
         # load the genral keywords
-        self.gkeys  = self._find_gkeys(keylist)
+        self.gkeys  = self._find_gkeys(keyindex)
 
+        # create the hidden keyword dictionary
+        self._index_gkeys()
 
         # try to load beams as long as there
         # are keywords and as long as there
         # are candidate beam numbers
         iindex=0
-        while (len(keylist) > 0 and iindex < len(idents)):
+        while (len(keyindex) > 0 and iindex < len(idents)):
             try:
                 # try to load a beam
-                self._beams.append(ConfigBeam(idents[iindex], keylist))
-                self.beams[idents[iindex]] = self._beams[iindex]
+                self._beams.append(ConfigBeam(idents[iindex], keyindex))
+                self.beams[idents[iindex]] = self._beams[-1]
 
             except BeamNotFound:
                 # no information on this beam is in the file
@@ -84,11 +93,16 @@ class ConfigList(object):
             iindex += 1
 
         # inform about the useless keywords
-        if len(keylist) > 0:
+        if len(keyindex) > 0:
             print('\nDispensable Keywords: ')
-            for key in keylist:
+            for key in keyindex:
                 print(str(key), end=' ')
 
+        # leave the unused keywords
+        # in the input list
+        if keyindex is not keylist:
+            keyindex.compact()
+
     def __str__(self):
         """
         String method for the class
@@ -114,23 +128,24 @@ class ConfigList(object):
 
     def __delitem__(self, item):
 
-        # find the index of the requested item
-        index = self._find_gkey(item)
+        # find the requested item
+        key = self.get_gkey(item)
 
         # check whether the item was found
-        if index  > -1:
-            # return the identified item
-            del self.gkeys[index]
+        if key != None:
+            # delete the identified item
+            self.gkeys.remove(key)
+            self._index_gkeys()
 
     def __getitem__(self, item):
 
-        # find the index of the requested item
-        index = self._find_gkey(item)
+        # find the requested item
+        key = self.get_gkey(item)
 
         # check whether the item was found
-        if index  > -1:
+        if key != None:
             # return the identified item
-            return self.gkeys[index].keyvalue
+            return key.keyvalue
         else:
             if item in self.beams.keys():
                 return self.beams[item]
@@ -138,20 +153,18 @@ class ConfigList(object):
                 # return NULL
                 return None
 
-    def _find_gkey(self, item):
-
-        # set the default return value
-        found = -1
-
-        # go over all items
-        for index in range(len(self.gkeys)):
-            # check whether it is the right item
-            if self.gkeys[index].keyword == item:
-                # set the return value to the index
-                found = index
+    def _index_gkeys(self):
+        """
+        Index the global keywords
 
-        # return the result
-        return found
+        The method creates the dictionary which gives
+        for each keyword name the first global keyword
+        with this name. The keyword list itself keeps
+        the order for writing the keywords.
+        """
+        self._gkeydict = {}
+        for key in self.gkeys:
+            self._gkeydict.setdefault(key.keyword, key)
 
     def _load_file(self, filename):
         """
@@ -189,34 +202,6 @@ class ConfigList(object):
         # return the list
         return keylist
 
-    def _get_gkey_index(self, keyword):
-        """
-        Retrieve the index of a global keyword
-
-        The method searches for the index of
-        a requested keyword in the list of global
-        keywords. If the keyword does not exists,
-        the index -1 is returned
-
-        @param keyword: name of the requested keyword
-        @type keyword: String
-
-        @return: the index of the keyword
-        @rtype: integer
-        """
-        # initialize the return value
-        kindex = -1
-
-        # go over all keys
-        for index in range(len(self.gkeys)):
-            # check whether the current key matches
-            if self.gkeys[index].keyword == keyword:
-                # return it if it matches
-                return index
-
-        # return the default
-        return kindex
-
     def _key_from_line(self, line):
         """
         Creates a keyword from a line
@@ -269,8 +254,8 @@ class ConfigList(object):
         returned. They counterparts in the input keyword list
         are deleted.
 
-        @param keylist: list of keywords
-        @type keylist: [ConfKey]
+        @param keylist: indexed list of keywords
+        @type keylist: ConfKeyIndex
 
         @return: global keywords
         @rtype: [ConfKey]
@@ -284,34 +269,11 @@ class ConfigList(object):
                      'RDNOISE', 'PSFCOEFFS', 'PSFRANGE', 'IPIXFUNCTION',
                      'POBJSIZE', 'SMFACTOR']
 
-        # initialize the global keylist
-        # and the list with indices to be deleted
-        gkeys  = []
-        dindex = []
-
-        # go over the keylist read in,
-        # keeping and index variable
-        iindex=0
-        for key in keylist:
-
-            # identify the current keyword in the
-            # list of possible ones
-            if key.keyword in gkeywords:
-
-                # store the index
-                dindex.append(iindex)
-
-                # create and append the new keyword
-                gkeys.append(ConfKey(key.keyword, key.keyvalue, key.comment))
-
-            iindex += 1
-
-        # delete the input keywords which
-        # have been 'used'
-        dindex.sort()
-        dindex.reverse()
-        for index in dindex:
-            del keylist[index]
+        # extract the global keywords
+        # in the order of the input list
+        gkeys = []
+        for key in keylist.pop_keys(gkeywords):
+            gkeys.append(ConfKey(key.keyword, key.keyvalue, key.comment))
 
         # return the list of global keys
         return gkeys
@@ -333,13 +295,13 @@ class ConfigList(object):
         for key in fkeys:
 
             # identify the keyword in the list
-            index = self._get_gkey_index(key)
+            gkey = self.get_gkey(key)
 
             # check for existence
-            if index > -1:
+            if gkey != None:
 
                 # extract the keyvalue
-                kvalue = self.gkeys[index].keyvalue
+                kvalue = gkey.keyvalue
 
                 # if the keyvalue is NOT None but the file does not exist
                 if kvalue.upper() != 'NONE' and not os.path.isfile(axeutils.getCONF(kvalue)):
@@ -362,19 +324,8 @@ class ConfigList(object):
         @return: the requested keyword or 'None'
         @rtype: ConfKey
         """
-        # initialize the return value
-        rkey = None
-
-        # search for the index in the keyword list
-        index = self._get_gkey_index(keyword)
-
-        # check whether the keyword exists
-        if index > -1:
-            # return the keyword
-            return self.gkeys[index]
-        else:
-            # return the default
-            return rkey
+        # look up the keyword
+        return self._gkeydict.get(keyword)
 
     def add_gkey(self, keyword, keyvalue, comment=None):
         """
@@ -393,16 +344,17 @@ class ConfigList(object):
         @type comment: String
         """
 
-        # search for the index in the keyword list
-        index = self._get_gkey_index(keyword)
+        # search for the keyword
+        key = self.get_gkey(keyword)
 
-        if index > -1:
+        if key != None:
             # if it matches, copy the data
-            self.gkeys[index].keyvalue = keyvalue
-            self.gkeys[index].comment  = comment
+            key.keyvalue = keyvalue
+            key.comment  = comment
         else:
             # the keyword does not yet exist, just create and add it
             self.gkeys.append(ConfKey(keyword, keyvalue, comment))
+            self._gkeydict[keyword] = self.gkeys[-1]
 
     def drizzle_check(self):
         """
@@ -454,17 +406,18 @@ class ConfigList(object):
         @rtype: any
         """
 
-        # search for the index in the keyword list
-        index = self._get_gkey_index(keyword)
+        # search for the keyword
+        key = self.get_gkey(keyword)
 
-        if index < 0:
+        if key == None:
             # the keyword does not yet exist, just create and add it
             self.gkeys.append(ConfKey(keyword, keyvalue, comment))
+            self._gkeydict[keyword] = self.gkeys[-1]
             # extract the keyvalue
             value = self.gkeys[-1].keyvalue
         else:
             # extract the keyvalue
-            value =  self.gkeys[index].keyvalue
+            value =  key.keyvalue
 
         # return the keyvalue
         return value
@@ -588,6 +541,19 @@ class ConfigFile(ConfigList):
 
             super(ConfigFile, self).__init__(keylist, header)
 
+    def copy(self):
+        """
+        Get an independent copy of the object
+
+        Configuration objects from 'load_config()' are shared
+        within the process. Callers which change the
+        configuration work on a copy.
+
+        @return: the copy
+        @rtype: ConfigFile
+        """
+        return copy.deepcopy(self)
+
     def _get_simul_name(self):
         """
         Get the filename used in aXeSIM
@@ -652,13 +618,13 @@ class ConfigFile(ConfigList):
         # than the allowed values
         if self['SCIENCE_EXT'] != 'SCI' and self['SCIENCE_EXT'] != '2':
 
-            # find the index of the sceicne extension
-            index = self._find_gkey('SCIENCE_EXT')
+            # find the sceicne extension
+            key = self.get_gkey('SCIENCE_EXT')
 
             # check whether the item was found
-            if index  > -1:
+            if key != None:
                 # set it to the allowed value
-                self.gkeys[index].keyvalue = 'SCI'
+                key.keyvalue = 'SCI'
 
 
         # check whether the telesocpe are is known
@@ -686,6 +652,47 @@ class ConfigFile(ConfigList):
         # simulation configuration file
         return os.path.basename(new_name)
 
+def load_config(filename, writable=False):
+    """
+    Load a configuration file
+
+    Each configuration file is parsed only once per process,
+    and the same object is returned on subsequent calls. The
+    file is parsed again if its modification time or size
+    changed. The shared object must not be modified; with
+    'writable' set a private copy is returned.
+
+    @param filename: name of the configuration file
+    @type filename: String
+    @param writable: return a private copy
+    @type writable: boolean
+
+    @return: the configuration object
+    @rtype: ConfigFile
+    """
+    # a missing file is reported by the parser
+    if not os.path.isfile(filename):
+        return ConfigFile(filename)
+
+    # the identification of the file
+    filepath = os.path.abspath(filename)
+    fstat = os.stat(filepath)
+    fident = (fstat.st_mtime, fstat.st_size)
+
+    # parse the file if it is new or changed
+    if filepath not in _config_list or _config_list[filepath][0] != fident:
+        _config_list[filepath] = (fident, ConfigFile(filename))
+    conf = _config_list[filepath][1]
+
+    # return the shared object or a copy
+    if writable:
+        return conf.copy()
+    return conf
+
+# the configuration objects loaded
+# in this process, indexed by path
+_config_list = {}
+
 class ConfigBeam(object):
     """
     Configuration Beam object
@@ -701,7 +708,7 @@ class ConfigBeam(object):
         @param ident: beam identification
         @type ident: Character
         @param keylist: list of keywords
-        @type keylist: [ConfKey]
+        @type keylist: [ConfKey] or ConfKeyIndex
         """
 
         # check if a filename is given
@@ -709,19 +716,27 @@ class ConfigBeam(object):
             # load the default
             print('No ID or no keywords given, can do nothing!!')
         else:
+            # index the input keywords
+            keyindex = _index_keylist(keylist)
+
             # try to load the beam keywords
             try:
                 # store the ident
                 self.ident = ident
 
                 # load the general beam keywords
-                self.beamkeys  = self._find_beamkeys(ident, keylist)
+                self.beamkeys  = self._find_beamkeys(ident, keyindex)
+
+                # create the hidden keyword dictionary
+                self._bkeydict = {}
+                for key in self.beamkeys:
+                    self._bkeydict.setdefault(key.keyword, key)
 
                 # load the trace keywords
-                self.trace = ConfigTrace(ident, keylist)
+                self.trace = ConfigTrace(ident, keyindex)
 
                 # load the dispersion keywords
-                self.disp  = ConfigDisp(ident, keylist)
+                self.disp  = ConfigDisp(ident, keyindex)
 
             # catch a pure CKeyNotFound exception
             # which is raised if a beam is competely
@@ -729,6 +744,12 @@ class ConfigBeam(object):
             except CKeyNotFound:
                 raise BeamNotFound(ident)
 
+            # leave the unused keywords
+            # in the input list
+            finally:
+                if keyindex is not keylist:
+                    keyindex.compact()
+
     def __str__(self):
         """
         String method for the class
@@ -768,10 +789,10 @@ class ConfigBeam(object):
 
         full_item = item + self.ident
 
-        index =  self._get_bkey_index(full_item)
+        key = self.get_bkey(full_item)
 
-        if index > -1:
-            self.beamkeys[index].keyvalue = value
+        if key != None:
+            key.keyvalue = value
 
     def _find_beamkeys(self, ident, keylist):
         """
@@ -783,8 +804,8 @@ class ConfigBeam(object):
 
         @param ident: beam identification
         @type ident: Character
-        @param keylist: list of keywords
-        @type keylist: [ConfKey]
+        @param keylist: indexed list of keywords
+        @type keylist: ConfKeyIndex
         """
 
         # list of the root of all globale
@@ -813,86 +834,21 @@ class ConfigBeam(object):
         #ekey = 'DLD1P_' + ident + '_PRANGE'
         opt_keys.append('DLD1P_' + ident + '_PRANGE')
 
-        # initialize the global keylist
-        # and the list with indices to be deleted
-        bkeys  = []
-        dindex = []
-
-        # go over the keylist read in,
-        # keeping and index variable
-        iindex = 0
-        nfound = 0
-        for key in keylist:
-
-            # identify the current keyword in the
-            # list of possible ones
-            if key.keyword in id_keys:
-
-                # store the index
-                dindex.append(iindex)
-
-                # create and append the new keyword
-                bkeys.append(ConfKey(key.keyword,
-                                     key.keyvalue, key.comment))
-
-                # enhance the nuber of keywords found
-                nfound += 1
-
-            elif key.keyword in opt_keys:
-                # store the index
-                dindex.append(iindex)
-
-                # create and append the new keyword
-                bkeys.append(ConfKey(key.keyword,
-                                     key.keyvalue, key.comment))
-
-            # enhance the index
-            iindex += 1
-
-        # check whether all keywords were found
-        if nfound < len(id_keys):
-            # raise an exeption if not
-            raise CKeyNotFound('general')
+        # check whether all keywords are there
+        for key in id_keys:
+            if not keylist.has_key(key):
+                # raise an exeption if not
+                raise CKeyNotFound('general')
 
-
-        # delete the input keywords which
-        # have been 'used'
-        dindex.sort()
-        dindex.reverse()
-        for iindex in dindex:
-            del keylist[iindex]
+        # extract the beam keywords
+        # in the order of the input list
+        bkeys = []
+        for key in keylist.pop_keys(id_keys + opt_keys):
+            bkeys.append(ConfKey(key.keyword, key.keyvalue, key.comment))
 
         # return the list of global keys
         return bkeys
 
-    def _get_bkey_index(self, keyword):
-        """
-        Retrieve the index of a beam keyword
-
-        The method searches for the index of
-        a requested keyword in the list of beam
-        keywords. If the keyword does not exists,
-        the index -1 is returned
-
-        @param keyword: name of the requested keyword
-        @type keyword: String
-
-        @return: the index of the keyword
-        @rtype: integer
-        """
-        # initialize the return value
-        bindex = -1
-
-        # go over all keys
-        for index in range(len(self.beamkeys)):
-            # check whether the current key matches
-            if self.beamkeys[index].keyword == keyword:
-                # return it if it matches
-                return index
-
-        # return the default
-        return bindex
-
     def get_bkey(self, keyword):
         """
         Retrieve a requested beam keyword
@@ -908,19 +864,8 @@ class ConfigBeam(object):
         @return: the requested keyword or 'None'
         @rtype: ConfKey
         """
-        # initialize the return value
-        rkey = None
-
-        # search for the index in the keyword list
-        index = self._get_bkey_index(keyword)
-
-        # ckeck whehter the keyword exists
-        if index > -1:
-            # return the keyword
-            return self.beamkeys[index]
-        else:
-            # return the default
-            return rkey
+        # look up the keyword
+        return self._bkeydict.get(keyword)
 
     def get_bvalue(self, keyword):
         """
@@ -951,6 +896,46 @@ class ConfigBeam(object):
         # return the value
         return rvalue
 
+    def get_trace(self, x, y, dx):
+        """
+        Compute trace positions and wavelengths
+
+        For arrays of object positions and offsets along
+        the x-axis the method computes the positions on
+        the trace and the corresponding wavelengths. The
+        offsets are counted from the reference point of
+        the beam, which is the object position plus the
+        (field dependent) XOFF/YOFF values. All input
+        arrays are broadcast against each other.
+
+        @param x: object x-positions
+        @type x: numpy.ndarray
+        @param y: object y-positions
+        @type y: numpy.ndarray
+        @param dx: x-offsets along the trace
+        @type dx: numpy.ndarray
+
+        @return: x- and y-positions on the trace and wavelengths
+        @rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        """
+        x  = np.asarray(x, dtype=np.float64)
+        y  = np.asarray(y, dtype=np.float64)
+        dx = np.asarray(dx, dtype=np.float64)
+
+        # evaluate the field dependent offsets
+        xoff = _eval_fieldpoly([float(value) for value in self['XOFF_'].split()], x, y)
+        yoff = _eval_fieldpoly([float(value) for value in self['YOFF_'].split()], x, y)
+
+        # compute the positions on the trace
+        x_trace = x + xoff + dx
+        y_trace = y + yoff + self.trace.get_dy(x, y, dx)
+
+        # compute the path length and the wavelength
+        lambdas = self.disp.get_lambda(x, y, self.trace.get_path(x, y, dx))
+
+        # return the results
+        return x_trace, y_trace, lambdas
+
     def check_files(self):
         """
         Checks whether all files exist
@@ -988,6 +973,241 @@ class ConfigBeam(object):
                     
         return n_sens
 
+class BeamGrid(object):
+    """
+    Trace and dispersion solution of a beam sampled on a grid
+
+    The object samples the trace and the dispersion solution
+    of a beam on a coarse grid over the detector and along
+    the trace. Trace positions and wavelengths for arbitrary
+    object positions are then derived by linear interpolation
+    in the grid, rather than by evaluating the polynomials.
+    The grid is cached in a file whose name contains a hash
+    of the configuration and the grid parameters.
+    """
+    def __init__(self, conf, ident, nx, ny, step=64.0, dxstep=1.0, cachedir=None):
+        """
+        Initializer for the class
+
+        @param conf: the configuration
+        @type conf: ConfigList
+        @param ident: beam identification
+        @type ident: Character
+        @param nx: detector size in x
+        @type nx: int
+        @param ny: detector size in y
+        @type ny: int
+        @param step: grid spacing on the detector
+        @type step: float
+        @param dxstep: grid spacing along the trace
+        @type dxstep: float
+        @param cachedir: directory for the cache file, by default the output directory
+        @type cachedir: string
+        """
+        # check for the beam
+        if ident not in conf.beams:
+            err_msg = 'Beam: %s does not exist in the configuration!' % ident
+            raise aXeError(err_msg)
+        self.beam = conf.beams[ident]
+
+        # the grid along the x-, y- and trace axis;
+        # each axis has at least two points
+        beam_range = [float(value) for value in self.beam['BEAM'].split()]
+        self.x_axis  = self._get_axis(0.0, float(nx), step)
+        self.y_axis  = self._get_axis(0.0, float(ny), step)
+        self.dx_axis = self._get_axis(math.floor(beam_range[0]), math.ceil(beam_range[1]), dxstep)
+
+        # the name of the cache file
+        grid_hash = self._get_hash(conf, ident)
+        if cachedir == None:
+            cachedir = axeutils.getOUTPUT()
+        if hasattr(conf, 'filename'):
+            rootname = os.path.basename(conf.filename)
+        else:
+            rootname = 'aXe'
+        self.cachename = os.path.join(cachedir, '%s_%s_%s.npz' % (rootname, ident, grid_hash))
+
+        # load or create the grid
+        if not self._read_cache():
+            self._make_grid()
+            self._write_cache()
+
+    def _get_axis(self, start, end, step):
+        """
+        Create a regular grid axis
+
+        @param start: the first value
+        @type start: float
+        @param end: the last value
+        @type end: float
+        @param step: the maximum spacing
+        @type step: float
+
+        @return: the axis values
+        @rtype: numpy.ndarray
+        """
+        npoints = max(int(math.ceil((end - start) / step)) + 1, 2)
+        return np.linspace(start, end, npoints)
+
+    def _get_hash(self, conf, ident):
+        """
+        Compute the hash of configuration and grid
+
+        @param conf: the configuration
+        @type conf: ConfigList
+        @param ident: beam identification
+        @type ident: Character
+
+        @return: the hex digest
+        @rtype: string
+        """
+        md5 = hashlib.md5()
+        md5.update(str(conf).encode('utf-8'))
+        for axis in [self.x_axis, self.y_axis, self.dx_axis]:
+            md5.update(('%s %.6f %.6f %i' % (ident, axis[0], axis[-1], len(axis))).encode('utf-8'))
+        return md5.hexdigest()[:16]
+
+    def _make_grid(self):
+        """
+        Sample the beam on the grid
+
+        The offsets in x depend on the position only, the
+        offsets in y and the wavelengths also on the offset
+        along the trace. The values are stored in single
+        precision.
+        """
+        # create the grid
+        x_grid  = self.x_axis[np.newaxis, :, np.newaxis]
+        y_grid  = self.y_axis[:, np.newaxis, np.newaxis]
+        dx_grid = self.dx_axis[np.newaxis, np.newaxis, :]
+
+        # evaluate the trace and dispersion solution
+        x_trace, y_trace, lambdas = self.beam.get_trace(x_grid, y_grid, dx_grid)
+
+        # store the offsets and wavelengths
+        self.xoff    = (x_trace - x_grid - dx_grid)[:,:,0].astype(np.float32)
+        self.yoff    = (y_trace - y_grid).astype(np.float32)
+        self.lambdas = lambdas.astype(np.float32)
+
+    def _read_cache(self):
+        """
+        Read the grid from the cache file
+
+        @return: True if the grid was read
+        @rtype: boolean
+        """
+        # check for the file
+        if not os.path.isfile(self.cachename):
+            return False
+
+        # load the grid
+        try:
+            cache = np.load(self.cachename)
+            try:
+                self.xoff    = cache['xoff']
+                self.yoff    = cache['yoff']
+                self.lambdas = cache['lambdas']
+            finally:
+                cache.close()
+        except (IOError, OSError, KeyError, ValueError):
+            # a damaged file is just ignored
+            return False
+
+        # the grid must fit the axes
+        shape = (len(self.y_axis), len(self.x_axis))
+        if self.xoff.shape != shape or self.yoff.shape != shape + (len(self.dx_axis),) \
+                or self.lambdas.shape != self.yoff.shape:
+            return False
+
+        # return success
+        return True
+
+    def _write_cache(self):
+        """
+        Write the grid to the cache file
+
+        The file is written to a temporary file and
+        renamed. Failing to write is not an error.
+        """
+        tmpname = '%s.%i.tmp' % (self.cachename, os.getpid())
+        try:
+            outfile = open(tmpname, 'wb')
+            try:
+                np.savez(outfile, xoff=self.xoff, yoff=self.yoff, lambdas=self.lambdas)
+            finally:
+                outfile.close()
+            os.rename(tmpname, self.cachename)
+        except (IOError, OSError):
+            if os.path.isfile(tmpname):
+                os.unlink(tmpname)
+
+    def _get_weights(self, axis, values):
+        """
+        Get the interpolation indices and weights
+
+        Values outside of the axis are clipped
+        to the first or last grid point.
+
+        @param axis: the grid axis
+        @type axis: numpy.ndarray
+        @param values: the values to interpolate at
+        @type values: numpy.ndarray
+
+        @return: the lower indices and the upper weights
+        @rtype: (numpy.ndarray, numpy.ndarray)
+        """
+        # fractional position in the axis
+        position = np.clip((values - axis[0]) / (axis[1] - axis[0]), 0.0, len(axis) - 1.0)
+
+        # lower index and weight of the upper point
+        index = np.minimum(np.floor(position).astype(np.int64), len(axis) - 2)
+        return index, position - index
+
+    def get_trace(self, x, y, dx):
+        """
+        Look up trace positions and wavelengths
+
+        The method gives the same quantities as
+        ConfigBeam.get_trace(), but interpolates bilinearly
+        on the detector and linearly along the trace.
+
+        @param x: object x-positions
+        @type x: numpy.ndarray
+        @param y: object y-positions
+        @type y: numpy.ndarray
+        @param dx: x-offsets along the trace
+        @type dx: numpy.ndarray
+
+        @return: x- and y-positions on the trace and wavelengths
+        @rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        """
+        x, y, dx = np.broadcast_arrays(np.asarray(x, dtype=np.float64),
+                                       np.asarray(y, dtype=np.float64),
+                                       np.asarray(dx, dtype=np.float64))
+
+        # get the indices and weights
+        ix, wx = self._get_weights(self.x_axis, x)
+        iy, wy = self._get_weights(self.y_axis, y)
+        iz, wz = self._get_weights(self.dx_axis, dx)
+
+        # interpolate the x-offsets on the detector
+        xoff = ((1.0-wy) * ((1.0-wx) * self.xoff[iy,ix]   + wx * self.xoff[iy,ix+1]) +
+                     wy  * ((1.0-wx) * self.xoff[iy+1,ix] + wx * self.xoff[iy+1,ix+1]))
+
+        # interpolate y-offsets and wavelengths
+        # on the detector and along the trace
+        yoff    = 0.0
+        lambdas = 0.0
+        for jy, fy in [(iy, 1.0-wy), (iy+1, wy)]:
+            for jx, fx in [(ix, 1.0-wx), (ix+1, wx)]:
+                for jz, fz in [(iz, 1.0-wz), (iz+1, wz)]:
+                    weight   = fy * fx * fz
+                    yoff    = yoff    + weight * self.yoff[jy,jx,jz]
+                    lambdas = lambdas + weight * self.lambdas[jy,jx,jz]
+
+        # return the results
+        return x + xoff + dx, y + yoff, lambdas
+
 class TwoDimPolyN(object):
     """
     Object for a polynomial with 2D variance
@@ -1062,6 +1282,54 @@ class TwoDimPolyN(object):
         # set the index to the input object
         self.twodkeys[index] = obj
 
+    def get_coeffs(self, x, y):
+        """
+        Evaluate the field dependent coefficients
+
+        The method evaluates the field dependence of all
+        polynomial coefficients at once for arrays of
+        object positions.
+
+        @param x: object x-positions
+        @type x: numpy.ndarray
+        @param y: object y-positions
+        @type y: numpy.ndarray
+
+        @return: the coefficients, one row per order
+        @rtype: numpy.ndarray
+        """
+        return np.array([_eval_fieldpoly(key.kvallist, x, y) for key in self.twodkeys])
+
+    def eval_poly(self, x, y, t):
+        """
+        Evaluate the polynomial
+
+        The polynomial with the field dependent
+        coefficients is evaluated at the independent
+        variable with a Horner scheme.
+
+        @param x: object x-positions
+        @type x: numpy.ndarray
+        @param y: object y-positions
+        @type y: numpy.ndarray
+        @param t: the independent variable
+        @type t: numpy.ndarray
+
+        @return: the polynomial values
+        @rtype: numpy.ndarray
+        """
+        # get the coefficients
+        coeffs = self.get_coeffs(x, y)
+        t = np.asarray(t, dtype=np.float64)
+
+        # apply the Horner scheme
+        result = coeffs[-1] + 0.0 * t
+        for coeff in coeffs[-2::-1]:
+            result = result * t + coeff
+
+        # return the values
+        return result
+
     def _find_order(self, prefix, ident, keylist):
         """
         Find the keyword with the polynomial order
@@ -1074,8 +1342,8 @@ class TwoDimPolyN(object):
         @type prefix: string
         @param ident: beam identification
         @type ident: character
-        @param keylist: list of keywords
-        @type keylist: [ConfKey]
+        @param keylist: indexed list of keywords
+        @type keylist: ConfKeyIndex
 
         @return: keyword with number of orders
         @rtype: ConfKey
@@ -1101,8 +1369,8 @@ class TwoDimPolyN(object):
         @type prefix: string
         @param ident: beam identification
         @type ident: character
-        @param keylist: list of keywords
-        @type keylist: [ConfKey]
+        @param keylist: indexed list of keywords
+        @type keylist: ConfKeyIndex
 
         @return: list of keywords
         @rtype: [ConfKey]
@@ -1139,42 +1407,24 @@ class TwoDimPolyN(object):
 
         @param keyword: the keyword name
         @type keyword: string
-        @param keylist: list of keywords
-        @type keylist: [ConfKey]
+        @param keylist: indexed list of keywords
+        @type keylist: ConfKeyIndex
 
         @return: the extracted keyword
         @rtype: ConfKey
         """
-
-        # initialize the index
-        iindex = 0
-
-        # set indicator to "not found"
-        found = -1
-
-        # go over all keys in the list
-        for key in keylist:
-
-            # checke whether the keyword is the desired one
-            if key.keyword == keyword:
-                # create a list keyword if desired
-                if lkey:
-                    nkey = ConfListKey(key.keyword, key.keyvalue, key.comment)
-                else:
-                    nkey = ConfKey(key.keyword, key.keyvalue, key.comment)
-
-                # store the index
-                found = iindex
-
-            # enhance the index
-            iindex += 1
+        # extract the keyword from the list
+        key = keylist.pop_key(keyword)
 
         # fire an exception if nothing was found
-        if found < 0:
+        if key == None:
             raise CKeyNotFound(keyword)
-        # delete the keyword from the inlist
+
+        # create a list keyword if desired
+        if lkey:
+            nkey = ConfListKey(key.keyword, key.keyvalue, key.comment)
         else:
-            del keylist[found]
+            nkey = ConfKey(key.keyword, key.keyvalue, key.comment)
 
         # return the keyword
         return nkey
@@ -1256,14 +1506,16 @@ class ConfigTrace(TwoDimPolyN):
         @param ident: beam identification
         @type ident: Character
         @param keylist: list of keywords
-        @type keylist: [ConfKey]
+        @type keylist: [ConfKey] or ConfKeyIndex
         """
+        # index the input keywords
+        keyindex = _index_keylist(keylist)
 
         # try to read in the keywords
         try:
             self.ident = ident
-            self.norder  = self._find_order('DYDX_', ident, keylist)
-            self.twodkeys = self._find_twodkeys('DYDX_', ident, keylist)
+            self.norder  = self._find_order('DYDX_', ident, keyindex)
+            self.twodkeys = self._find_twodkeys('DYDX_', ident, keyindex)
 
         # raise an exception if keywords are missing
         except CKeyNotFound as e:
@@ -1271,6 +1523,12 @@ class ConfigTrace(TwoDimPolyN):
         except CKeyLengthWrong as e:
             print('Field dependent keyword: ' + e.keyword)
 
+        # leave the unused keywords
+        # in the input list
+        finally:
+            if keyindex is not keylist:
+                keyindex.compact()
+
     def __str__(self):
         """
         String method for the class
@@ -1290,6 +1548,68 @@ class ConfigTrace(TwoDimPolyN):
         # return the result
         return rstring
 
+    def get_dy(self, x, y, dx):
+        """
+        Compute the trace offsets
+
+        @param x: object x-positions
+        @type x: numpy.ndarray
+        @param y: object y-positions
+        @type y: numpy.ndarray
+        @param dx: x-offsets along the trace
+        @type dx: numpy.ndarray
+
+        @return: the y-offsets of the trace
+        @rtype: numpy.ndarray
+        """
+        return self.eval_poly(x, y, dx)
+
+    def get_path(self, x, y, dx, npoints=8):
+        """
+        Compute the path length along the trace
+
+        The path length from the reference point to the
+        x-offset is computed analytically for linear traces
+        and by Gauss-Legendre integration otherwise.
+
+        @param x: object x-positions
+        @type x: numpy.ndarray
+        @param y: object y-positions
+        @type y: numpy.ndarray
+        @param dx: x-offsets along the trace
+        @type dx: numpy.ndarray
+        @param npoints: number of integration points
+        @type npoints: int
+
+        @return: the path lengths
+        @rtype: numpy.ndarray
+        """
+        # get the coefficients
+        coeffs = self.get_coeffs(x, y)
+        dx = np.asarray(dx, dtype=np.float64)
+
+        # the linear case is analytic
+        if len(coeffs) < 3:
+            if len(coeffs) < 2:
+                return dx + 0.0 * coeffs[0]
+            return dx * np.sqrt(1.0 + coeffs[1]**2)
+
+        # coefficients of the derivative
+        dcoeffs = [order * coeffs[order] for order in range(1, len(coeffs))]
+
+        # integrate sqrt(1 + (dy/dx)^2) from 0 to dx
+        nodes, weights = np.polynomial.legendre.leggauss(npoints)
+        path = 0.0
+        for index in range(npoints):
+            t = 0.5 * dx * (nodes[index] + 1.0)
+            slope = dcoeffs[-1] + 0.0 * t
+            for dcoeff in dcoeffs[-2::-1]:
+                slope = slope * t + dcoeff
+            path = path + weights[index] * np.sqrt(1.0 + slope**2)
+
+        # return the path lengths
+        return 0.5 * dx * path
+
 class ConfigDisp(TwoDimPolyN):
     """
     Configuration Beam object
@@ -1308,17 +1628,20 @@ class ConfigDisp(TwoDimPolyN):
         @param ident: beam identification
         @type ident: Character
         @param keylist: list of keywords
-        @type keylist: [ConfKey]
+        @type keylist: [ConfKey] or ConfKeyIndex
         """
+        # index the input keywords
+        keyindex = _index_keylist(keylist)
+
         # try to read in the keywords
         try:
             self.ident = ident
-            self.norder   = self._find_order('DISP_', ident, keylist)
-            self.twodkeys = self._find_twodkeys('DLDP_', ident, keylist)
+            self.norder   = self._find_order('DISP_', ident, keyindex)
+            self.twodkeys = self._find_twodkeys('DLDP_', ident, keyindex)
         # raise an exception if keywords are missing
         except CKeyNotFound as e:
             try:
-                self.twodkeys = self._find_twodkeys('DLD1P_', ident, keylist)
+                self.twodkeys = self._find_twodkeys('DLD1P_', ident, keyindex)
             # raise an exception if keywords are missing
             except CKeyNotFound as e:
                 raise DispNotFound(ident, e.keyword)
@@ -1329,6 +1652,12 @@ class ConfigDisp(TwoDimPolyN):
             print('\nField dependent keyword: ' + e.keyword + ' has wrong length!')
             raise DispNotFound(ident, e.keyword)
 
+        # leave the unused keywords
+        # in the input list
+        finally:
+            if keyindex is not keylist:
+                keyindex.compact()
+
     def __str__(self):
         """
         String method for the class
@@ -1348,6 +1677,29 @@ class ConfigDisp(TwoDimPolyN):
         # return the result
         return rstring
 
+    def get_lambda(self, x, y, dp):
+        """
+        Compute wavelengths
+
+        @param x: object x-positions
+        @type x: numpy.ndarray
+        @param y: object y-positions
+        @type y: numpy.ndarray
+        @param dp: path lengths along the trace
+        @type dp: numpy.ndarray
+
+        @return: the wavelengths
+        @rtype: numpy.ndarray
+        """
+        # the prism solutions in inverse
+        # wavelength are not supported
+        if self.twodkeys[0].keyword.startswith('DLD1P_'):
+            err_msg = 'Dispersion solution of beam %s: "DLD1P" keywords are not supported!' % self.ident
+            raise aXeError(err_msg)
+
+        # evaluate the polynomial
+        return self.eval_poly(x, y, dp)
+
 
 class DefConfHeader(object):
     """
@@ -1588,6 +1940,192 @@ class ConfListKey(ConfKey):
         # return the complete string
         return rstring
 
+def _eval_fieldpoly(kvallist, x, y):
+    """
+    Evaluate a field dependent coefficient
+
+    The coefficient values are given in the order
+    a0 + a1*x + a2*y + a3*x^2 + a4*x*y + a5*y^2 + ...
+    as in all configuration keywords with field dependence.
+
+    @param kvallist: the coefficient values
+    @type kvallist: [float]
+    @param x: object x-positions
+    @type x: numpy.ndarray
+    @param y: object y-positions
+    @type y: numpy.ndarray
+
+    @return: the coefficient at the positions
+    @rtype: numpy.ndarray
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # go over all terms
+    result = np.zeros(np.broadcast(x, y).shape, dtype=np.float64)
+    index  = 0
+    degree = 0
+    while index < len(kvallist):
+        for ypow in range(degree+1):
+            if index < len(kvallist):
+                result += kvallist[index] * x**(degree-ypow) * y**ypow
+            index += 1
+        degree += 1
+
+    # return the result
+    return result
+
+class ConfKeyIndex(object):
+    """
+    Keyword list with an index on the keyword names
+
+    The class holds the keywords read from a configuration
+    file while they are distributed to the global keywords,
+    the beams, traces and dispersion solutions. Extracting
+    a keyword is a dictionary lookup rather than a search
+    through the whole list, and the keywords not yet used
+    keep their original order.
+    """
+    def __init__(self, keylist):
+        """
+        Initializer for the class
+
+        @param keylist: list of configuration keys
+        @type keylist: [ConfKey]
+        """
+        # store the list and mark
+        # all keywords as unused
+        self.keylist = keylist
+        self.used    = [False] * len(keylist)
+        self.nused   = 0
+
+        # index the positions of each keyword name
+        self.positions = {}
+        for index in range(len(keylist)):
+            self.positions.setdefault(keylist[index].keyword, []).append(index)
+
+    def __len__(self):
+        """
+        Length method for the class
+
+        @return: the number of unused keywords
+        @rtype: int
+        """
+        return len(self.keylist) - self.nused
+
+    def __iter__(self):
+        """
+        Iterator over the unused keywords
+
+        @return: iterator
+        @rtype: iterator
+        """
+        return iter(self.get_unused())
+
+    def _use(self, index):
+        """
+        Mark a keyword as used
+
+        @param index: the position of the keyword
+        @type index: int
+        """
+        self.used[index] = True
+        self.nused += 1
+
+    def has_key(self, keyword):
+        """
+        Check for an unused keyword
+
+        @param keyword: the keyword name
+        @type keyword: string
+
+        @return: True if the keyword is there
+        @rtype: boolean
+        """
+        return keyword in self.positions
+
+    def pop_key(self, keyword):
+        """
+        Extract a keyword
+
+        Among several keywords with the same name the last
+        one is extracted.
+
+        @param keyword: the keyword name
+        @type keyword: string
+
+        @return: the keyword or None
+        @rtype: ConfKey
+        """
+        # check whether the keyword exists
+        if keyword not in self.positions:
+            return None
+
+        # take the last keyword with this name
+        index = self.positions[keyword].pop()
+        if len(self.positions[keyword]) < 1:
+            del self.positions[keyword]
+        self._use(index)
+
+        # return the keyword
+        return self.keylist[index]
+
+    def pop_keys(self, keywords):
+        """
+        Extract all keywords with one of the names
+
+        @param keywords: the keyword names
+        @type keywords: [string]
+
+        @return: the keywords in their original order
+        @rtype: [ConfKey]
+        """
+        # collect the positions
+        indices = []
+        for keyword in keywords:
+            if keyword in self.positions:
+                indices.extend(self.positions.pop(keyword))
+        indices.sort()
+
+        # mark and return the keywords
+        for index in indices:
+            self._use(index)
+        return [self.keylist[index] for index in indices]
+
+    def get_unused(self):
+        """
+        Get the unused keywords
+
+        @return: the unused keywords
+        @rtype: [ConfKey]
+        """
+        return [self.keylist[index] for index in range(len(self.keylist)) if not self.used[index]]
+
+    def compact(self):
+        """
+        Remove the used keywords from the list
+
+        The input list is changed in place, as the
+        former keyword extraction did.
+        """
+        self.keylist[:] = self.get_unused()
+        self.__init__(self.keylist)
+
+def _index_keylist(keylist):
+    """
+    Index a keyword list
+
+    @param keylist: list of keywords
+    @type keylist: [ConfKey] or ConfKeyIndex
+
+    @return: the indexed list of keywords
+    @rtype: ConfKeyIndex
+    """
+    # an index is used as it is
+    if isinstance(keylist, ConfKeyIndex):
+        return keylist
+    return ConfKeyIndex(keylist)
+
 class ConfError(Exception):
     """
     Base class for exceptions in this module
@@ -66,7 +66,7 @@ class DPPdumps(object):
         for an_input in axe_inputs:
 
             # load the configuration file
-            conf = configfile.ConfigFile(axeutils.getCONF(an_input['CONFIG']))
+            conf = configfile.load_config(axeutils.getCONF(an_input['CONFIG']))
 
             # get the image extensions
             ext_info = axeutils.get_ext_info(axeutils.getIMAGE(an_input['GRISIM']), conf)
@@ -82,7 +82,7 @@ class DrizzleParams(dict):
         drizzle_params = {}
 
         # load the first configuration file
-        config = configfile.ConfigFile(axeutils.getCONF(config_file))
+        config = configfile.load_config(axeutils.getCONF(config_file))
 
         # get and store the readout noise
         if config['RDNOISE'] != None:
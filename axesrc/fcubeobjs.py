@@ -171,6 +171,289 @@ class MDrizzle_Image(object):
         print(' Done')
 
 
+class Blot_Map(object):
+    """
+    The class for the pixel mapping between a drizzled frame
+    and the frame of one input image. The mapping depends
+    on the two WCS's only, hence it is computed once and
+    then applied to all images drizzled onto the same frame.
+    """
+    def __init__(self, drz_wcs, flt_wcs, nrows=256, footprint=None):
+        """
+        Initializes the class
+
+        For every pixel in the blotted frame the nearest
+        pixel in the drizzled frame is determined. Pixels
+        which fall outside of the drizzled frame are noted.
+        Also the flux scale which blot applies to account
+        for the different pixel sizes is computed.
+        With a footprint given, only the pixels in the
+        tiles covered by objects are mapped.
+
+        @param drz_wcs: the WCS of the drizzled frame
+        @type drz_wcs: HSTWCS
+        @param flt_wcs: the WCS of the blotted frame
+        @type flt_wcs: HSTWCS
+        @param nrows: the number of rows transformed at once
+        @type nrows: int
+        @param footprint: the object footprint
+        @type footprint: Segm_Footprint
+        """
+        from stwcs.distortion import utils as dist_utils
+
+        # store the dimensions of the drizzled and the blotted frame
+        self.in_shape  = (int(drz_wcs.naxis2), int(drz_wcs.naxis1))
+        self.out_shape = (int(flt_wcs.naxis2), int(flt_wcs.naxis1))
+
+        # compute the flux scale as done in blot
+        # for an exposure time of 1
+        wcslin    = dist_utils.make_orthogonal_cd(flt_wcs)
+        pix_ratio = drz_wcs.pscale / wcslin.pscale
+        self.flux_scale = 1.0 / (pix_ratio * pix_ratio)
+
+        # compute the mapping
+        self.out_index, self.in_index = self._make_map(drz_wcs, flt_wcs, nrows, footprint)
+
+    def _make_map(self, drz_wcs, flt_wcs, nrows, footprint):
+        """
+        Compute the pixel mapping
+
+        The pixel centers of the blotted frame are transformed
+        to the sky and then to the drizzled frame, in blocks
+        of the size of 'nrows' rows to limit the memory.
+        Without footprint all pixels are transformed, otherwise
+        only the pixels in the tiles covered by objects.
+
+        @param drz_wcs: the WCS of the drizzled frame
+        @type drz_wcs: HSTWCS
+        @param flt_wcs: the WCS of the blotted frame
+        @type flt_wcs: HSTWCS
+        @param nrows: the number of rows transformed at once
+        @type nrows: int
+        @param footprint: the object footprint
+        @type footprint: Segm_Footprint
+
+        @return: the flat indices in the blotted and drizzled frame
+        @rtype: (numpy.ndarray, numpy.ndarray)
+        """
+        # the number of pixels in a row
+        nx = self.out_shape[1]
+
+        # get the pixels to be mapped
+        if footprint != None:
+            pix_index = footprint.get_covered_pixels(flt_wcs, self.out_shape)
+            npixels   = len(pix_index)
+        else:
+            pix_index = None
+            npixels   = self.out_shape[0] * nx
+
+        # the list of index blocks
+        out_blocks = [np.zeros(0, dtype=np.int64)]
+        in_blocks  = [np.zeros(0, dtype=np.int64)]
+
+        # go over all pixel blocks
+        for start in range(0, npixels, nrows * nx):
+            end = min(start + nrows * nx, npixels)
+
+            # the flat indices of the block
+            if pix_index is None:
+                index = np.arange(start, end, dtype=np.int64)
+            else:
+                index = pix_index[start:end]
+
+            # the pixel centers of the block
+            x_flt = (index % nx).astype(np.float64) + 1.0
+            y_flt = (index // nx).astype(np.float64) + 1.0
+
+            # transform from the blotted frame
+            # to the drizzled frame
+            ra, dec = flt_wcs.all_pix2world(x_flt, y_flt, 1)
+            x_drz, y_drz = drz_wcs.all_world2pix(ra, dec, 1)
+
+            # get the nearest pixel in the drizzled frame
+            ix = np.floor(x_drz + 0.5).astype(np.int64) - 1
+            iy = np.floor(y_drz + 0.5).astype(np.int64) - 1
+
+            # keep the pixels inside the drizzled frame
+            inside = (ix >= 0) & (ix < self.in_shape[1]) & (iy >= 0) & (iy < self.in_shape[0])
+
+            # store the flat indices
+            out_blocks.append(index[inside])
+            in_blocks.append(iy[inside] * self.in_shape[1] + ix[inside])
+
+        # return the indices
+        return np.concatenate(out_blocks), np.concatenate(in_blocks)
+
+    def blot(self, image_data):
+        """
+        Blot an image
+
+        The image data is blotted onto the frame
+        using the nearest neighbour. Pixels outside
+        the drizzled frame are set to zero.
+
+        @param image_data: the data on the drizzled frame
+        @type image_data: numpy.ndarray
+
+        @return: the blotted data
+        @rtype: numpy.ndarray
+        """
+        # check the image dimension
+        if image_data.shape != self.in_shape:
+            err_msg = 'FCUBEPREP: Image dimension %s does not match the drizzled frame %s!' % (str(image_data.shape), str(self.in_shape))
+            raise aXeError(err_msg)
+
+        # make an empty output
+        outimage = np.zeros(self.out_shape[0]*self.out_shape[1], dtype=np.float32)
+
+        # transfer the pixels
+        outimage[self.out_index] = np.ravel(image_data)[self.in_index] * self.flux_scale
+
+        # return the image
+        return outimage.reshape(self.out_shape)
+
+
+class Segm_Footprint(object):
+    """
+    The class for the footprint of the objects in a
+    segmentation image. The footprint is kept on a coarse
+    grid of bins, and a summed-area table allows to check
+    quickly whether any object lies within a given box.
+    """
+    def __init__(self, segm_data, segm_wcs, binsize=16, margin=4, tilesize=64):
+        """
+        Initializes the class
+
+        The segmentation data is reduced to a coarse grid
+        that marks the bins with at least one object pixel.
+        The data is read in blocks of rows, such that also
+        memory mapped data is never loaded as a whole.
+
+        @param segm_data: the segmentation data
+        @type segm_data: numpy.ndarray
+        @param segm_wcs: the WCS of the segmentation image
+        @type segm_wcs: HSTWCS
+        @param binsize: the size of the coarse bins
+        @type binsize: int
+        @param margin: the margin around the objects [pixel]
+        @type margin: int
+        @param tilesize: the tile size in the blotted frame
+        @type tilesize: int
+        """
+        # store the input
+        self.wcs      = segm_wcs
+        self.shape    = segm_data.shape
+        self.binsize  = binsize
+        self.margin   = margin
+        self.tilesize = tilesize
+
+        # the number of bins
+        nby = (self.shape[0] + binsize - 1) // binsize
+        nbx = (self.shape[1] + binsize - 1) // binsize
+
+        # mark the bins with object pixels
+        occupied = np.zeros((nby, nbx), dtype=bool)
+        for ybin in range(nby):
+            # mark the columns with object pixels
+            cols = np.zeros(nbx * binsize, dtype=bool)
+            cols[:self.shape[1]] = np.any(segm_data[ybin*binsize:(ybin+1)*binsize] > 0, axis=0)
+
+            # reduce the columns to bins
+            occupied[ybin] = np.any(cols.reshape((nbx, binsize)), axis=1)
+
+        # build the summed-area table
+        self.sumtab = np.zeros((nby+1, nbx+1), dtype=np.int64)
+        self.sumtab[1:,1:] = np.cumsum(np.cumsum(occupied, axis=0), axis=1)
+
+    def _get_bins(self, p_min, p_max, npix):
+        """
+        Convert pixel ranges to bin ranges
+
+        The pixel ranges are enlarged by the margin and
+        clipped at the image border.
+
+        @param p_min: the minimum coordinates [pixel, 1-based]
+        @type p_min: numpy.ndarray
+        @param p_max: the maximum coordinates [pixel, 1-based]
+        @type p_max: numpy.ndarray
+        @param npix: the number of pixels along the axis
+        @type npix: int
+
+        @return: the first and last bin and the valid flags
+        @rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        """
+        # get the pixel indices including the margin
+        i_min = np.floor(p_min - 0.5).astype(np.int64) - self.margin
+        i_max = np.floor(p_max - 0.5).astype(np.int64) + self.margin
+
+        # mark ranges which overlap with the image
+        valid = (i_max >= 0) & (i_min < npix)
+
+        # clip and convert to bins
+        b_min = np.clip(i_min, 0, npix-1) // self.binsize
+        b_max = np.clip(i_max, 0, npix-1) // self.binsize
+
+        # return the bins
+        return b_min, b_max, valid
+
+    def get_covered_pixels(self, flt_wcs, flt_shape):
+        """
+        Get the pixels in the tiles covered by objects
+
+        The blotted frame is divided into tiles. The borders
+        of all tiles are transformed at once to the frame of
+        the segmentation image, and tiles whose bounding box
+        contains object pixels are selected.
+
+        @param flt_wcs: the WCS of the blotted frame
+        @type flt_wcs: HSTWCS
+        @param flt_shape: the dimension of the blotted frame
+        @type flt_shape: (int, int)
+
+        @return: the sorted flat indices of the covered pixels
+        @rtype: numpy.ndarray
+        """
+        ny, nx = flt_shape
+
+        # the tile boundaries
+        x_low, y_low = np.meshgrid(np.arange(0, nx, self.tilesize), np.arange(0, ny, self.tilesize))
+        x_low = x_low.ravel()
+        y_low = y_low.ravel()
+        x_upp = np.minimum(x_low + self.tilesize, nx)
+        y_upp = np.minimum(y_low + self.tilesize, ny)
+
+        # the corners and edge centers of the tiles;
+        # shifted to 1-based pixel edges
+        x_mid = 0.5 * (x_low + x_upp)
+        y_mid = 0.5 * (y_low + y_upp)
+        x_bnd = np.column_stack([x_low, x_mid, x_upp, x_upp, x_upp, x_mid, x_low, x_low]) + 0.5
+        y_bnd = np.column_stack([y_low, y_low, y_low, y_mid, y_upp, y_upp, y_upp, y_mid]) + 0.5
+
+        # transform the tile boundaries to the segmentation frame
+        ra, dec = flt_wcs.all_pix2world(x_bnd.ravel(), y_bnd.ravel(), 1)
+        x_seg, y_seg = self.wcs.all_world2pix(ra, dec, 1)
+        x_seg = x_seg.reshape(x_bnd.shape)
+        y_seg = y_seg.reshape(y_bnd.shape)
+
+        # get the bin ranges of the bounding boxes
+        bx_min, bx_max, x_valid = self._get_bins(x_seg.min(axis=1), x_seg.max(axis=1), self.shape[1])
+        by_min, by_max, y_valid = self._get_bins(y_seg.min(axis=1), y_seg.max(axis=1), self.shape[0])
+
+        # count the occupied bins in the bounding boxes
+        nobj = self.sumtab[by_max+1, bx_max+1] - self.sumtab[by_min, bx_max+1] \
+               - self.sumtab[by_max+1, bx_min] + self.sumtab[by_min, bx_min]
+        covered = np.flatnonzero(x_valid & y_valid & (nobj > 0))
+
+        # collect the pixels of the covered tiles
+        index = [np.zeros(0, dtype=np.int64)]
+        for tile in covered:
+            y_pix, x_pix = np.mgrid[y_low[tile]:y_upp[tile], x_low[tile]:x_upp[tile]]
+            index.append((y_pix * nx + x_pix).ravel().astype(np.int64))
+
+        # return the sorted indices
+        return np.sort(np.concatenate(index))
+
+
 class Flux_Cube(object):
     """
     The class for the fluxcube images. The creation of those
@@ -178,6 +461,12 @@ class Flux_Cube(object):
     Correspondingly the class is oriented to mainly serve
     this purpose.
     """
+    # the WCS's of the drizzled images
+    drz_wcs_list = {}
+
+    # the object footprints of the segmentation images
+    footprint_list = {}
+
     def __init__(self, grism_image, index, useMdriz):
         """
         Initializes the class
@@ -363,6 +652,15 @@ class Flux_Cube(object):
         #self.inima_dims = self._get_indims(self.inima_name, self.inima_extnum)
         self.inima_dims = self._get_indims(self.fcube_info)
 
+        # the frame of the input image and the pixel mappings
+        # onto it are derived once and then shared by the
+        # segmentation and all filter images
+        self.flt_frame   = None
+        self.blot_maps   = {}
+        self.blot_coeffs = None
+        self.footprint = None
+        self.sparse = False
+
     def _get_fcube_info(self, header_name):
         """
         Get all info on the extension
@@ -440,6 +738,46 @@ class Flux_Cube(object):
         inima.close()
 
 
+    def _get_blot_coeffs(self):
+        """
+        Get the coefficients file for blot
+
+        The drizzle coefficients of the input image are
+        corrected for the offset of the fluxcube and
+        written to a new file. This is done only once for
+        every input image, all subsequent calls return
+        the name of the just existing file.
+
+        @return: the name of the corrected coefficients file
+        @rtype: string
+        """
+        # check whether the file was already written
+        # for the current offsets
+        if self.blot_coeffs != None and \
+            self.blot_coeffs[0] == (self.x_offs, self.y_offs):
+            return self.blot_coeffs[1]
+
+        #print self.x_offs
+        coeffs_lines = open(self.coef).readlines()
+        for i, line in enumerate(coeffs_lines):
+            if line.strip().startswith('refpix'):
+                ##print line
+                old_x = float(coeffs_lines[i].split()[1])
+                old_y = float(coeffs_lines[i].split()[2])
+                new_x = old_x - self.x_offs
+                new_y = old_y - self.y_offs
+                coeffs_lines[i] = 'refpix %9.3f %9.3f\n'%(new_x,new_y)
+        new_coef = self.coef+".FLX"
+        fp = open(new_coef,"w")
+        fp.writelines(coeffs_lines)
+        fp.close()
+
+        # store the offsets and the name
+        self.blot_coeffs = ((self.x_offs, self.y_offs), new_coef)
+
+        # return the name
+        return new_coef
+
     def _blot_image(self, in_image, out_image, x_excess, y_excess, interpol):
         """
         Blot one image
@@ -464,21 +802,8 @@ class Flux_Cube(object):
         from pyraf import iraf
         from iraf import stsdas,analysis,dither
 
-        #print self.x_offs
-        coeffs_lines = open(self.coef).readlines()
-        for i, line in enumerate(coeffs_lines):
-            if line.strip().startswith('refpix'):
-                ##print line
-                old_x = float(coeffs_lines[i].split()[1])
-                old_y = float(coeffs_lines[i].split()[2])
-                new_x = old_x - self.x_offs
-                new_y = old_y - self.y_offs
-                coeffs_lines[i] = 'refpix %9.3f %9.3f\n'%(new_x,new_y)
-        new_coef = self.coef+".FLX"
-        fp = open(new_coef,"w")
-        fp.writelines(coeffs_lines)
-        fp.close()
-
+        # get the offset corrected coefficients
+        new_coef = self._get_blot_coeffs()
 
         irafout=''
         #we need to take into account MEF and Simple segment maps wince SEXTRACTOR now
@@ -520,52 +845,35 @@ class Flux_Cube(object):
         return 0
 
 
-    def _a_blot_image(self, image_to_blot, tempname, x_excess, y_excess, interp):
+    def _get_flt_frame(self, x_excess, y_excess):
         """
-        Blot one image.
-
-        Thats just a simple wrapper around the task blot in astrodrizzle
+        Get header and WCS of the blotted frame
 
-        @param image_to_blot: the input image name, either the grism or direct drizzled image
-        @type in_image: string
-
-        @param tempname: the name of the output blotted image
-        @type out_image: string
+        The method derives the header and the WCS of the input
+        image, enlarged by the excess pixels on either side.
+        Both are computed only once and are then re-used for
+        all images blotted onto this input image.
 
+        @param x_excess: the pixel excess in x
+        @type x_excess: int
+        @param y_excess: the pixel excess in y
+        @type y_excess: int
 
+        @return: the header and the WCS of the blotted frame
+        @rtype: (pyfits.Header, HSTWCS)
         """
-        from drizzlepac import astrodrizzle
-
-        #the drizzle coeff information for adriz is taken from the self.data image,
-        excess_x=0
-        excess_y=0
+        # check whether the frame is already known
+        if self.flt_frame != None and self.flt_frame[0] == (x_excess, y_excess):
+            return self.flt_frame[1].copy(), self.flt_frame[2]
 
         ##use the current data as reference image for output
         #self.data comes from the header of the input grism or flux image
         #and is one of the input images used to make the drizzled image_to_blot
         input_image=(self.data).split("[")[0]
-        exptime=pyfits.getval(input_image,'EXPTIME')
-        bunit=pyfits.getval(image_to_blot,'BUNIT')
 
         flt_header=pyfits.getheader(input_image)
         flt_wcs=HSTWCS(self.data)
 
-
-        #now look at the image to blot, this is a drizzled image
-        ftype=fileutil.isFits(image_to_blot)[1]
-
-        if ( ftype == 'mef'):
-            blot_wcs=HSTWCS(image_to_blot,ext=(str(self.fcube_info["ext_nam"]),str(self.fcube_info["ext_ver"])))
-            image_data=pyfits.getdata(image_to_blot,extname=str(self.fcube_info["ext_nam"]),extver=int(self.fcube_info["ext_nam"]))
-
-        elif (ftype == 'simple'):
-            blot_wcs=HSTWCS(image_to_blot) #assume simple
-            image_data = pyfits.getdata(image_to_blot)
-
-        else:
-            return IOError("File type of fits image is not supported %s"%(image_to_blot))
-
-
         #edit the wcs header information to add any dim_info shifts that we need, expanding the size of the output image
         #make sure this gets saved to the output extension header. The lambda image will be bigger than the segment image
         if x_excess > 0:
@@ -584,119 +892,337 @@ class Flux_Cube(object):
             flt_wcs.wcs.crpix=np.array([crpix[0],newy])
             flt_wcs.sip.crpix[1]=newy
 
-        #outimage is just the data array
-        outimage=astrodrizzle.ablot.do_blot(image_data.astype(np.float32), blot_wcs, flt_wcs, 1.,
-                interp=interp, sinscl=1.,coeffs=True,wcsmap=None,stepsize=10)
-
-
         #update the flt_header with the flt_wcs information I created
         flt_header['CRPIX1']=flt_wcs.wcs.crpix[0]
         flt_header['CRPIX2']=flt_wcs.wcs.crpix[1]
 
-        try:
-            newimage=pyfits.PrimaryHDU()
-            newimage.data=outimage
-            newimage.header=flt_header
-            newimage.header['BUNIT']=bunit
-            newimage.header.update(flt_wcs.to_header())
-            newimage.verify('silentfix')
-            newimage.writeto(tempname)
-        except:
-            raise IOError("Problem writing fits image %s"%(tempname))
+        # store the frame for later calls;
+        # mappings onto a previous frame are invalid
+        self.flt_frame = ((x_excess, y_excess), flt_header, flt_wcs)
+        self.blot_maps = {}
 
+        # return a copy of the header and the WCS
+        return flt_header.copy(), flt_wcs
 
+    def _get_wcs_key(self, drz_wcs):
+        """
+        Compose a key for a drizzled frame
 
-    def _a_blot_segment_image(self, image_to_blot, tempname, x_excess, y_excess, interp):
+        Two drizzled images with the same dimension and
+        the same linear WCS are on the same frame and
+        can share the pixel mapping.
 
+        @param drz_wcs: the WCS of the drizzled frame
+        @type drz_wcs: HSTWCS
+
+        @return: the key
+        @rtype: tuple
         """
-        Blot the segmentation or other nondrizzled image as if it were
+        return (int(drz_wcs.naxis1), int(drz_wcs.naxis2),
+                tuple(np.round(drz_wcs.wcs.crpix, 6)),
+                tuple(np.round(drz_wcs.wcs.crval, 10)),
+                tuple(np.round(drz_wcs.wcs.cd.ravel(), 14)))
 
-        assume self.grism_image is always used as the source wcs reference
+    def _get_blot_map(self, drz_wcs, flt_wcs):
+        """
+        Get the pixel mapping between two frames
 
-        Thats just a simple wrapper around the task blot in astrodrizzle
+        The mapping from a drizzled frame to the blotted frame
+        depends only on the WCS of both. It is thus computed
+        once for each distinct drizzled frame and then
+        shared by all images on this frame. In sparse mode
+        the mapping covers only the object footprint.
 
-        @param image_to_blot: the input image name, either the grism or direct drizzled image
-        @type in_image: string
+        @param drz_wcs: the WCS of the drizzled image
+        @type drz_wcs: HSTWCS
+        @param flt_wcs: the WCS of the blotted frame
+        @type flt_wcs: HSTWCS
 
-        @param tempname: the name of the output blotted image
-        @type out_image: string
+        @return: the pixel mapping
+        @rtype: Blot_Map
+        """
+        # compose a key from the drizzled frame
+        map_key = self._get_wcs_key(drz_wcs)
 
-        exposure time is hard coded to 1 since it was made from the drizzled image and we dont
-        want the id numbers rescaled by the exposure time that was used for blotting
+        # create the mapping if not yet known
+        if map_key not in self.blot_maps:
+            self.blot_maps[map_key] = Blot_Map(drz_wcs, flt_wcs, footprint=self.footprint)
 
+        # return the mapping
+        return self.blot_maps[map_key]
+
+    def _do_a_blot(self, image_data, drz_wcs, flt_wcs, interp):
+        """
+        Blot a data array
+
+        For nearest neighbour interpolation the data is
+        blotted with the shared pixel mapping. All other
+        interpolation methods are passed on to the blot
+        in astrodrizzle, however with the shared WCS's.
+
+        @param image_data: the data to blot
+        @type image_data: numpy.ndarray
+        @param drz_wcs: the WCS of the drizzled image
+        @type drz_wcs: HSTWCS
+        @param flt_wcs: the WCS of the blotted frame
+        @type flt_wcs: HSTWCS
+        @param interp: the interpolation method
+        @type interp: string
+
+        @return: the blotted data
+        @rtype: numpy.ndarray
         """
         from drizzlepac import astrodrizzle
 
-        excess_x=0
-        excess_y=0
+        # use the shared mapping for nearest neighbour
+        if interp == 'nearest':
+            blot_map = self._get_blot_map(drz_wcs, flt_wcs)
+            return blot_map.blot(image_data)
 
-        #the drizzle coeff information for adriz is taken from the self.data image,
+        #outimage is just the data array
+        return astrodrizzle.ablot.do_blot(image_data.astype(np.float32), drz_wcs, flt_wcs, 1.,
+                interp=interp, sinscl=1.,coeffs=True,wcsmap=None,stepsize=10)
 
-        input_image=(self.data).split("[")[0] #use the current data as reference image
-        exptime=1. #dont scale the segment image pyfits.getval(input_image,'EXPTIME')
+    def _get_drz_wcs(self, image_name, ext=None):
+        """
+        Get the WCS of a drizzled image
 
-        flt_header=pyfits.getheader(input_image)
-        flt_wcs=HSTWCS(self.data)
+        The WCS of every drizzled image is read only once.
+        Since all fluxcubes of a grism image are made from
+        the same drizzled images, the WCS's are kept on
+        the class level. The WCS is read again if the
+        modification time or size of the image has changed.
+
+        @param image_name: the drizzled image
+        @type image_name: string
+        @param ext: the extension
+        @type ext: tuple
+
+        @return: the WCS
+        @rtype: HSTWCS
+        """
+        import os
+
+        # the key into the WCS list and
+        # the identification of the image
+        filepath = os.path.abspath(image_name)
+        fstat = os.stat(filepath)
+        fident = (fstat.st_mtime, fstat.st_size)
+        wcs_key = (filepath, ext)
+
+        # read the WCS if new or changed
+        if wcs_key not in Flux_Cube.drz_wcs_list or Flux_Cube.drz_wcs_list[wcs_key][0] != fident:
+            if ext == None:
+                Flux_Cube.drz_wcs_list[wcs_key] = (fident, HSTWCS(filepath))
+            else:
+                Flux_Cube.drz_wcs_list[wcs_key] = (fident, HSTWCS(filepath, ext=ext))
+
+        # return the WCS
+        return Flux_Cube.drz_wcs_list[wcs_key][1]
+
+    def _get_footprint(self, segm_name, ext=None):
+        """
+        Get the object footprint of a segmentation image
+
+        The footprint depends on the segmentation image only
+        and is therefore shared by all fluxcubes. It is made
+        again if the modification time or size of the
+        segmentation image has changed.
+
+        @param segm_name: the name of the segmentation image
+        @type segm_name: string
+        @param ext: the extension
+        @type ext: tuple
+
+        @return: the footprint
+        @rtype: Segm_Footprint
+        """
+        import os
+
+        # the key into the footprint list and
+        # the identification of the image
+        filepath = os.path.abspath(segm_name)
+        fstat = os.stat(filepath)
+        fident = (fstat.st_mtime, fstat.st_size)
+        fprint_key = (filepath, ext)
+
+        # create the footprint if new or changed
+        if fprint_key not in Flux_Cube.footprint_list or Flux_Cube.footprint_list[fprint_key][0] != fident:
+            segm_wcs, segm_data = self._get_segm_input(segm_name)
+            Flux_Cube.footprint_list[fprint_key] = (fident, Segm_Footprint(segm_data, segm_wcs))
+
+        # return the footprint
+        return Flux_Cube.footprint_list[fprint_key][1]
+
+    def _get_segm_ext(self, image_name):
+        """
+        Get the extension of a segmentation-like image
+
+        @param image_name: the image name
+        @type image_name: string
+
+        @return: the extension, None for simple fits
+        @rtype: tuple
+        """
+        ftype=fileutil.isFits(image_name)[1]
+        if (ftype == 'mef'):
+            return (str(self.fcube_info["ext_nam"]),self.fcube_info["ext_ver"])
+        elif (ftype == 'simple'):
+            return None
+        else:
+            raise IOError("Input image is not a supported FITS type: %s"%(image_name))
+
+    def _get_segm_input(self, image_to_blot):
+        """
+        Get the WCS and data to blot a segmentation image
 
+        The WCS is the one of the grism image, the data
+        is memory mapped.
+
+        @param image_to_blot: the image name
+        @type image_to_blot: string
+
+        @return: the WCS and the data
+        @rtype: (HSTWCS, numpy.ndarray)
+        """
         #check to see if this is a simple fits or MEF and grab the science information
         #The output image
         ftype=fileutil.isFits(self.grism_image_name)[1]
 
         if (ftype == 'mef'):
-            grism_wcs=HSTWCS(self.grism_image_name,ext=(str(self.fcube_info["ext_nam"]),self.fcube_info["ext_ver"]))
+            grism_wcs=self._get_drz_wcs(self.grism_image_name, (str(self.fcube_info["ext_nam"]),self.fcube_info["ext_ver"]))
         elif (ftype == 'simple'):
-            grism_wcs=HSTWCS(self.grism_image_name) #assume simple and info in primary
+            grism_wcs=self._get_drz_wcs(self.grism_image_name) #assume simple and info in primary
         else:
-            return IOError("File type of fits image is not supported %s"%(image_to_blot))
+            raise IOError("File type of fits image is not supported %s"%(image_to_blot))
+
+        ext = self._get_segm_ext(image_to_blot)
+        if ext != None:
+            image_data=pyfits.getdata(image_to_blot,ext=ext,memmap=True) #get the first science image
+        else:
+            image_data = pyfits.getdata(image_to_blot, memmap=True)
+
+        # return WCS and data
+        return grism_wcs, image_data
+
+    def make_footprint(self, segm_image):
+        """
+        Make the object footprint of the segmentation image
+
+        Called before the fluxcubes are created in worker
+        processes, such that the processes inherit the
+        footprint instead of making their own.
+
+        @param segm_image: the name of the segmentation image
+        @type segm_image: string
+        """
+        self._get_footprint(segm_image, self._get_segm_ext(segm_image))
+
+    def _read_blotted(self, tempname):
+        """
+        Read a blotted image into memory
+
+        The image blotted by the task blot is read
+        into memory and the file is removed.
+
+        @param tempname: the name of the blotted image
+        @type tempname: string
+
+        @return: the data and the header
+        @rtype: (numpy.ndarray, pyfits.Header)
+        """
+        import os
+
+        # read data and header
+        outimage, header = pyfits.getdata(tempname, header=True, memmap=False)
+
+        # delete the tmp-file
+        os.unlink(tempname)
+
+        # return data and header
+        return outimage, header
+
+    def _a_blot_image(self, image_to_blot, x_excess, y_excess, interp):
+        """
+        Blot one image.
+
+        Thats just a simple wrapper around the task blot in astrodrizzle.
+        The blotted data and its header are returned in memory.
+
+        @param image_to_blot: the input image name, either the grism or direct drizzled image
+        @type in_image: string
+
+        @return: the blotted data and its header
+        @rtype: (numpy.ndarray, pyfits.Header)
+        """
+        #the drizzle coeff information for adriz is taken from the self.data image,
+        bunit=pyfits.getval(image_to_blot,'BUNIT')
+
+        # get the blotted frame
+        flt_header, flt_wcs = self._get_flt_frame(x_excess, y_excess)
 
+        #now look at the image to blot, this is a drizzled image
         ftype=fileutil.isFits(image_to_blot)[1]
-        if (ftype == 'mef'):
-            image_data=pyfits.getdata(image_to_blot,ext=(str(self.fcube_info["ext_nam"]),self.fcube_info["ext_ver"])) #get the first science image
+
+        if ( ftype == 'mef'):
+            blot_wcs=self._get_drz_wcs(image_to_blot, (str(self.fcube_info["ext_nam"]),str(self.fcube_info["ext_ver"])))
+            image_data=pyfits.getdata(image_to_blot,extname=str(self.fcube_info["ext_nam"]),extver=int(self.fcube_info["ext_ver"]),memmap=True)
+
         elif (ftype == 'simple'):
-            image_data = pyfits.getdata(image_to_blot)
+            blot_wcs=self._get_drz_wcs(image_to_blot) #assume simple
+            image_data = pyfits.getdata(image_to_blot, memmap=True)
+
         else:
-            return IOError("Input image is not a supported FITS type: %s"%(image_to_blot))
+            raise IOError("File type of fits image is not supported %s"%(image_to_blot))
 
+        #outimage is just the data array
+        outimage=self._do_a_blot(image_data, blot_wcs, flt_wcs, interp)
 
-        #edit the wcs header information to add any dim_info shifts that we need,
-        #the segment image needs to be the same sky area cut without the added pixels
-        if x_excess > 0:
-            excess_x = flt_wcs.naxis1+x_excess*2.
-            flt_wcs.naxis1=excess_x
-            crpix=flt_wcs.wcs.crpix
-            newx=crpix[0] + x_excess
-            flt_wcs.wcs.crpix=np.array([newx,crpix[1]])
-            flt_wcs.sip.crpix[0]=newx
+        # complete the header
+        flt_header['BUNIT']=bunit
+        flt_header.update(flt_wcs.to_header())
 
-        if y_excess > 0:
-            excess_y = flt_wcs.naxis2+y_excess*2.
-            flt_wcs.naxis2=excess_y
-            crpix=flt_wcs.wcs.crpix
-            newy=crpix[1] + y_excess
-            flt_wcs.wcs.crpix=np.array([crpix[0],newy])
-            flt_wcs.sip.crpix[1]=newy
+        # return data and header
+        return outimage, flt_header
 
+    def _a_blot_segment_image(self, image_to_blot, x_excess, y_excess, interp):
 
-        #returns a numpy.ndarray which is just the data
-        outimage=astrodrizzle.ablot.do_blot(image_data.astype(np.float32), grism_wcs, flt_wcs, 1.,
-                interp=interp, sinscl=1.,coeffs=True,wcsmap=None,stepsize=10)
+        """
+        Blot the segmentation or other nondrizzled image as if it were
 
-        #update the flt_header with the flt_wcs information I created
-        flt_header['CRPIX1']=flt_wcs.wcs.crpix[0]
-        flt_header['CRPIX2']=flt_wcs.wcs.crpix[1]
+        assume self.grism_image is always used as the source wcs reference
 
-        #if the input flt was an MEF we need to write an MEF out
-        try:
-            newimage=pyfits.PrimaryHDU()
-            newimage.data=outimage
-            newimage.header=flt_header
-            newimage.header.update(flt_wcs.to_header())
-            newimage.verify('silentfix')
-            newimage.writeto(tempname)
-        except:
-            raise IOError("Problem writing fits image %s"%(tempname))
+        Thats just a simple wrapper around the task blot in astrodrizzle
+
+        @param image_to_blot: the input image name, either the grism or direct drizzled image
+        @type in_image: string
+
+        @return: the blotted data and its header
+        @rtype: (numpy.ndarray, pyfits.Header)
+
+        exposure time is hard coded to 1 since it was made from the drizzled image and we dont
+        want the id numbers rescaled by the exposure time that was used for blotting
+
+        """
+        #the drizzle coeff information for adriz is taken from the self.data image,
+        flt_header, flt_wcs = self._get_flt_frame(x_excess, y_excess)
+
+        # get the WCS and the data
+        grism_wcs, image_data = self._get_segm_input(image_to_blot)
 
+        # in sparse mode, restrict all blots
+        # to the footprint of the objects
+        if self.sparse:
+            self.footprint = self._get_footprint(image_to_blot, self._get_segm_ext(image_to_blot))
 
+        #returns a numpy.ndarray which is just the data
+        outimage=self._do_a_blot(image_data, grism_wcs, flt_wcs, interp)
+
+        # complete the header
+        flt_header.update(flt_wcs.to_header())
+
+        # return data and header
+        return outimage, flt_header
 
     def _get_fcubename(self, fcube_info):
         """
@@ -836,7 +1362,7 @@ class Flux_Cube(object):
         # return the number
         return coeffname
 
-    def create_fitscube(self, segm_image, filter_images, dim_info, interpol):
+    def create_fitscube(self, segm_image, filter_images, dim_info, interpol, sparse=False):
         """
         Creates one fitscube
 
@@ -853,12 +1379,17 @@ class Flux_Cube(object):
         @type dim_info: []
         @param interpol: the interpolation method for the flux images
         @type interpol: string
+        @param sparse: blot only the tiles covered by objects
+        @type sparse: boolean
         """
         import os
         import os.path
 
         from astropy.io import fits as pyfits
         from . import axeutils
+
+        # store the sparse flag
+        self.sparse = sparse
         # look for the maximum excess in x and y
         x_excess = max([dim_info[0], dim_info[1]])
         y_excess = max([dim_info[2], dim_info[3]])
@@ -883,10 +1414,6 @@ class Flux_Cube(object):
 
         print('Creating ', self.fcube_name, ' ...', end= ' ')
 
-        # delete a just existing, previous fluxcube image
-        if os.path.isfile(self.fcube_name):
-            os.unlink(self.fcube_name)
-
         # set up the fluxcube image, and store the primary
         # header; also store the keywords XOFFS/YOFFS in
         # the primary header
@@ -896,82 +1423,92 @@ class Flux_Cube(object):
         hdr = mex_hdu[0].header
         hdr['XOFFS'] = (x_offs, 'X-OFFSET between flt and fluxcube')
         hdr['YOFFS'] = (y_offs, 'Y-OFFSET between flt and fluxcube')
-        mex_hdu.writeto(self.fcube_name)
 
-        # get a tmp-filename
-        tmpname =  axeutils.get_random_filename('','.fits')
         # blot the segmenation image
         if self.useMdriz:
+            # get a tmp-filename
+            tmpname =  axeutils.get_random_filename('','.fits')
             if (self._blot_image(segm_image, tmpname, x_excess, y_excess, 'nearest')):
                 print('problem blotting',segm_image)
+                return 1
 
-            else:
-                self._renormalize_image(tmpname)
+            self._renormalize_image(tmpname)
+            outimage, header = self._read_blotted(tmpname)
 
         else: #use astrodrizzle blot,
-            self._a_blot_segment_image(segm_image,tmpname,x_excess, y_excess, 'nearest')
+            outimage, header = self._a_blot_segment_image(segm_image,x_excess, y_excess, 'nearest')
 
-
-        # copy the appropriate image section to the fluxcube
-        tmp_fits = pyfits.open(tmpname, 'readonly')
-        tmp_fits[0].header['EXTNAME']='SEGM'
-        tmp_fits[0].header['EXTVER']=1
-        pyfits.append (self.fcube_name,
-                       tmp_fits[0].data[y_start-1:y_end,x_start-1:x_end],
-                       tmp_fits[0].header)
-        tmp_fits.close()
-
-        # delete the tmp-file
-        os.unlink(tmpname)
+        # add the appropriate image section to the fluxcube
+        header['EXTNAME']='SEGM'
+        header['EXTVER']=1
+        mex_hdu.append(pyfits.ImageHDU(data=outimage[y_start-1:y_end,x_start-1:x_end], header=header))
 
         # go over all filter images
         for  fimage in filter_images:
 
             # get the name of the fluximage and the
-            # wavelength; prepare the keword entry for
-            # the wavelength
+            # wavelength
             fluximg    = fimage.get_fluxname()
             wavelength = fimage.get_wavelength()
-            ext_name   = '[LAMBDA'+ str(int(wavelength))+',1,append]'
-
-            # get a tmp-filename
-            tmpname =  axeutils.get_random_filename('','.fits')
 
             # blot the fluximage
             if self.useMdriz:
+                # get a tmp-filename
+                tmpname =  axeutils.get_random_filename('','.fits')
                 res=self._blot_image(fluximg, tmpname, x_excess, y_excess, interpol)
-                self._renormalize_image(tmpname)
 
                 # just return in case there was an error
                 if res:
                     print('Interrupted multidrizzle blot')
                     return res
 
+                self._renormalize_image(tmpname)
+                outimage, header = self._read_blotted(tmpname)
+
             else: #astro blot all the input flux filter images
                 print("Using excess pixels of x,y ", x_excess, y_excess)
-                self._a_blot_image(fluximg,tmpname,x_excess, y_excess,interpol) #use a reference image for blotting
-
+                outimage, header = self._a_blot_image(fluximg,x_excess, y_excess,interpol) #use a reference image for blotting
 
+            # store the wavelength and the extension
+            # name in the header
+            header['WAVELENG'] = (wavelength, 'wavelength the image was taken')
+            header['EXTNAME']='LAMBDA'+str(int(wavelength))
+            header['EXTVER']=1
 
-            # store the wavelength in the header
-            tmp_fits = pyfits.open(tmpname, 'update')
-            tmp_fits[0].header['WAVELENG'] = (wavelength, 'wavelength the image was taken')
-            tmp_fits.close()
+            # add the layer to the fluxcube
+            mex_hdu.append(pyfits.ImageHDU(data=outimage, header=header))
 
-            # copy the appropriate section to te fluxcube
-            tmp_fits = pyfits.open(tmpname, 'readonly')
-            tmp_fits[0].header['EXTNAME']='LAMBDA'+str(int(wavelength))
-            tmp_fits[0].header['EXTVER']=1
-            pyfits.append (self.fcube_name, tmp_fits[0].data,
-                           tmp_fits[0].header)
-            tmp_fits.close()
+        # delete a just existing, previous fluxcube image
+        if os.path.isfile(self.fcube_name):
+            os.unlink(self.fcube_name)
 
-            # delete the tmp-file again
-            os.unlink(tmpname)
+        # write the fluxcube in one go
+        mex_hdu.writeto(self.fcube_name, output_verify='silentfix')
 
         print(' Done')
 
 
+def _make_fitscube(fcube_input):
+    """
+    Create one fluxcube
+
+    The function is on the module level such that
+    it can be handed over to the worker processes.
+
+    @param fcube_input: fluxcube, segmentation image, flux images,
+                        dimension info, interpolation and sparse flag
+    @type fcube_input: tuple
+
+    @return: the return value of the fluxcube creation
+    @rtype: int
+    """
+    # unpack the input
+    fcube, segm_image, filter_images, dim_info, interpol, sparse = fcube_input
+
+    # create the fluxcube
+    return fcube.create_fitscube(segm_image, filter_images, dim_info, interpol, sparse)
+
+
 class Flux_Image(object):
     """
     The class for the flux images. The flux images are the
@@ -1084,17 +1621,17 @@ class Flux_Image(object):
         """
         return self.wavelength
 
-    def transform_toflux(self, segm_image):
+    def open_fluxstream(self, segm_shape):
         """
-        Transform an image from cps to flux
+        Open the conversion from cps to flux
 
-        The method creates a flux image for a direct multidrizzled
-        image. The direct image comes directly from multidrizzle,
-        its unit is [cts/s], however the fluxcubes need the information
-        in ergs/cm^2/s/AA.
+        The direct image is opened memory mapped, and the flux
+        image is set up as a stream, such that it can be written
+        block by block. The header of the flux image is the
+        primary header combined with the science header.
 
-        @param segm_image: the segmentation for the data set
-        @type segm_image: string
+        @param segm_shape: the dimension of the segmentation image
+        @type segm_shape: (int, int)
         """
         import os
         import os.path
@@ -1109,61 +1646,106 @@ class Flux_Image(object):
             os.unlink(self.flux_name)
 
         # the expression to apply to the image data
-        expon = 10.0 ** (-0.4 * (21.10 + self.st_zero))
+        self.expon = 10.0 ** (-0.4 * (21.10 + self.st_zero))
 
         print(' image_name: %s' % (self.image_name.split('[')[0]))
-        print(' segm_image: %s' % segm_image)
         print(' flux_name: %s' % self.flux_name)
 
-
-        # open the input files and apply the conversion
-        file_a = pyfits.open(self.image_name.split('[')[0], 'readonly')
-        file_b = pyfits.open(segm_image, 'readonly')
-        ftype=fileutil.isFits(file_b.filename())[1]
-        if (ftype == 'mef'):
-            bgt1 = file_b[1].data >= 1 #assume in first
-            blt1 = file_b[1].data < 1 #assume in first
-        else:
-            bgt1 = file_b[0].data >= 1
-            blt1 = file_b[0].data < 1
-
-        ftype=fileutil.isFits(file_a.filename())[1]
-
-        if (ftype == 'mef'):
-            file_a['SCI'].data[bgt1] *= expon
-            file_a['SCI'].data[blt1] = 0.0
-        else:
-            file_a[0].data[bgt1] *= expon
-            file_a[0].data[blt1] = 0.0
+        # open the input file memory mapped
+        self.in_fits = pyfits.open(self.image_name.split('[')[0], 'readonly', memmap=True)
+        ftype=fileutil.isFits(self.in_fits.filename())[1]
 
         # concatenate the primary and extension headers for output
         # to a simple FITS file
-        prihdr = file_a[0].header
-
-        del prihdr['nextend']
+        prihdr = self.in_fits[0].header.copy()
+        if 'NEXTEND' in prihdr:
+            del prihdr['nextend']
 
         if (ftype == 'mef'):
-            scihdr = file_a['SCI'].header
+            scihdr = self.in_fits['SCI'].header.copy()
             scihdr._strip()
             newhdr = pyfits.Header(prihdr.ascard + scihdr.ascard)
-            data=file_a['SCI'].data
+            self.in_data = self.in_fits['SCI'].data
         else:
             newhdr = pyfits.Header(prihdr.ascard)
-            data=file_a[0].data
+            self.in_data = self.in_fits[0].data
 
-        #scihdr._strip() #remove cards which deal with header type like SIMPLE, BITPIX
-        #for key in ('EXTNAME','EXTVER','INHERIT','DATE','ORIGIN','IRAF-TLM'):
-        #    del scihdr[key]
+        # the image and the segmentation must match
+        if self.in_data.shape != segm_shape:
+            err_msg = 'FCUBEPREP: Image %s with dimension %s does not match the segmentation image %s!' \
+                      % (self.image_name.split('[')[0], str(self.in_data.shape), str(segm_shape))
+            raise aXeError(err_msg)
 
+        # the flux is stored as float; the FITS data
+        # is big-endian, so check kind and size
+        if self.in_data.dtype.kind == 'f' and self.in_data.dtype.itemsize == 8:
+            self.out_type = np.float64
+            newhdr['BITPIX'] = -64
+        else:
+            self.out_type = np.float32
+            newhdr['BITPIX'] = -32
+
+        # set the image dimension
+        newhdr['NAXIS'] = 2
+        newhdr.set('NAXIS1', self.in_data.shape[1], after='NAXIS')
+        newhdr.set('NAXIS2', self.in_data.shape[0], after='NAXIS1')
+
+        # open the flux image for writing
+        self.flux_stream = pyfits.StreamingHDU(self.flux_name, newhdr)
+
+    def write_fluxrows(self, row_start, row_end, segm_rows):
+        """
+        Convert and write a block of rows
+
+        The rows of the direct image are converted to flux
+        where the segmentation is larger or equal 1, and
+        set to zero elsewhere, then written to the flux image.
+
+        @param row_start: the first row of the block
+        @type row_start: int
+        @param row_end: the row after the block
+        @type row_end: int
+        @param segm_rows: the segmentation data of the block
+        @type segm_rows: numpy.ndarray
+        """
+        # convert the rows
+        flux_rows = np.where(segm_rows >= 1, self.in_data[row_start:row_end] * self.expon, 0.0)
 
-        # write the new flux image in simple fits format regardless of input format
-        pyfits.writeto(self.flux_name, data, newhdr)
-        file_a.close()
-        file_b.close()
+        # write the rows
+        self.flux_stream.write(flux_rows.astype(self.out_type))
+
+    def close_fluxstream(self):
+        """
+        Close the conversion from cps to flux
+
+        The flux image and the direct image are closed.
+        """
+        # close the output and the input;
+        # release them to keep the instance picklable
+        self.flux_stream.close()
+        self.flux_stream = None
+        self.in_data = None
+        self.in_fits.close()
+        self.in_fits = None
 
         print("")
         print(self.image_name, ' --> ', self.flux_name)
         print("")
+
+    def transform_toflux(self, segm_image):
+        """
+        Transform an image from cps to flux
+
+        The method creates a flux image for a direct multidrizzled
+        image. The direct image comes directly from multidrizzle,
+        its unit is [cts/s], however the fluxcubes need the information
+        in ergs/cm^2/s/AA.
+
+        @param segm_image: the segmentation for the data set
+        @type segm_image: string
+        """
+        # transform just this image
+        transform_allflux([self], segm_image)
         # Formulas:
         # STmag = -2.5*log10(image) + self.st_zero
         # STmag = -2.5*log10(F_lam) -21.10
@@ -1171,6 +1753,59 @@ class Flux_Image(object):
         # ==> F_lam = 10**(-0.4*(st_zero+21.10)) * image
 
 
+def transform_allflux(filter_images, segm_image, nrows=256):
+    """
+    Transform all direct images from cps to flux
+
+    All direct images are transformed in a single pass over
+    the segmentation image. The segmentation image and the
+    direct images are memory mapped and processed in blocks
+    of rows, the flux images are written block by block.
+    Thus the memory does not depend on the image size.
+
+    @param filter_images: the flux images
+    @type filter_images: [Flux_Image]
+    @param segm_image: the segmentation for the data set
+    @type segm_image: string
+    @param nrows: the number of rows in a block
+    @type nrows: int
+    """
+    from astropy.io import fits as pyfits
+
+    print(' segm_image: %s' % segm_image)
+
+    # open the segmentation image memory mapped
+    segm_fits = pyfits.open(segm_image, 'readonly', memmap=True)
+    ftype=fileutil.isFits(segm_fits.filename())[1]
+    if (ftype == 'mef'):
+        segm_data = segm_fits[1].data #assume in first
+    else:
+        segm_data = segm_fits[0].data
+
+    # open all conversions
+    for fimage in filter_images:
+        fimage.open_fluxstream(segm_data.shape)
+
+    # go over the blocks of rows
+    for row_start in range(0, segm_data.shape[0], nrows):
+        row_end = min(row_start + nrows, segm_data.shape[0])
+
+        # read the segmentation of the block once
+        segm_rows = np.array(segm_data[row_start:row_end])
+
+        # convert the block in all images
+        for fimage in filter_images:
+            fimage.write_fluxrows(row_start, row_end, segm_rows)
+
+    # close all conversions
+    for fimage in filter_images:
+        fimage.close_fluxstream()
+
+    # close the segmentation image
+    segm_data = None
+    segm_fits.close()
+
+
 class FluxCube_Maker(object):
     """
     Central class to take the input and to create the fluxcubes
@@ -1178,7 +1813,7 @@ class FluxCube_Maker(object):
     multidrizzled grism image.
     """
     def __init__(self, grism_image, segm_image, filter_info, AB_input,
-                 dim_term, interpol, useMdriz):
+                 dim_term, interpol, useMdriz, sparse=False, ncpus=1):
         """
         Initializes the class
 
@@ -1197,11 +1832,22 @@ class FluxCube_Maker(object):
         @type dim_term: string
         @param interpol: the interpolation method for the flux images
         @type interpol: string
+        @param sparse: blot only the tiles covered by objects
+        @type sparse: boolean
+        @param ncpus: the number of processes creating fluxcubes
+        @type ncpus: int
         """
         import os
         import os.path
 
         self.useMdriz = useMdriz #bool whether to blot or ablot, that is the question
+        self.sparse        = sparse
+        self.ncpus         = self._toInt(ncpus)
+
+        # check the number of processes
+        if self.ncpus == None or self.ncpus < 1:
+            err_msg = 'FCUBEPREP: The number of processes must be a positive integer, not: %s!' % str(ncpus)
+            raise aXeError(err_msg)
         self.filter_images = []
         self.dim_info      = []
         self.fcube_list    = []
@@ -1245,6 +1891,12 @@ class FluxCube_Maker(object):
         # store the interpolation method
         self.interpol = interpol
 
+        # the sparse blot is based on the pixel mapping
+        # of the astrodrizzle blot with nearest neighbour
+        if self.sparse and self.useMdriz:
+            print('FCUBEPREP: Sparse blotting is not possible with useMdriz, blotting full frames!')
+            self.sparse = False
+
     def _get_dimension_info(self,dimension_term):
         """
         Get the dimension information
@@ -1449,21 +2101,37 @@ class FluxCube_Maker(object):
         """
         import os
         import os.path
+        from . import axeutils
 
         # create the list of fluxcube instances that
         # will be created
         self.fcube_list.extend(self._fill_fcubelist(self.grism_image))
 
-        # prepare the direct images:
-        for fimage in self.filter_images:
-            fimage.transform_toflux(self.segm_image)
+        # prepare the direct images
+        # in one pass over the segmentation:
+        transform_allflux(self.filter_images, self.segm_image)
 
         # adjust the image headers
         self._trim_imheaders(self.segm_image, self.filter_images)
 
-        for fcube in self.fcube_list:
-            res = fcube.create_fitscube(self.segm_image, self.filter_images,
-                                        self.dim_info, self.interpol)
+        # compose the input for each fluxcube
+        fcube_input = [(fcube, self.segm_image, self.filter_images, self.dim_info,
+                        self.interpol, self.sparse) for fcube in self.fcube_list]
+
+        # the fluxcubes are independent of each other;
+        # create them in parallel if requested. The
+        # flux images and the segmentation image are
+        # memory mapped by the processes.
+        if self.ncpus > 1 and len(fcube_input) > 1:
+            # make the object footprints
+            # before the processes start
+            if self.sparse:
+                for fcube in self.fcube_list:
+                    fcube.make_footprint(self.segm_image)
+
+        results = axeutils.map_processes(_make_fitscube, fcube_input, self.ncpus)
+
+        for fcube, res in zip(self.fcube_list, results):
             if res:
                 # something went wrong, delete the fcube
                 if os.path.isfile(fcube.fcube_name):
@@ -40,7 +40,7 @@ class DummyImages(object):
         self.WCSext = None
 
         # load the aXe configuration file
-        self.conf = configfile.ConfigFile(confname)
+        self.conf = configfile.load_config(confname)
 
         # load the pre-defined image information
         image_data = self._get_image_data(self.conf)
@@ -61,8 +61,6 @@ class InputChecker(object):
     def _is_prism_data(self):
         """
         """
-        from astropy.io import fits as pyfits
-
         # define the default
         is_prism = 0
 
@@ -71,18 +69,18 @@ class InputChecker(object):
             # pick out one grism image
             one_grisim = self.axe_inputs[0]['GRISIM']
 
-            # open the fits
-            one_fits = pyfits.open(axeutils.getIMAGE(one_grisim), 'readonly')
+            # get the keywords of the primary header
+            prim_header = axeutils.get_fits_keys(axeutils.getIMAGE(one_grisim))[0]
 
             # read the keyword 'FILTER1'
-            if 'FILTER1' in one_fits[0].header:
-                filter1 = one_fits[0].header['FILTER1']
+            if 'FILTER1' in prim_header:
+                filter1 = prim_header['FILTER1']
             else:
                 filter1 = None
 
             # read the keyword 'FILTER2'
-            if 'FILTER2' in one_fits[0].header:
-                filter2 = one_fits[0].header['FILTER2']
+            if 'FILTER2' in prim_header:
+                filter2 = prim_header['FILTER2']
             else:
                 filter2 = None
 
@@ -92,9 +90,6 @@ class InputChecker(object):
                 # switch to IS_PRISM
                 is_prism = 1
 
-            # close the fits
-            one_fits.close()
-
         # return the index
         return is_prism
 
@@ -161,7 +156,7 @@ class InputChecker(object):
                 raise aXeError(err_msg)
 
             # load the IOL to check its format
-            iol = axeiol.InputObjectList(axeutils.getIMAGE(one_input['OBJCAT']))
+            iol = axeiol.ColumnObjectList(axeutils.getIMAGE(one_input['OBJCAT']))
 
             # put the IOL to the list
             IOL_list.append(one_input['OBJCAT'])
@@ -190,7 +185,7 @@ class InputChecker(object):
 
             # load the configuration file;
             # make sure all files mentioned therein do exist
-            conf = configfile.ConfigFile(axeutils.getCONF(one_input['CONFIG']))
+            conf = configfile.load_config(axeutils.getCONF(one_input['CONFIG']))
             conf.check_files()
 
             # put the config to the list
@@ -237,7 +232,7 @@ class InputChecker(object):
         for one_input in self.axe_inputs:
 
             # load the config file and get the extension information
-            conf = configfile.ConfigFile(axeutils.getCONF(one_input['CONFIG']))
+            conf = configfile.load_config(axeutils.getCONF(one_input['CONFIG']))
             ext_info = axeutils.get_ext_info(axeutils.getIMAGE(one_input['GRISIM']), conf)
 
             # derive the aXe names
@@ -253,29 +248,21 @@ class InputChecker(object):
         """
         Check for global background subtraction
         """
-        from astropy.io import fits as pyfits
         from . import configfile
 
         # go over all inputs
         for one_input in self.axe_inputs:
 
             # load the config file and get the extension information
-            conf = configfile.ConfigFile(axeutils.getCONF(one_input['CONFIG']))
+            conf = configfile.load_config(axeutils.getCONF(one_input['CONFIG']))
             ext_info = axeutils.get_ext_info(axeutils.getIMAGE(one_input['GRISIM']), conf)
 
-            # open the fits image
-            gri_fits = pyfits.open(axeutils.getIMAGE(one_input['GRISIM']), 'readonly')
-
-            # go to the correct header
-            act_header = gri_fits[ext_info['fits_ext']].header
+            # get the keywords of the correct header
+            act_header = axeutils.get_fits_keys(axeutils.getIMAGE(one_input['GRISIM']))[ext_info['fits_ext']]
 
             # make sure a sky background value is set
-            if 'SKY_CPS' in act_header and act_header['SKY_CPS'] >= 0.0:
-                # close the fits
-                gri_fits.close()
-            else:
-                # close fits, complain and out
-                gri_fits.close()
+            if not ('SKY_CPS' in act_header and act_header['SKY_CPS'] >= 0.0):
+                # complain and out
                 err_msg = '%s: The grism image: \n%s\nhas no keyword "SKY_CPS>=0.0" in the extension %i. This means it had NO global\nsky subtraction, which is required for the CRR version of aXedrizzle!' % (self.taskname, axeutils.getIMAGE(one_input['GRISIM']), ext_info['fits_ext'])
                 raise aXeError(err_msg)
 
@@ -286,7 +273,7 @@ class InputChecker(object):
         for one_input in self.axe_inputs:
 
             # load the config file and get the extension information
-            conf = configfile.ConfigFile(axeutils.getCONF(one_input['CONFIG']))
+            conf = configfile.load_config(axeutils.getCONF(one_input['CONFIG']))
             ext_info = axeutils.get_ext_info(axeutils.getIMAGE(one_input['GRISIM']), conf)
 
             # derive the aXe names
@@ -306,10 +293,28 @@ class InputChecker(object):
                 
                                             
 
-    def check_axeprep(self, backgr, backims):
+    def _check_ncpus(self, ncpus):
+        """
+        Check the number of processes
+        """
+        # convert to integer
+        try:
+            nprocs = int(ncpus)
+        except (TypeError, ValueError):
+            nprocs = None
+
+        # the number must be positive
+        if nprocs == None or nprocs < 1:
+            err_msg = '%s: The number of processes must be a positive integer, not: %s!' % (self.taskname, str(ncpus))
+            raise aXeError(err_msg)
+
+    def check_axeprep(self, backgr, backims, ncpus=1):
         """
         Comprises all file and file format checks for AXEPREP
         """
+        # check the number of processes
+        self._check_ncpus(ncpus)
+
         # check the grism images
         self._check_grism()
 
@@ -334,12 +339,15 @@ class InputChecker(object):
             self._check_masterbck()
 
     def check_axecore(self, back, extrfwhm, drzfwhm, backfwhm, orient, slitless_geom, np, interp,
-                      cont_model, weights, sampling):
+                      cont_model, weights, sampling, ncpus=1):
         """
         Comprises all file and file format checks for AXECORE
         """
         import math
 
+        # check the number of processes
+        self._check_ncpus(ncpus)
+
         # check the grism images
         self._check_grism()
 
@@ -539,7 +547,7 @@ model or drop optimal weighting!"""  % self.taskname
 
         else:
             # load the aXe configuration file
-            conf = configfile.ConfigFile(axeutils.getCONF(config))
+            conf = configfile.load_config(axeutils.getCONF(config))
 
             # make the internal checks
             n_sens = conf.check_files(check_glob=False)
@@ -675,7 +683,7 @@ reasonable (e.g. <0.0)!
 
         else:
             # load the aXe configuration file
-            conf = configfile.ConfigFile(axeutils.getCONF(config))
+            conf = configfile.load_config(axeutils.getCONF(config))
 
             # make the internal checks
             n_sens = conf.check_files(check_glob=False)
@@ -209,13 +209,52 @@ class ProjectionList:
         # return the number
         return coeffname
 
-    def make_grismcat(self, data_name, data_angle, grism_cat, mdrizzle_image, odd_signs=None):
+    def get_footprint(self, mdrizzle_image, npoints=8):
         """
         Input:
-            data_name      - filename of the position data
-            data_angle     - filename of the displaced positions
-            grism_cat      - refernece to the axecat object
             mdrizzle_image - name of the multidrizzled image
+            npoints        - the number of points per edge
+
+        Return:
+            x_poly, y_poly - the footprint polygon
+
+        Description:
+            The area allowed in the IOL, which includes the
+            additional rows/columns for the traces, is
+            transformed to the multidrizzled image. Several
+            points along each edge follow the distortion.
+        """
+        from . import awtran
+
+        # the points along the edges of the area
+        steps = np.arange(npoints, dtype=np.float64) / float(npoints)
+        x_low, x_upp, y_low, y_upp = self.dim_info
+        x_in = np.concatenate([x_low + steps*(x_upp-x_low), np.zeros(npoints)+x_upp,
+                               x_upp - steps*(x_upp-x_low), np.zeros(npoints)+x_low])
+        y_in = np.concatenate([np.zeros(npoints)+y_low, y_low + steps*(y_upp-y_low),
+                               np.zeros(npoints)+y_upp, y_upp - steps*(y_upp-y_low)])
+
+        # transform the points
+        if (self.useMdriz):
+            x_poly, y_poly = awtran.f_array(self.header_name, mdrizzle_image + "[SCI]", x_in, y_in)
+        else:
+            hstimage=HSTWCS(mdrizzle_image,ext=1)
+            newhstimage=HSTWCS(self.header_name)
+            ra, dec = newhstimage.all_pix2world(x_in, y_in, 1)
+            x_poly, y_poly = hstimage.all_world2pix(ra, dec, 1)
+
+        # return the polygon
+        return x_poly, y_poly
+
+    def make_grismcat(self, dir_data, ang_data, master_cat, mdrizzle_image, odd_signs=None, cands=None):
+        """
+        Input:
+            dir_data       - the object positions
+            ang_data       - the displaced object positions
+            master_cat     - the parsed input catalogue
+            mdrizzle_image - name of the multidrizzled image
+            cands          - indices of the candidate objects,
+                             None for all objects
 
         Return:
             -
@@ -225,7 +264,9 @@ class ProjectionList:
             information on objects in a multidrizzled image are projected
             back into the coordinate system of one nput image.
             A selection is done on the basis of the projected coordinates,
-            and the selected objects are stored to a new IOL file
+            and the selected objects are copied from the input catalogue
+            to a new IOL file.
+            If given, only the candidate objects are projected.
         """
 
         import os
@@ -238,101 +279,58 @@ class ProjectionList:
         print(' >>>> Working on Input Object List: ', self.iol_name, '>>>>')
         print('')
 
+        # project only the candidates
+        if cands is None:
+            cands = np.arange(len(dir_data))
+        dir_data = dir_data[cands]
+        ang_data = ang_data[cands]
+
         #------------------------------------------------------------------------
-        # newer faster version from aXe-1.7 on:
+        # project all positions at once
         #
         if (self.useMdriz):
             print("Using multidrizzle coeffs for coordinate transformation\n")
-            dir_pts = awtran.b(mdrizzle_image + "[SCI]", self.header_name, List=data_name)
-            ang_pts = awtran.b(mdrizzle_image +"[SCI]", self.header_name, List=data_angle)
+            x_ori, y_ori = awtran.b_array(mdrizzle_image + "[SCI]", self.header_name, dir_data[:,0], dir_data[:,1])
+            x_ang, y_ang = awtran.b_array(mdrizzle_image + "[SCI]", self.header_name, ang_data[:,0], ang_data[:,1])
 
         else:
             #use HSTWCS instead for the astrodrizzle image
-            #read in the data_name file
-            # awtran gives back this format: all_out.append("%10.3f %10.3f %10.3f %10.3f" % (xin,yin,xout,yout))
-
             hstimage=HSTWCS(mdrizzle_image,ext=1)
-
-            datanamefile=open(data_name,'r')
-            datapoints=datanamefile.readlines()
-            data = [list(map(float, line.split())) for line in datapoints]        
-
-            skypoints = hstimage.all_pix2world(data,1) #trans points are now in ra and dec from mdrizzle_image
-            #now translate to new image pixel points
-            
             newhstimage=HSTWCS(self.header_name)
-            
-            trans_pts = newhstimage.all_world2pix(skypoints[:,0],skypoints[:,1],1)
-            
-            #pix2sky returns (2,len) array of points, reshape for what awtran returned
-            dir_pts=list()
 
-            for i in range(0,len(trans_pts[0])):
-                dir_pts.append("%10.8g %10.8g %10.8g %10.8g" % ( trans_pts[0][i],trans_pts[1][i],skypoints[i,0],skypoints[i,1] ))
+            # transform the points to ra and dec
+            # and then to the new image pixel points
+            ra, dec = hstimage.all_pix2world(dir_data[:,0], dir_data[:,1], 1)
+            x_ori, y_ori = newhstimage.all_world2pix(ra, dec, 1)
 
-            #now the same for the ang file points
-            angfile=open(data_angle,'r')
-            angpoints=angfile.readlines()
-            data =[list(map(float,line.split())) for line in datapoints]        
+            # the same for the displaced points
+            ra, dec = hstimage.all_pix2world(ang_data[:,0], ang_data[:,1], 1)
+            x_ang, y_ang = newhstimage.all_world2pix(ra, dec, 1)
 
+        # check whether the object positions are
+        # in the range to be stored
+        selection = (x_ori >= self.dim_info[0]) & (x_ori <= self.dim_info[1]) & \
+                    (y_ori >= self.dim_info[2]) & (y_ori <= self.dim_info[3])
 
-            ang_pts=list()
-            for i in range(0,len(trans_pts[0])):
-                ang_pts.append("%10.8g %10.8g %10.8g %10.8g" % (data[i][0],data[i][1],trans_pts[0][i],trans_pts[1][i]))
-        
-        
-        # delete the first element,
-        # which contains a description only
-        # but only for the multidrizzle version
-        #-------------------------------------------------------------------------
-        if self.useMdriz:
-            del(dir_pts[0])
-            del(ang_pts[0])
-
-        # start the reverse index;
-        # iterate over all objects
-        r_index = len(dir_pts) - 1
-        
-        for index in range(grism_cat.nrows):
-            # extract the projected object positions
-            x_ori = float(dir_pts[r_index].split()[0])
-            y_ori = float(dir_pts[r_index].split()[1])
-
-            # check whether the object position is
-            # range to be stored
-            if x_ori >= self.dim_info[0] and x_ori <= self.dim_info[1] and \
-               y_ori >= self.dim_info[2] and y_ori <= self.dim_info[3]:
-
-                # extract the displaced projected position
-                x_ang = float(ang_pts[r_index].split()[0])
-                y_ang = float(ang_pts[r_index].split()[1])
-
-                # compute the new object angle
-                dx = x_ang-x_ori
-                dy = y_ang-y_ori
-                angle = math.atan2(dy,dx)/math.pi*180.0
-
-                # Note: this correction is only necessary
-                #       as long as there are two different
-                #       flavors in pydrizzle and iraf.drizzle
-                if (self.useMdriz):
-                    if odd_signs != None:
-                        if odd_signs[0]:
-                            x_ori -= 0.5
-                        if odd_signs[1]:
-                            y_ori -= 0.5
-
-                # fill in the new position and angle
-                grism_cat['X_IMAGE'][r_index]     = x_ori
-                grism_cat['Y_IMAGE'][r_index]     = y_ori
-                grism_cat['THETA_IMAGE'][r_index] = angle
-
-            # delete outside entries
-            else:
-                grism_cat.delete(r_index)
+        # compute the new object angles
+        angle = np.arctan2(y_ang-y_ori, x_ang-x_ori)/math.pi*180.0
 
-            # decrease the reverse index
-            r_index -= 1
+        # Note: this correction is only necessary
+        #       as long as there are two different
+        #       flavors in pydrizzle and iraf.drizzle
+        if (self.useMdriz):
+            if odd_signs != None:
+                if odd_signs[0]:
+                    x_ori = x_ori - 0.5
+                if odd_signs[1]:
+                    y_ori = y_ori - 0.5
+
+        # copy the selected objects and fill
+        # in their new positions and angles
+        grism_cat = master_cat.copy_rows(cands[selection])
+        grism_cat['X_IMAGE']     = x_ori[selection]
+        grism_cat['Y_IMAGE']     = y_ori[selection]
+        grism_cat['THETA_IMAGE'] = angle[selection]
 
         # save the new IOL
         grism_cat.writeto(self.iol_name)
@@ -342,13 +340,148 @@ class ProjectionList:
         print('')
 
 
+class SourceGrid:
+    """
+    A grid index on the source positions of a catalogue.
+    The sources are sorted into square cells, such that
+    the candidate sources in a region are found without
+    testing every source.
+    """
+    def __init__(self, x_pos, y_pos, cellsize=64.0):
+        """
+        Input:
+            x_pos    - the x-positions of the sources
+            y_pos    - the y-positions of the sources
+            cellsize - the size of the grid cells
+
+        Return:
+            -
+
+        Description:
+            The sources are assigned to the grid cells,
+            and the source indices are sorted by cell.
+            For every cell the start of its sources in
+            the sorted list is stored.
+        """
+        self.x_pos    = np.asarray(x_pos, dtype=np.float64)
+        self.y_pos    = np.asarray(y_pos, dtype=np.float64)
+        self.cellsize = float(cellsize)
+
+        # sources with undefined positions are not indexed
+        valid = np.isfinite(self.x_pos) & np.isfinite(self.y_pos)
+        if valid.any():
+            self.x_start = self.x_pos[valid].min()
+            self.y_start = self.y_pos[valid].min()
+            self.ncx = int((self.x_pos[valid].max() - self.x_start) / self.cellsize) + 1
+            self.ncy = int((self.y_pos[valid].max() - self.y_start) / self.cellsize) + 1
+        else:
+            self.x_start = 0.0
+            self.y_start = 0.0
+            self.ncx = 1
+            self.ncy = 1
+
+        # the cell of each source
+        index = np.flatnonzero(valid)
+        x_cell = ((self.x_pos[index] - self.x_start) / self.cellsize).astype(np.int64)
+        y_cell = ((self.y_pos[index] - self.y_start) / self.cellsize).astype(np.int64)
+        cell = y_cell * self.ncx + x_cell
+
+        # sort the sources by cell,
+        # keeping the catalogue order within a cell
+        order = np.argsort(cell, kind='mergesort')
+        self.sources = index[order]
+
+        # the start of each cell in the sorted sources
+        counts = np.bincount(cell, minlength=self.ncx*self.ncy)
+        self.starts = np.concatenate([[0], np.cumsum(counts)])
+
+    def query_box(self, x_min, x_max, y_min, y_max):
+        """
+        Input:
+            x_min, x_max - the x-range of the box
+            y_min, y_max - the y-range of the box
+
+        Return:
+            cands - the sorted indices of the candidate sources
+
+        Description:
+            The method collects the sources in all cells
+            overlapping with the box. Each row of cells
+            is a contiguous block in the sorted sources.
+        """
+        # convert the box to cells
+        cx_min = max(int(math.floor((x_min - self.x_start) / self.cellsize)), 0)
+        cx_max = min(int(math.floor((x_max - self.x_start) / self.cellsize)), self.ncx-1)
+        cy_min = max(int(math.floor((y_min - self.y_start) / self.cellsize)), 0)
+        cy_max = min(int(math.floor((y_max - self.y_start) / self.cellsize)), self.ncy-1)
+
+        # collect the sources row by row
+        cands = [np.zeros(0, dtype=np.int64)]
+        for cy in range(cy_min, cy_max+1):
+            if cx_min > cx_max:
+                break
+            cands.append(self.sources[self.starts[cy*self.ncx+cx_min]:self.starts[cy*self.ncx+cx_max+1]])
+
+        # return the sorted candidates
+        return np.sort(np.concatenate(cands))
+
+    def query_polygon(self, x_poly, y_poly, margin=0.0):
+        """
+        Input:
+            x_poly - the x-coordinates of the polygon corners
+            y_poly - the y-coordinates of the polygon corners
+            margin - the margin around the polygon
+
+        Return:
+            cands - the sorted indices of the candidate sources
+
+        Description:
+            The candidates in the bounding box of the polygon,
+            enlarged by the margin, are selected from the grid.
+            Only those inside the polygon or within the margin
+            of its edges are returned.
+        """
+        x_poly = np.asarray(x_poly, dtype=np.float64)
+        y_poly = np.asarray(y_poly, dtype=np.float64)
+
+        # get the candidates in the bounding box
+        cands = self.query_box(x_poly.min()-margin, x_poly.max()+margin,
+                               y_poly.min()-margin, y_poly.max()+margin)
+        x_cand = self.x_pos[cands]
+        y_cand = self.y_pos[cands]
+
+        # test the candidates against all edges
+        inside = np.zeros(len(cands), dtype=bool)
+        near   = np.zeros(len(cands), dtype=bool)
+        for index in range(len(x_poly)):
+            x_1, y_1 = x_poly[index-1], y_poly[index-1]
+            x_2, y_2 = x_poly[index],   y_poly[index]
+
+            # count the crossings of a ray in x
+            cross = (y_1 > y_cand) != (y_2 > y_cand)
+            x_cross = x_1 + (y_cand - y_1) * (x_2 - x_1) / np.where(cross, y_2 - y_1, 1.0)
+            inside ^= cross & (x_cand < x_cross)
+
+            # check the distance to the edge
+            length2 = (x_2 - x_1)**2 + (y_2 - y_1)**2
+            if length2 > 0.0:
+                frac = np.clip(((x_cand - x_1)*(x_2 - x_1) + (y_cand - y_1)*(y_2 - y_1)) / length2, 0.0, 1.0)
+            else:
+                frac = np.zeros(len(cands))
+            dist2 = (x_cand - x_1 - frac*(x_2 - x_1))**2 + (y_cand - y_1 - frac*(y_2 - y_1))**2
+            near |= dist2 <= margin*margin
+
+        # return the candidates
+        return cands[inside | near]
+
+
 class IOL_Maker:
     """
     Central class to take the input and to create Input Object Lists
     for the list of images extracted from the header of the
     multidrizzled image.
     """
-    def __init__(self, mdrizzle_image, input_cat,  dim_term, useMdriz):
+    def __init__(self, mdrizzle_image, input_cat,  dim_term, useMdriz, ncpus=1):
         """
         Input:
             mdrizzle_image - the name of the multidrizzled image
@@ -356,6 +489,7 @@ class IOL_Maker:
             dim_info       - description of the additional rows/column
                              for the Input Object Lists
             useMdriz       -use multidrizzle header information for coord transform
+            ncpus          - the number of processes creating IOL's
 
         Return:
             -
@@ -371,6 +505,12 @@ class IOL_Maker:
         
         self.iol_list = []
         self.useMdriz = useMdriz
+
+        # check the number of processes
+        self.ncpus = self._toInt(ncpus)
+        if self.ncpus == None or self.ncpus < 1:
+            err_msg = 'IOLPREP: The number of processes must be a positive integer, not: %s!' % str(ncpus)
+            raise aXeError(err_msg)
         
         # check whether the multidrizzled image exists,
         # store the name if it exists
@@ -445,36 +585,18 @@ class IOL_Maker:
             the object angle in the projected coordinate system
         """
 
-        import math
-        from axe import axe_asciidata
-
-        # create two empty tables
-        data_tab  = axe_asciidata.create(2, master_cat.nrows)
-        angle_tab = axe_asciidata.create(2, master_cat.nrows)
-
-        # go over all rows
-        for index in range(master_cat.nrows):
-
-            # get position and orientation
-            x_pos = master_cat['X_IMAGE'][index]
-            y_pos = master_cat['Y_IMAGE'][index]
-            theta = master_cat['THETA_IMAGE'][index]
+        # get positions and orientations
+        x_pos = master_cat['X_IMAGE']
+        y_pos = master_cat['Y_IMAGE']
+        theta = master_cat['THETA_IMAGE']
 
-            # compute shift position
-            x_shift = x_pos + 10.0 * math.cos(theta / 180.0 * math.pi)
-            y_shift = y_pos + 10.0 * math.sin(theta / 180.0 * math.pi)
-
-            # fill the positons in the table
-            data_tab[0][index]  = x_pos
-            data_tab[1][index]  = y_pos
-
-            # fillthe shifted positions in table
-            angle_tab[0][index] = x_shift
-            angle_tab[1][index] = y_shift
+        # compute the shifted positions
+        x_shift = x_pos + 10.0 * np.cos(theta / 180.0 * math.pi)
+        y_shift = y_pos + 10.0 * np.sin(theta / 180.0 * math.pi)
 
         # write the two lists to disk
-        data_tab.writeto(data_name)
-        angle_tab.writeto(data_angle)
+        np.savetxt(data_name, np.column_stack([x_pos, y_pos]), fmt='%.12g')
+        np.savetxt(data_angle, np.column_stack([x_shift, y_shift]), fmt='%.12g')
 
         self.data_name=data_name
         self.data_angle = data_angle
@@ -637,6 +759,7 @@ class IOL_Maker:
         """
         import os
         import os.path
+        import multiprocessing
         from . import axeutils
         from . import axeiol
         
@@ -646,12 +769,9 @@ class IOL_Maker:
         #       flavors in pydrizzle and iraf.drizzle
         odd_signs = self._make_odd_signs()
 
-        # load the input catalogue twice.
-        # once as a reference for the input
-        # and once as a template to build
-        # and save the new IOL's from
-        master_cat = axeiol.InputObjectList(self.input_cat)
-        grism_cat = axeiol.InputObjectList(self.input_cat)
+        # load the input catalogue once into columns;
+        # it is the template for all new IOL's
+        master_cat = axeiol.ColumnObjectList(self.input_cat)
 
         # name and create the two temporary files
         # with object positions. the task 'tran'
@@ -666,13 +786,25 @@ class IOL_Maker:
             os.unlink(data_angle)
         success = self._make_data_files(master_cat, data_name, data_angle)
 
-        # create the new Input Object Lists
-        for iol in self.iol_list:
-            # load the entire catalogue again
-            grism_cat = axeiol.InputObjectList(self.input_cat)
+        # read the positions and the displaced
+        # positions once for all IOL's
+        dir_data = np.loadtxt(data_name, ndmin=2)
+        ang_data = np.loadtxt(data_angle, ndmin=2)
+
+        # index the object positions
+        source_grid = SourceGrid(dir_data[:,0], dir_data[:,1])
 
-            # make a new IOL
-            iol.make_grismcat(data_name, data_angle, grism_cat, self.mdrizzle_image, odd_signs)
+        # compose the input for each IOL
+        iol_input = [(iol, self.mdrizzle_image, odd_signs) for iol in self.iol_list]
+
+        # create the new Input Object Lists;
+        # every process gets the parsed catalogue
+        # and the positions once, and the processes
+        # share a lock for the IRAF fallback
+        axeutils.map_processes(_make_grismcat, iol_input, self.ncpus,
+                               initializer=_init_iolworker,
+                               initargs=(master_cat, source_grid, dir_data, ang_data,
+                                         multiprocessing.Lock()))
 
         # delete the temporary files
         if path.isfile(data_name):
@@ -681,6 +813,70 @@ class IOL_Maker:
             os.unlink(data_angle)
 
 
+# the parsed input catalogue, its grid index
+# and the positions in the IOL processes
+_master_cat  = None
+_source_grid = None
+_dir_data    = None
+_ang_data    = None
 
+def _init_iolworker(master_cat, source_grid, dir_data, ang_data, iraf_lock=None):
+    """
+    Input:
+        master_cat  - the parsed input catalogue
+        source_grid - the grid index on the object positions
+        dir_data    - the object positions
+        ang_data    - the displaced object positions
+        iraf_lock   - the lock shared by the processes
+                      for the IRAF fallback, None if serial
+
+    Return:
+        -
+
+    Description:
+        Stores the parsed input catalogue, its index and
+        the positions for the IOL's made in the current process.
+    """
+    from . import awtran
+
+    global _master_cat
+    global _source_grid
+    global _dir_data
+    global _ang_data
+    _master_cat  = master_cat
+    _source_grid = source_grid
+    _dir_data    = dir_data
+    _ang_data    = ang_data
 
+    # IRAF must not run in several processes at once
+    awtran.set_iraf_lock(iraf_lock)
 
+def _make_grismcat(iol_input):
+    """
+    Input:
+        iol_input - IOL, multidrizzled image and odd signs
+
+    Return:
+        -
+
+    Description:
+        Makes one IOL from the parsed input catalogue.
+        Only the objects within the footprint of the input
+        image, found with the grid index, are projected.
+        The function is on the module level such that
+        it can be handed over to the worker processes.
+    """
+    # unpack the input
+    iol, mdrizzle_image, odd_signs = iol_input
+
+    # get the candidate objects in the footprint;
+    # the margin covers the distortion between
+    # the points on the footprint edges
+    x_poly, y_poly = iol.get_footprint(mdrizzle_image)
+    if np.isfinite(x_poly).all() and np.isfinite(y_poly).all():
+        cands = _source_grid.query_polygon(x_poly, y_poly, margin=10.0)
+    else:
+        cands = None
+
+    # make the IOL
+    iol.make_grismcat(_dir_data, _ang_data, _master_cat, mdrizzle_image, odd_signs, cands)
@@ -331,7 +331,7 @@ class DrizzleConf(configfile.ConfigList):
         # get the name of the input configuration file;
         # load the configuration file
         config_file = drizzle_params['CONF']
-        config = configfile.ConfigFile(axeutils.getCONF(config_file))
+        config = configfile.load_config(axeutils.getCONF(config_file))
 
         # get the header
         header = self._get_header()
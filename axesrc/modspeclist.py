@@ -8,6 +8,7 @@ from __future__ import absolute_import
 
 import os
 import sys
+import numpy as np
 from axe import axe_asciidata
 
 from .axeerror import aXeSIMError
@@ -379,8 +380,7 @@ class ModelObjectTable(MagColList):
         @param WCSext: the extension to use
         @type WCSext: string
         """
-        from pyraf import iraf
-        from iraf import stsdas
+        from stwcs.wcsutil import HSTWCS
 
         # check that the image exists
         if not os.path.isfile(WCSimage):
@@ -391,6 +391,15 @@ class ModelObjectTable(MagColList):
         if WCSext != None:
             WCSimage += WCSext
 
+        # get the WCS of the image
+        image_wcs = HSTWCS(WCSimage)
+
+        # transform all x,y to ra and dec at once;
+        # use the linear WCS as xy2rd did
+        x_image = np.array([self['X_IMAGE'][index] for index in range(self.nrows)], dtype=np.float64)
+        y_image = np.array([self['Y_IMAGE'][index] for index in range(self.nrows)], dtype=np.float64)
+        ra, dec = image_wcs.wcs_pix2world(x_image, y_image, 1)
+
         # go over all rows
         for index in range(self.nrows):
 
@@ -401,17 +410,9 @@ class ModelObjectTable(MagColList):
             self['B_WORLD'][index]     = self['B_IMAGE'][index]
             self['THETA_WORLD'][index] = self['THETA_IMAGE'][index]
 
-            # transform x,y to ra and dec
-            ra_dec = iraf.xy2rd(infile=WCSimage, x=self['X_IMAGE'][index],\
-                                y=self['Y_IMAGE'][index], hms='NO', Stdout=1)
-
-            # disseminate the expression to extract ra and dec
-            ra  = float(ra_dec[0].split(',')[0].split('=')[1])
-            dec = float(ra_dec[0].split(',')[1].split('=')[1])
-
             # store ra and dec
-            self['X_WORLD'][index] = ra
-            self['Y_WORLD'][index] = dec
+            self['X_WORLD'][index] = float(ra[index])
+            self['Y_WORLD'][index] = float(dec[index])
 
         # save the changes
         self.flush()
@@ -229,29 +229,29 @@ cubic
         import os
         import os.path
 
-        from astropy.io import fits as pyfits
+        from . import axeutils
 
         # make a dict for the setup; give defaults
         instr_setup = {'instrument': None, 'disperser': None,'detector': None}
 
-        # open the fits image
-        fits_img = pyfits.open(os.path.basename(self.image), 'readonly')
+        # get the keywords of the primary header
+        prim_header = axeutils.get_fits_keys(os.path.basename(self.image))[0]
 
         # get the instrument keyword
-        if 'INSTRUME' in fits_img[0].header:
-            instr_setup['instrument'] = fits_img[0].header['INSTRUME']
+        if 'INSTRUME' in prim_header:
+            instr_setup['instrument'] = prim_header['INSTRUME']
 
         # check for detector and filter info
-        if 'DETECTOR' in fits_img[0].header and \
-            'FILTER1' in fits_img[0].header and \
-            'FILTER2' in fits_img[0].header:
+        if 'DETECTOR' in prim_header and \
+            'FILTER1' in prim_header and \
+            'FILTER2' in prim_header:
 
             # store the detector name
-            instr_setup['detector']  = fits_img[0].header['DETECTOR']
+            instr_setup['detector']  = prim_header['DETECTOR']
 
             # store the filter names
-            filter1  = fits_img[0].header['FILTER1']
-            filter2  = fits_img[0].header['FILTER2']
+            filter1  = prim_header['FILTER1']
+            filter2  = prim_header['FILTER2']
 
             # this is for the HRC/WFC
             if   filter1.find('CLEAR') > -1:
@@ -265,13 +265,10 @@ cubic
             elif filter2.find('N/A') > -1:
                 instr_setup['disperser'] = filter1
 
-        elif 'FILTER' in fits_img[0].header:
+        elif 'FILTER' in prim_header:
 
             # store the single filter name
-            instr_setup['disperser'] = fits_img[0].header['FILTER']
-
-        # close the fits image
-        fits_img.close()
+            instr_setup['disperser'] = prim_header['FILTER']
 
         # return the instrument setup
         return instr_setup
@@ -431,6 +428,8 @@ cubic
         """
         from astropy.io import fits as pyfits
 
+        from . import axeutils
+
         # open the fits and go to the first header
         flt_imag = pyfits.open(self.image,'update', memmap=0)
         flt_head = flt_imag[0].header
@@ -485,3 +484,6 @@ cubic
 
         # close the fits
         flt_imag.close()
+
+        # the cached headers are outdated
+        axeutils.clear_fits_keys(self.image)
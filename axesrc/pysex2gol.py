@@ -26,20 +26,24 @@ but WITHOUT ANY WARRANTY; without even the implied warranty of
 MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
 GNU General Public License for more details.
 """
-from axe import axe_asciidata
 from .axeerror import aXeError
 
 class Sex2GolPy(object):
     """
     Class for the SEX2GOL task
     """
-    def __init__(self, grisim, config, in_sex=None, dirname=None, out_sex=None, spec_hdu=None, dir_hdu=None):
+    # the WCS pairs of direct and grism images
+    wcs_pairs = {}
+
+    def __init__(self, grisim, config, in_sex=None, dirname=None, out_sex=None, spec_hdu=None, dir_hdu=None,
+                 cache_wcs=True):
         """
         Initializes the class
         """
         from . import axeutils
         
         # store some parameters
+        self.cache_wcs = cache_wcs
         self.grisim  = grisim
         self.config  = config
         self.in_sex  = in_sex
@@ -101,7 +105,7 @@ class Sex2GolPy(object):
         if spec_hdu == None:
             # load the configuration file;
             # determine the extension information
-            conf = configfile.ConfigFile(axeutils.getCONF(config))
+            conf = configfile.load_config(axeutils.getCONF(config))
             ext_info = axeutils.get_ext_info(axeutils.getIMAGE(grisim), conf)
             del conf
 
@@ -128,7 +132,7 @@ class Sex2GolPy(object):
         elif dirname != None and dir_hdu == None:
             # load the configuration file;
             # determine the extension information
-            conf = configfile.ConfigFile(axeutils.getCONF(config))
+            conf = configfile.load_config(axeutils.getCONF(config))
             dirname_extinfo = axeutils.get_ext_info(axeutils.getIMAGE(grisim), conf)
             del conf
 
@@ -177,7 +181,7 @@ class Sex2GolPy(object):
         from . import axeiol
 
         # load the IOL
-        iol = axeiol.InputObjectList(self.in_sex)
+        iol = axeiol.ColumnObjectList(self.in_sex)
 
         # check for an empty table
         if iol.nrows < 1:
@@ -185,79 +189,75 @@ class Sex2GolPy(object):
             # return only none's
             return None, None 
 
-        # determine the number of columns
-        ncols_gol = len(iol.mand_cols) + len(iol.wav_cols)
-
-        # create an empty GOL
-        gol = axe_asciidata.create(ncols_gol, iol.nrows)
-        gol.toSExtractor()
-
-        # go over all
-        # mandatory columns
-        c_index = 0
-        for one_col in iol.mand_cols:
-            # rename the GOL column
-            gol[c_index].rename(one_col['name'])
+        # copy the mandatory and the
+        # wavelength columns to the GOL
+        colnames = [one_col['name'] for one_col in iol.mand_cols + iol.wav_cols]
+        gol = iol.copy_columns(colnames)
 
-            # go over all rows
-            for r_index in range(iol.nrows):
-
-                # transfer the value
-                gol[one_col['name']][r_index] = iol[one_col['name']][r_index]
+        # return the GOL
+        return iol, gol
 
-            # enhance the index
-            c_index += 1
+    def _get_wcs_pair(self, dir_term, gri_term):
+        """
+        Get the WCS's of the direct and the grism image
 
-        # go over all wavelength columns
-        for one_col in iol.wav_cols:
+        The WCS pair is cached for every combination of direct
+        image, grism image and extensions. The modification times
+        are part of the key, such that an updated image is
+        read again.
 
-            # rename the GOL column
-            gol[c_index].rename(one_col['name'])
+        @param dir_term: the direct image with extension
+        @type dir_term: string
+        @param gri_term: the grism image with extension
+        @type gri_term: string
 
-            # go over all rows
-            for r_index in range(iol.nrows):
+        @return: the WCS of the direct and the grism image
+        @rtype: (HSTWCS, HSTWCS)
+        """
+        import os.path
+        from stwcs.wcsutil import HSTWCS
 
-                # transfer the value
-                gol[one_col['name']][r_index] = iol[one_col['name']][r_index]
+        # compose the key
+        wcs_key = (dir_term, gri_term,
+                   os.path.getmtime(dir_term.split('[')[0]),
+                   os.path.getmtime(gri_term.split('[')[0]))
 
-            # enhance the index
-            c_index += 1
+        # read the WCS pair if not yet known
+        if not self.cache_wcs or wcs_key not in Sex2GolPy.wcs_pairs:
+            wcs_pair = (HSTWCS(dir_term), HSTWCS(gri_term))
+            if not self.cache_wcs:
+                return wcs_pair
+            Sex2GolPy.wcs_pairs[wcs_key] = wcs_pair
 
-        # return the GOL
-        return iol, gol
+        # return the WCS pair
+        return Sex2GolPy.wcs_pairs[wcs_key]
 
     def _transfer_coos(self, iol, gol):
         """
         Transfer coordinates from the IOL to the GOL
+
+        All positions are transformed at once from the direct
+        image to the sky and then to the grism image. As before
+        only the linear part of the WCS's is used.
         """
         from . import axeutils
 
-        import stsci.tools as pytools
-        from stsci.tools import wcsutil
-
         # compose the WCS-term for the direct and grism images
         dir_term = axeutils.getIMAGE('%s[%i]' % (self.dirname,self.dirname_extinfo['fits_ext']))
         gri_term = axeutils.getIMAGE('%s[%i]' % (self.grisim, self.grism_extinfo['fits_ext']))
 
-        # generate the WCS objects
-        dir_wcs = wcsutil.WCSObject(dir_term)
-        gri_wcs = wcsutil.WCSObject(gri_term)
-
-        # go over each row
-        for index in range(iol.nrows):
+        # get the WCS objects
+        dir_wcs, gri_wcs = self._get_wcs_pair(dir_term, gri_term)
 
-            # make a position tuple
-            xy_dirname = (iol['X_IMAGE'][index], iol['Y_IMAGE'][index])
+        # convert to RADEC
+        ra, dec = dir_wcs.wcs_pix2world(iol['X_IMAGE'], iol['Y_IMAGE'], 1)
 
-            # convert to RADEC
-            radec_pos = dir_wcs.xy2rd(xy_dirname)
+        # convert to XY on grism
+        x_grism, y_grism = gri_wcs.wcs_world2pix(ra, dec, 1)
 
-            # convert to XY on grism
-            xy_grism  = gri_wcs.rd2xy(radec_pos)
-
-            # store projected vals in the GOL
-            gol['X_IMAGE'][index] = float(xy_grism[0])
-            gol['Y_IMAGE'][index] = float(xy_grism[1])
+        # store projected vals in the GOL
+        gol['X_IMAGE'] = x_grism
+        gol['Y_IMAGE'] = y_grism
 
     def _treat_NULL_table(self, out_name):
         """
@@ -267,6 +267,15 @@ class Sex2GolPy(object):
         GOL file. However then no check is done whether 
         the column is complete.
         """
+        from . import axeiol
+
+        # a FITS table is written
+        # as an empty text table
+        iol = axeiol.ColumnObjectList(self.in_sex)
+        if iol.is_fits(self.in_sex):
+            iol.writeto(out_name)
+            return
+
         # open the "GOL"
         out_file = file(out_name, 'w+')
         
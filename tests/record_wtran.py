@@ -0,0 +1,87 @@
+"""
+Record the output of wtraxy and wtranback for the tests of the
+vectorised drizzle transformation in awtran.
+
+Run it in a PyRAF session with the STSDAS dither package:
+
+    python tests/record_wtran.py
+
+The recordings are written to tests/data/wtran_<case>.json and
+are compared with awtran.DrizTrans in tests/test_awtran.py.
+"""
+from __future__ import print_function
+
+import os
+import sys
+import json
+import tempfile
+
+import numpy as np
+
+TESTDIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTDIR, '..', 'axesrc'))
+import awtran
+
+# the cubic and the 4th order coefficients, each with
+# and without a reference pixel different from the centre
+CUBIC = """cubic
+ 0.3 1.002 0.0012 -2.1e-6 1.1e-6 -0.8e-6 1.3e-9 -0.6e-9 0.4e-9 -0.9e-9
+ -0.2 0.0015 0.998 0.7e-6 -1.8e-6 1.2e-6 -0.5e-9 1.1e-9 -0.7e-9 0.3e-9
+"""
+POLY4 = """poly 4
+ 0.3 1.002 0.0012 -2.1e-6 1.1e-6 -0.8e-6 1.3e-9 -0.6e-9 0.4e-9 -0.9e-9 2e-13 -1e-13 3e-13 -2e-13 1e-13
+ -0.2 0.0015 0.998 0.7e-6 -1.8e-6 1.2e-6 -0.5e-9 1.1e-9 -0.7e-9 0.3e-9 -1e-13 2e-13 -3e-13 1e-13 -2e-13
+"""
+CASES = {
+    'cubic':        CUBIC,
+    'cubic_refpix': 'refpix 480.0 530.0\n' + CUBIC,
+    'poly4':        POLY4,
+    'poly4_refpix': 'refpix 480.0 530.0\n' + POLY4,
+}
+
+# the geometry of the drizzling
+GEOMETRY = {'nxin': 1014, 'nyin': 1014, 'nxout': 1200, 'nyout': 1150,
+            'scale': 0.95, 'xsh': 12.5, 'ysh': -7.25, 'rot': 23.0,
+            'shft_un': 'input', 'shft_fr': 'input', 'align': 'center'}
+
+# the positions on the input image
+POSITIONS = [(1.0, 1.0), (1014.0, 1.0), (1.0, 1014.0), (1014.0, 1014.0),
+             (508.0, 508.0), (123.4, 876.5), (950.2, 33.3)]
+
+def get_geopar(coeffs):
+    """
+    Make the geometric parameters for a coefficients file
+    """
+    GeoPar = awtran.DrizGeoPars()
+    for key, value in GEOMETRY.items():
+        setattr(GeoPar, key, value)
+    GeoPar.coeffs = coeffs
+    return GeoPar
+
+def record(case, coeffs_text):
+    """
+    Record wtraxy and wtranback for one case
+    """
+    fd, coeffs = tempfile.mkstemp(suffix='.coeffs', dir='.')
+    os.write(fd, coeffs_text.encode('ascii'))
+    os.close(fd)
+    try:
+        GeoPar = get_geopar(coeffs)
+        x_in = np.array([pos[0] for pos in POSITIONS])
+        y_in = np.array([pos[1] for pos in POSITIONS])
+        x_out, y_out = awtran._iraf_array(GeoPar, x_in, y_in, True)
+        x_back, y_back = awtran._iraf_array(GeoPar, x_out, y_out, False)
+    finally:
+        os.unlink(coeffs)
+
+    recording = {'coeffs': coeffs_text, 'geometry': GEOMETRY,
+                 'forward': np.column_stack([x_in, y_in, x_out, y_out]).tolist(),
+                 'backward': np.column_stack([x_back, y_back, x_out, y_out]).tolist()}
+    outname = os.path.join(TESTDIR, 'data', 'wtran_%s.json' % case)
+    with open(outname, 'w') as outfile:
+        json.dump(recording, outfile, indent=1)
+    print('Recorded', outname)
+
+if __name__ == '__main__':
+    for case in sorted(CASES):
+        record(case, CASES[case])
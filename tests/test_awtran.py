@@ -0,0 +1,126 @@
+"""
+Tests for the vectorised drizzle transformation in awtran
+"""
+import os
+import sys
+import glob
+import json
+import math
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('stsci.tools')
+
+TESTDIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, TESTDIR)
+sys.path.insert(0, os.path.join(TESTDIR, '..', 'axesrc'))
+import awtran
+import record_wtran
+
+def make_trans(tmpdir, coeffs_text, **geometry):
+    """
+    Make the transformation for a coefficients text
+    """
+    coeffs = tmpdir.join('test.coeffs')
+    coeffs.write(coeffs_text)
+    GeoPar = record_wtran.get_geopar(str(coeffs))
+    for key, value in geometry.items():
+        setattr(GeoPar, key, value)
+    return awtran.DrizTrans(GeoPar)
+
+def get_positions():
+    """
+    The test positions on the input image
+    """
+    xy = np.array(record_wtran.POSITIONS)
+    return xy[:,0], xy[:,1]
+
+@pytest.mark.parametrize('recording', sorted(glob.glob(os.path.join(TESTDIR, 'data', 'wtran_*.json'))))
+def test_recorded_iraf(tmpdir, recording):
+    """
+    Compare with the recorded output of wtraxy and wtranback
+    """
+    with open(recording) as infile:
+        rec = json.load(infile)
+    trans = make_trans(tmpdir, rec['coeffs'], **rec['geometry'])
+
+    forward = np.array(rec['forward'])
+    x_out, y_out = trans.forward(forward[:,0], forward[:,1])
+    assert np.allclose(x_out, forward[:,2], atol=0.01)
+    assert np.allclose(y_out, forward[:,3], atol=0.01)
+
+    backward = np.array(rec['backward'])
+    x_in, y_in = trans.backward(backward[:,2], backward[:,3])
+    assert np.allclose(x_in, backward[:,0], atol=0.01)
+    assert np.allclose(y_in, backward[:,1], atol=0.01)
+
+def test_recordings_present():
+    """
+    All cases have a recording of wtraxy and wtranback
+    """
+    missing = [case for case in sorted(record_wtran.CASES)
+               if not os.path.isfile(os.path.join(TESTDIR, 'data', 'wtran_%s.json' % case))]
+    if missing:
+        pytest.skip('no wtraxy/wtranback recordings for %s; run tests/record_wtran.py under PyRAF'
+                    % ', '.join(missing))
+
+def test_identity_geometry(tmpdir):
+    """
+    Without distortion the output is the rotated, scaled and shifted input
+    """
+    trans = make_trans(tmpdir, 'poly 1\n 5.0 1.0 0.0\n -3.0 0.0 1.0\n')
+    x_in, y_in = get_positions()
+    x_out, y_out = trans.forward(x_in, y_in)
+
+    # the constant terms keep the image centre fixed
+    geo = record_wtran.GEOMETRY
+    rot = math.radians(geo['rot'])
+    xc_in, yc_in = geo['nxin']//2 + 1.0, geo['nyin']//2 + 1.0
+    xc_out, yc_out = geo['nxout']//2 + 1.0, geo['nyout']//2 + 1.0
+    xoff, yoff = geo['xsh']/geo['scale'], geo['ysh']/geo['scale']
+    x_t = xc_out + xoff*math.cos(rot) - yoff*math.sin(rot)
+    y_t = yc_out + xoff*math.sin(rot) + yoff*math.cos(rot)
+    dx, dy = x_in - xc_in, y_in - yc_in
+    assert np.allclose(x_out, (math.cos(rot)*dx - math.sin(rot)*dy)/geo['scale'] + x_t)
+    assert np.allclose(y_out, (math.sin(rot)*dx + math.cos(rot)*dy)/geo['scale'] + y_t)
+
+@pytest.mark.parametrize('coeffs_text', [record_wtran.CUBIC, record_wtran.POLY4])
+def test_refpix_at_centre(tmpdir, coeffs_text):
+    """
+    A reference pixel at the image centre changes nothing
+    """
+    trans = make_trans(tmpdir, coeffs_text)
+    trans_ref = make_trans(tmpdir, 'refpix %.1f %.1f\n' % (trans.xcin, trans.ycin) + coeffs_text)
+    x_in, y_in = get_positions()
+    x_out, y_out = trans.forward(x_in, y_in)
+    x_ref, y_ref = trans_ref.forward(x_in, y_in)
+    assert np.allclose(x_out, x_ref, atol=1.0e-9)
+    assert np.allclose(y_out, y_ref, atol=1.0e-9)
+
+@pytest.mark.parametrize('case', sorted(record_wtran.CASES))
+def test_roundtrip(tmpdir, case):
+    """
+    The backward transformation inverts the forward one
+    """
+    trans = make_trans(tmpdir, record_wtran.CASES[case])
+    x_in, y_in = get_positions()
+    x_back, y_back = trans.backward(*trans.forward(x_in, y_in))
+    assert np.allclose(x_back, x_in, atol=1.0e-5)
+    assert np.allclose(y_back, y_in, atol=1.0e-5)
+
+def test_singular(tmpdir):
+    """
+    A singular distortion is not inverted
+    """
+    trans = make_trans(tmpdir, 'poly 1\n 0.0 1.0 0.0\n 0.0 1.0 0.0\n')
+    with pytest.raises(awtran.TransNotSupported):
+        trans.backward(np.array([10.0]), np.array([20.0]))
+
+@pytest.mark.parametrize('coeffs_text', ['radial\n 0.0 1.0 0.0\n', 'trauger\n 1.0\n'])
+def test_not_supported(tmpdir, coeffs_text):
+    """
+    Other coefficient types are left to IRAF
+    """
+    with pytest.raises(awtran.TransNotSupported):
+        make_trans(tmpdir, coeffs_text)